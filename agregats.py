@@ -0,0 +1,115 @@
+"""
+Agrégats d'émissions maintenus de façon incrémentale
+
+Le dashboard ne parcourt jamais la table des transports : il lit des lignes
+d'agrégats `(dimension, clé) -> (nombre de transports, kg CO2e)`. Chaque
+écriture de transport produit des deltas qui sont appliqués à ces lignes dans
+la même transaction.
+"""
+
+from collections import defaultdict
+
+DIMENSION_TOTAL = 'total'
+DIMENSION_MOIS = 'mois'
+DIMENSION_ENERGIE = 'energie'
+DIMENSION_TYPE_VEHICULE = 'type_vehicule'
+DIMENSION_CLIENT = 'client'
+DIMENSION_TRANSPORTEUR = 'transporteur'
+
+DIMENSIONS = (
+    DIMENSION_TOTAL, DIMENSION_MOIS, DIMENSION_ENERGIE,
+    DIMENSION_TYPE_VEHICULE, DIMENSION_CLIENT, DIMENSION_TRANSPORTEUR
+)
+
+CLE_TOTAL = 'tous'
+# Clé des transports sans valeur pour la dimension (pas d'énergie, pas de client...)
+CLE_INCONNUE = 'inconnu'
+
+# Colonnes d'un transport dont dépendent les agrégats
+COLONNES_AGREGATS = ('created_at', 'energie', 'type_vehicule', 'client_id', 'transporteur_id', 'emis_kg')
+
+
+def _cle(valeur):
+    if valeur is None:
+        return CLE_INCONNUE
+    valeur = str(valeur).strip()
+    return valeur or CLE_INCONNUE
+
+
+def cle_mois(date):
+    """Clé mensuelle 'AAAA-MM' d'une date de création"""
+    return date.strftime('%Y-%m') if date else CLE_INCONNUE
+
+
+def cle_dimension(dimension, valeur):
+    """Clé d'agrégat d'une valeur de colonne (date de création pour les mois)"""
+    if dimension == DIMENSION_TOTAL:
+        return CLE_TOTAL
+    if dimension == DIMENSION_MOIS:
+        return cle_mois(valeur)
+    return _cle(valeur)
+
+
+def cles_agregats(created_at, energie, type_vehicule, client_id, transporteur_id):
+    """Liste des `(dimension, clé)` auxquelles un transport contribue"""
+    return [
+        (DIMENSION_TOTAL, CLE_TOTAL),
+        (DIMENSION_MOIS, cle_mois(created_at)),
+        (DIMENSION_ENERGIE, _cle(energie)),
+        (DIMENSION_TYPE_VEHICULE, _cle(type_vehicule)),
+        (DIMENSION_CLIENT, _cle(client_id)),
+        (DIMENSION_TRANSPORTEUR, _cle(transporteur_id)),
+    ]
+
+
+def cles_transport(transport):
+    """`cles_agregats` pour un transport (modèle, ligne de requête ou objet équivalent)"""
+    return cles_agregats(
+        getattr(transport, 'created_at', None),
+        getattr(transport, 'energie', None),
+        getattr(transport, 'type_vehicule', None),
+        getattr(transport, 'client_id', None),
+        getattr(transport, 'transporteur_id', None)
+    )
+
+
+class DeltasAgregats:
+    """Accumule les variations à appliquer aux agrégats"""
+
+    def __init__(self):
+        self._deltas = defaultdict(lambda: [0, 0.0])
+
+    def ajouter(self, cles, emis_kg, signe=1):
+        """Compte (signe=1) ou retire (signe=-1) un transport"""
+        emis_kg = emis_kg or 0.0
+        for cle in cles:
+            delta = self._deltas[cle]
+            delta[0] += signe
+            delta[1] += signe * emis_kg
+
+    def ajouter_groupe(self, dimension, valeur, nombre, emis_kg):
+        """Ajoute un groupe de transports (résultat d'un GROUP BY)"""
+        delta = self._deltas[(dimension, cle_dimension(dimension, valeur))]
+        delta[0] += nombre
+        delta[1] += emis_kg or 0.0
+
+    def retirer(self, cles, emis_kg):
+        self.ajouter(cles, emis_kg, signe=-1)
+
+    def modifier_emissions(self, cles, ancien_emis_kg, nouvel_emis_kg):
+        """Variation des émissions d'un transport dont les clés sont inchangées"""
+        difference = (nouvel_emis_kg or 0.0) - (ancien_emis_kg or 0.0)
+        if difference:
+            for cle in cles:
+                self._deltas[cle][1] += difference
+
+    def lignes(self):
+        """Deltas non nuls sous forme de paramètres d'écriture"""
+        return [
+            {'dimension': dimension, 'cle': cle, 'nb_transports': nombre, 'emis_kg': emis}
+            for (dimension, cle), (nombre, emis) in self._deltas.items()
+            if nombre or emis
+        ]
+
+    def __bool__(self):
+        return any(nombre or emis for nombre, emis in self._deltas.values())
@@ -0,0 +1,167 @@
+"""
+Tenue en base des agrégats d'émissions du dashboard
+
+Application des deltas (voir agregats.py) dans la transaction des écritures de
+transports, reconstruction complète et commande `flask reconstruire-agregats`.
+"""
+
+import logging
+from types import SimpleNamespace
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from agregats import (
+    cles_transport, COLONNES_AGREGATS, DeltasAgregats, DIMENSION_CLIENT, DIMENSION_ENERGIE,
+    DIMENSION_MOIS, DIMENSION_TOTAL, DIMENSION_TRANSPORTEUR, DIMENSION_TYPE_VEHICULE
+)
+from extensions import db
+from models import EmissionsAgregat, Transport
+
+logger = logging.getLogger(__name__)
+
+def _upsert_agregats(dialecte):
+    """INSERT ... ON CONFLICT qui additionne les deltas aux agrégats existants"""
+    if dialecte == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecte
+    elif dialecte == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecte
+    else:
+        return None
+    table = EmissionsAgregat.__table__
+    instruction = insert_dialecte(table)
+    return instruction.on_conflict_do_update(
+        index_elements=[table.c.dimension, table.c.cle],
+        set_={
+            'nb_transports': table.c.nb_transports + instruction.excluded.nb_transports,
+            'emis_kg': table.c.emis_kg + instruction.excluded.emis_kg
+        }
+    )
+
+
+def appliquer_deltas_agregats(deltas, connexion=None):
+    """Ajoute des `DeltasAgregats` aux agrégats, dans la transaction courante"""
+    # Ordre fixe des lignes : deux transactions concurrentes les verrouillent dans le même ordre
+    lignes = sorted(deltas.lignes(), key=lambda ligne: (ligne['dimension'], ligne['cle']))
+    if not lignes:
+        return
+    if connexion is None:
+        connexion = db.session.connection()
+    
+    instruction = _upsert_agregats(connexion.dialect.name)
+    if instruction is not None:
+        connexion.execute(instruction, lignes)
+        return
+    
+    table = EmissionsAgregat.__table__
+    for ligne in lignes:
+        resultat = connexion.execute(
+            table.update()
+            .where(table.c.dimension == ligne['dimension'], table.c.cle == ligne['cle'])
+            .values(nb_transports=table.c.nb_transports + ligne['nb_transports'],
+                    emis_kg=table.c.emis_kg + ligne['emis_kg'])
+        )
+        if resultat.rowcount == 0:
+            connexion.execute(table.insert().values(**ligne))
+
+
+def reconstruire_agregats():
+    """Recalcule entièrement les agrégats depuis la table des transports
+    
+    Utilisé par la commande `flask reconstruire-agregats` (les agrégats d'une
+    base existante sont initialisés par la migration 0003). Ne valide pas la
+    transaction.
+    """
+    db.session.execute(delete(EmissionsAgregat))
+    
+    emissions = func.coalesce(func.sum(Transport.emis_kg), 0.0)
+    groupes = {
+        DIMENSION_ENERGIE: Transport.energie,
+        DIMENSION_TYPE_VEHICULE: Transport.type_vehicule,
+        DIMENSION_CLIENT: Transport.client_id,
+        DIMENSION_TRANSPORTEUR: Transport.transporteur_id
+    }
+    
+    deltas = DeltasAgregats()
+    total, emis = db.session.execute(select(func.count(Transport.id), emissions)).one()
+    deltas.ajouter_groupe(DIMENSION_TOTAL, None, total, emis)
+    
+    annee = func.extract('year', Transport.created_at)
+    mois = func.extract('month', Transport.created_at)
+    for valeur_annee, valeur_mois, nombre, emis in db.session.execute(
+        select(annee, mois, func.count(Transport.id), emissions).group_by(annee, mois)
+    ):
+        date = datetime(int(valeur_annee), int(valeur_mois), 1) if valeur_annee is not None else None
+        deltas.ajouter_groupe(DIMENSION_MOIS, date, nombre, emis)
+    
+    for dimension, colonne in groupes.items():
+        for valeur, nombre, emis in db.session.execute(
+            select(colonne, func.count(Transport.id), emissions).group_by(colonne)
+        ):
+            deltas.ajouter_groupe(dimension, valeur, nombre, emis)
+    
+    appliquer_deltas_agregats(deltas)
+    logger.info(f"📊 Agrégats d'émissions reconstruits ({total} transports)")
+    return total
+
+
+# Les agrégats doivent connaître l'ancienne valeur des colonnes modifiées,
+# même si l'objet était expiré au moment de l'affectation
+def _historique_complet(cible, valeur, ancienne_valeur, initiateur):
+    pass
+
+
+for _colonne in COLONNES_AGREGATS:
+    event.listen(getattr(Transport, _colonne), 'set', _historique_complet, active_history=True)
+
+
+@event.listens_for(Session, 'before_flush')
+def _agregats_avant_flush(session, contexte, instances):
+    """Mémorise les transports supprimés tant que leurs valeurs sont lisibles"""
+    deltas = DeltasAgregats()
+    for objet in session.deleted:
+        if isinstance(objet, Transport):
+            deltas.retirer(cles_transport(objet), objet.emis_kg)
+    session.info['deltas_agregats'] = deltas
+
+
+@event.listens_for(Session, 'after_flush')
+def _agregats_apres_flush(session, contexte):
+    """Reporte les créations, modifications et suppressions de transports sur les agrégats"""
+    deltas = session.info.pop('deltas_agregats', None) or DeltasAgregats()
+    
+    for objet in session.new:
+        if isinstance(objet, Transport):
+            deltas.ajouter(cles_transport(objet), objet.emis_kg)
+    
+    for objet in session.dirty:
+        if not isinstance(objet, Transport) or objet in session.deleted:
+            continue
+        etat = inspect(objet)
+        anciennes = {}
+        modifie = False
+        for nom in COLONNES_AGREGATS:
+            historique = etat.attrs[nom].history
+            if historique.deleted:
+                modifie = True
+                anciennes[nom] = historique.deleted[0]
+            else:
+                anciennes[nom] = getattr(objet, nom)
+        if modifie:
+            deltas.retirer(cles_transport(SimpleNamespace(**anciennes)), anciennes['emis_kg'])
+            deltas.ajouter(cles_transport(objet), objet.emis_kg)
+    
+    if deltas:
+        appliquer_deltas_agregats(deltas, session.connection())
+
+
+@click.command('reconstruire-agregats')
+@with_appcontext
+def commande_reconstruire_agregats():
+    """Recalcule les agrégats du dashboard depuis la table des transports"""
+    total = reconstruire_agregats()
+    db.session.commit()
+    print(f"✅ Agrégats d'émissions reconstruits ({total} transports)")
@@ -1,167 +1,670 @@
 #!/usr/bin/env python3
 """
-Script de sauvegarde et restauration de la base de données
+Sauvegarde et restauration de la base de données, sans interruption du service
+
+Une sauvegarde est un dossier de `backups/base/` : fichiers compressés (gzip)
+et `manifest.json` (type, moteur, révision du schéma, instant de l'image, puis
+lignes, taille et SHA-256 de chaque fichier). Le manifeste est écrit en dernier :
+un dossier sans manifeste est une sauvegarde interrompue, ignorée.
+
+- SQLite : API de sauvegarde en ligne (en une étape en WAL, où la lecture ne
+  bloque pas les écritures ; sinon par étapes de --pages pages, les écritures
+  de l'application passant entre deux étapes).
+- PostgreSQL : export logique table par table en COPY (CSV) diffusé vers le
+  fichier compressé, dans une transaction REPEATABLE READ en lecture seule
+  (image cohérente, aucun verrou bloquant les écritures).
+- Incrémentale : lignes dont `updated_at` est postérieur à la sauvegarde
+  précédente (ou à --depuis) ; les petites tables sans `updated_at`
+  (référentiel, agrégats, version du schéma) sont copiées entières. Les
+  suppressions ne sont pas suivies : une sauvegarde complète régulière reste
+  nécessaire.
+
+La restauration vérifie d'abord les sommes de contrôle. Une sauvegarde
+complète remplace la base (après une sauvegarde de l'état actuel) ; une
+incrémentale met à jour les lignes par clé primaire et se restaure après sa
+sauvegarde complète, dans l'ordre.
+
+    python backup_database.py sauvegarder
+    python backup_database.py sauvegarder --incrementale
+    python backup_database.py lister
+    python backup_database.py verifier 20250101_120000_000_complete
+    python backup_database.py restaurer 20250101_120000_000_complete 20250102_120000_000_incrementale
 """
 
+import argparse
+import gzip
+import hashlib
+import json
 import os
 import shutil
 import sqlite3
-from datetime import datetime
-
-def backup_database():
-    """Sauvegarder la base de données"""
-    print("💾 SAUVEGARDE DE LA BASE DE DONNÉES")
-    print("=" * 50)
-    
-    # Déterminer le fichier source
-    source_db = 'instance/myxploit_dev.db'
-    
-    if not os.path.exists(source_db):
-        print(f"❌ Base de données source non trouvée: {source_db}")
-        return False
-    
-    # Créer le nom de sauvegarde avec timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_dir = 'backups'
-    backup_file = f"{backup_dir}/myxploit_dev_backup_{timestamp}.db"
-    
-    # Créer le dossier de sauvegarde s'il n'existe pas
-    os.makedirs(backup_dir, exist_ok=True)
-    
+import sys
+import time
+from datetime import datetime, timedelta
+from urllib.request import pathname2url
+
+from sqlalchemy import create_engine, MetaData
+from sqlalchemy.engine import make_url
+
+DOSSIER_DEFAUT = os.path.join('backups', 'base')
+NOM_MANIFESTE = 'manifest.json'
+FORMAT_MANIFESTE = 1
+# Sauvegardes de l'état remplacé par une restauration : jamais restaurées par défaut
+MOTIF_DEMANDEE = 'demandee'
+MOTIF_AVANT_RESTAURATION = 'avant_restauration'
+
+# Pages SQLite copiées par étape de l'API de sauvegarde (4 Ko par page en général)
+PAGES_PAR_ETAPE = 4096
+# Une écriture d'une autre connexion relance la copie par étapes depuis le début :
+# au-delà de ce nombre de relances, copie en une seule étape
+RELANCES_MAX = 3
+# Attente quand une étape trouve la base verrouillée par un écrivain
+ATTENTE_VERROU_S = 0.05
+NIVEAU_COMPRESSION = 6
+TAILLE_BLOC = 1024 * 1024
+
+# Une transaction ouverte avant l'image peut valider ensuite un `updated_at`
+# antérieur : l'incrémentale suivante repart un peu avant l'image précédente
+MARGE_INCREMENTALE = timedelta(minutes=5)
+# Format des dates écrites par SQLAlchemy dans SQLite (comparaison textuelle)
+FORMAT_DATE_SQLITE = '%Y-%m-%d %H:%M:%S.%f'
+
+
+class SortieCompressee:
+    """Fichier gzip dont la taille et le SHA-256 (octets compressés) sont calculés à l'écriture"""
+
+    def __init__(self, chemin, niveau=NIVEAU_COMPRESSION):
+        self.chemin = chemin
+        self.niveau = niveau
+        self.taille = 0
+        self._empreinte = hashlib.sha256()
+
+    def write(self, donnees):
+        self._fichier.write(donnees)
+        self._empreinte.update(donnees)
+        self.taille += len(donnees)
+        return len(donnees)
+
+    def flush(self):
+        self._fichier.flush()
+
+    def __enter__(self):
+        self._fichier = open(self.chemin, 'wb')
+        # mtime fixe : deux sauvegardes identiques ont la même empreinte
+        self.flux = gzip.GzipFile(filename='', mode='wb', fileobj=self, compresslevel=self.niveau, mtime=0)
+        return self
+
+    def __exit__(self, *exception):
+        self.flux.close()
+        self._fichier.close()
+
+    @property
+    def sha256(self):
+        return self._empreinte.hexdigest()
+
+    def description(self, **informations):
+        return {'nom': os.path.basename(self.chemin), 'taille': self.taille, 'sha256': self.sha256, **informations}
+
+
+def sha256_fichier(chemin):
+    empreinte = hashlib.sha256()
+    with open(chemin, 'rb') as fichier:
+        for bloc in iter(lambda: fichier.read(TAILLE_BLOC), b''):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+def compresser(source, destination, niveau=NIVEAU_COMPRESSION, **informations):
+    """Compresse un fichier ; retourne sa description pour le manifeste"""
+    with open(source, 'rb') as entree, SortieCompressee(destination, niveau) as sortie:
+        shutil.copyfileobj(entree, sortie.flux, TAILLE_BLOC)
+    return sortie.description(**informations)
+
+
+def decompresser(source, destination):
+    with gzip.open(source, 'rb') as entree, open(destination, 'wb') as sortie:
+        shutil.copyfileobj(entree, sortie, TAILLE_BLOC)
+
+
+def nom_sql(nom):
+    """Identifiant SQL entre guillemets"""
+    return '"' + nom.replace('"', '""') + '"'
+
+
+def url_application():
+    """URL de la base de l'application (configuration, DATABASE_URL, dossier instance)"""
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+
+    with app.app_context():
+        url = db.engine.url.render_as_string(hide_password=False)
+        db.engine.dispose()
+    return url
+
+
+def moteur_de(url):
+    moteur = make_url(url).get_backend_name()
+    if moteur not in ('sqlite', 'postgresql'):
+        raise ValueError(f"Base non prise en charge: {moteur}")
+    return moteur
+
+
+def chemin_sqlite(url):
+    chemin = make_url(url).database
+    if not chemin or chemin == ':memory:':
+        raise ValueError(f"Base SQLite sans fichier: {url}")
+    if not os.path.exists(chemin):
+        raise FileNotFoundError(f"Base SQLite introuvable: {chemin}")
+    return chemin
+
+
+def tables_ordonnees(url):
+    """Tables de la base, parents avant enfants : `[(nom, clé primaire, a updated_at)]`"""
+    moteur = create_engine(url)
     try:
-        # Copier le fichier
-        shutil.copy2(source_db, backup_file)
-        
-        # Vérifier la sauvegarde
-        if os.path.exists(backup_file):
-            source_size = os.path.getsize(source_db)
-            backup_size = os.path.getsize(backup_file)
-            
-            print(f"✅ Sauvegarde créée: {backup_file}")
-            print(f"   Taille source: {source_size} octets")
-            print(f"   Taille sauvegarde: {backup_size} octets")
-            
-            if source_size == backup_size:
-                print("✅ Sauvegarde vérifiée avec succès")
-                return True
-            else:
-                print("❌ Erreur: Tailles différentes")
-                return False
-        else:
-            print("❌ Erreur: Fichier de sauvegarde non créé")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Erreur lors de la sauvegarde: {e}")
-        return False
-
-def restore_database(backup_file=None):
-    """Restaurer la base de données"""
-    print("🔄 RESTAURATION DE LA BASE DE DONNÉES")
-    print("=" * 50)
-    
-    # Si aucun fichier spécifié, prendre le plus récent
-    if not backup_file:
-        backup_dir = 'backups'
-        if not os.path.exists(backup_dir):
-            print("❌ Aucun dossier de sauvegarde trouvé")
-            return False
-        
-        backup_files = [f for f in os.listdir(backup_dir) if f.endswith('.db')]
-        if not backup_files:
-            print("❌ Aucun fichier de sauvegarde trouvé")
-            return False
-        
-        # Prendre le plus récent
-        backup_files.sort(reverse=True)
-        backup_file = os.path.join(backup_dir, backup_files[0])
-        print(f"📁 Utilisation de la sauvegarde la plus récente: {backup_file}")
-    
-    if not os.path.exists(backup_file):
-        print(f"❌ Fichier de sauvegarde non trouvé: {backup_file}")
-        return False
-    
-    # Créer une sauvegarde de la base actuelle avant restauration
-    current_db = 'instance/myxploit_dev.db'
-    if os.path.exists(current_db):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        current_backup = f"backups/myxploit_dev_before_restore_{timestamp}.db"
-        shutil.copy2(current_db, current_backup)
-        print(f"💾 Sauvegarde de la base actuelle: {current_backup}")
-    
+        metadonnees = MetaData()
+        metadonnees.reflect(bind=moteur)
+        return [
+            (table.name, [colonne.name for colonne in table.primary_key.columns], 'updated_at' in table.columns)
+            for table in metadonnees.sorted_tables
+        ]
+    finally:
+        moteur.dispose()
+
+
+def uri_sqlite(chemin, mode):
+    return f'file:{pathname2url(os.path.abspath(chemin))}?mode={mode}'
+
+
+def _revision(curseur, tables=None):
+    """Révision Alembic lue par `curseur` (None si la base n'a pas de table alembic_version)"""
+    if tables is not None and 'alembic_version' not in tables:
+        # Une requête en échec annulerait la transaction de l'image PostgreSQL
+        return None
     try:
-        # Restaurer
-        shutil.copy2(backup_file, current_db)
-        
-        # Vérifier la restauration
-        if os.path.exists(current_db):
-            backup_size = os.path.getsize(backup_file)
-            restored_size = os.path.getsize(current_db)
-            
-            print(f"✅ Base de données restaurée")
-            print(f"   Taille sauvegarde: {backup_size} octets")
-            print(f"   Taille restaurée: {restored_size} octets")
-            
-            if backup_size == restored_size:
-                print("✅ Restauration vérifiée avec succès")
-                return True
-            else:
-                print("❌ Erreur: Tailles différentes après restauration")
-                return False
-        else:
-            print("❌ Erreur: Base de données non restaurée")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Erreur lors de la restauration: {e}")
-        return False
-
-def list_backups():
-    """Lister les sauvegardes disponibles"""
-    print("📋 SAUVEGARDES DISPONIBLES")
-    print("=" * 50)
-    
-    backup_dir = 'backups'
-    if not os.path.exists(backup_dir):
-        print("❌ Aucun dossier de sauvegarde trouvé")
-        return
-    
-    backup_files = [f for f in os.listdir(backup_dir) if f.endswith('.db')]
-    if not backup_files:
-        print("❌ Aucun fichier de sauvegarde trouvé")
+        curseur.execute('SELECT version_num FROM alembic_version')
+    except sqlite3.Error:
+        return None
+    ligne = curseur.fetchone()
+    return ligne[0] if ligne else None
+
+
+# --- Sauvegarde -------------------------------------------------------------
+
+class CopieRelancee(Exception):
+    """Copie SQLite par étapes relancée trop souvent par les écritures concurrentes"""
+
+
+def copier_sqlite(source, destination, pages=PAGES_PAR_ETAPE):
+    """Copie cohérente d'une base SQLite ouverte, par l'API de sauvegarde en ligne
+
+    En WAL, une seule étape : la lecture ne bloque pas les écritures. Sinon, par
+    étapes de `pages` pages ; si les écritures relancent la copie plus de
+    RELANCES_MAX fois, une seule étape (écritures en attente le temps de la copie).
+    """
+    if source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+        source.backup(destination)
         return
-    
-    backup_files.sort(reverse=True)
-    
-    for i, backup_file in enumerate(backup_files):
-        file_path = os.path.join(backup_dir, backup_file)
-        size = os.path.getsize(file_path)
-        mtime = datetime.fromtimestamp(os.path.getmtime(file_path))
-        print(f"{i+1}. {backup_file}")
-        print(f"   Taille: {size} octets")
-        print(f"   Date: {mtime}")
-        print()
-
-if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1:
-        command = sys.argv[1]
-        
-        if command == "backup":
-            backup_database()
-        elif command == "restore":
-            backup_file = sys.argv[2] if len(sys.argv) > 2 else None
-            restore_database(backup_file)
-        elif command == "list":
-            list_backups()
+    suivi = {'restant': None, 'relances': 0}
+
+    def progression(statut, restant, total):
+        # Copie relancée (ou base verrouillée) : pas de progrès depuis l'étape précédente
+        if suivi['restant'] is not None and restant >= suivi['restant']:
+            suivi['relances'] += 1
+            if suivi['relances'] > RELANCES_MAX:
+                raise CopieRelancee()
+        suivi['restant'] = restant
+
+    try:
+        source.backup(destination, pages=pages, progress=progression, sleep=ATTENTE_VERROU_S)
+    except CopieRelancee:
+        source.backup(destination)
+
+
+def _sauvegarde_sqlite_complete(url, destination, niveau, pages):
+    chemin = chemin_sqlite(url)
+    temporaire = os.path.join(destination, 'base.db.tmp')
+    # Lecture seule : la sauvegarde ne peut pas modifier la base source
+    source = sqlite3.connect(uri_sqlite(chemin, 'ro'), uri=True)
+    copie = sqlite3.connect(temporaire)
+    try:
+        image = datetime.utcnow()
+        copier_sqlite(source, copie, pages)
+        revision = _revision(copie.cursor())
+        lignes = {
+            nom: copie.execute(f'SELECT COUNT(*) FROM {nom_sql(nom)}').fetchone()[0]
+            for (nom,) in copie.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+        }
+    finally:
+        copie.close()
+        source.close()
+    try:
+        fichier = compresser(temporaire, os.path.join(destination, 'base.db.gz'), niveau, contenu='sqlite', lignes=sum(lignes.values()))
+    finally:
+        os.remove(temporaire)
+    return image, revision, [fichier], {'lignes_par_table': lignes}
+
+
+def _sauvegarde_sqlite_incrementale(url, destination, niveau, depuis):
+    chemin = chemin_sqlite(url)
+    tables = tables_ordonnees(url)
+    temporaire = os.path.join(destination, 'increment.db.tmp')
+    source = sqlite3.connect(uri_sqlite(chemin, 'ro'), uri=True, isolation_level=None)
+    try:
+        source.execute('ATTACH DATABASE ? AS increment', (uri_sqlite(temporaire, 'rwc'),))
+        image = datetime.utcnow()
+        # Une seule transaction : toutes les tables sont lues dans le même état
+        source.execute('BEGIN')
+        revision = _revision(source.cursor())
+        contenu = []
+        for nom, cle, suivie in tables:
+            requete = f'CREATE TABLE increment.{nom_sql(nom)} AS SELECT * FROM main.{nom_sql(nom)}'
+            parametres = ()
+            if suivie:
+                requete += ' WHERE updated_at > ?'
+                parametres = (depuis.strftime(FORMAT_DATE_SQLITE),)
+            source.execute(requete, parametres)
+            lignes = source.execute(f'SELECT COUNT(*) FROM increment.{nom_sql(nom)}').fetchone()[0]
+            contenu.append({'table': nom, 'cle': cle, 'mode': 'modifications' if suivie else 'complete', 'lignes': lignes})
+        source.execute('COMMIT')
+        source.execute('DETACH DATABASE increment')
+    finally:
+        source.close()
+    try:
+        fichier = compresser(
+            temporaire, os.path.join(destination, 'increment.db.gz'), niveau,
+            contenu='sqlite', lignes=sum(table['lignes'] for table in contenu)
+        )
+    finally:
+        os.remove(temporaire)
+    return image, revision, [fichier], {'tables': contenu}
+
+
+def _sauvegarde_postgresql(url, destination, niveau, depuis=None):
+    tables = tables_ordonnees(url)
+    moteur = create_engine(url)
+    connexion = moteur.raw_connection()
+    try:
+        connexion.rollback()
+        # Image unique pour toutes les tables, sans verrou bloquant les écritures
+        connexion.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        curseur = connexion.cursor()
+        curseur.execute("SELECT now() AT TIME ZONE 'UTC'")
+        image = curseur.fetchone()[0]
+        revision = _revision(curseur, [nom for nom, _, _ in tables])
+        fichiers = []
+        for numero, (nom, cle, suivie) in enumerate(tables, start=1):
+            selection = f'SELECT * FROM {nom_sql(nom)}'
+            if depuis is not None and suivie:
+                selection += curseur.mogrify(' WHERE updated_at > %s', (depuis,)).decode()
+            chemin = os.path.join(destination, f'{numero:03d}_{nom}.csv.gz')
+            with SortieCompressee(chemin, niveau) as sortie:
+                curseur.copy_expert(f'COPY ({selection}) TO STDOUT WITH (FORMAT csv, HEADER)', sortie.flux)
+            mode = 'modifications' if depuis is not None and suivie else 'complete'
+            fichiers.append(sortie.description(contenu='csv', table=nom, cle=cle, mode=mode, lignes=curseur.rowcount))
+        connexion.rollback()
+    finally:
+        connexion.close()
+        moteur.dispose()
+    return image, revision, fichiers, {}
+
+
+def _dossier_sauvegarde(dossier, type_sauvegarde):
+    nom = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}_{type_sauvegarde}"
+    destination = os.path.join(dossier, nom)
+    os.makedirs(destination)
+    return nom, destination
+
+
+def _ecrire_manifeste(destination, manifeste):
+    temporaire = os.path.join(destination, NOM_MANIFESTE + '.tmp')
+    with open(temporaire, 'w', encoding='utf-8') as fichier:
+        json.dump(manifeste, fichier, ensure_ascii=False, indent=2, default=str)
+    os.replace(temporaire, os.path.join(destination, NOM_MANIFESTE))
+
+
+def sauvegarder(url, dossier=DOSSIER_DEFAUT, incrementale=False, depuis=None, niveau=NIVEAU_COMPRESSION,
+                pages=PAGES_PAR_ETAPE, motif=MOTIF_DEMANDEE):
+    """Crée une sauvegarde complète ou incrémentale ; retourne son manifeste
+
+    Incrémentale sans `depuis` : lignes modifiées depuis la dernière sauvegarde
+    de la même base (ValueError s'il n'y en a aucune).
+    """
+    moteur = moteur_de(url)
+    source = make_url(url).render_as_string(hide_password=True)
+    parent = None
+    if incrementale and depuis is None:
+        precedente = derniere_sauvegarde(dossier, source)
+        if precedente is None:
+            raise ValueError("Aucune sauvegarde précédente de cette base : faire d'abord une sauvegarde complète")
+        parent = precedente['nom']
+        depuis = datetime.fromisoformat(str(precedente['image'])) - MARGE_INCREMENTALE
+
+    type_sauvegarde = 'incrementale' if incrementale else 'complete'
+    nom, destination = _dossier_sauvegarde(dossier, type_sauvegarde)
+    debut = time.perf_counter()
+    try:
+        if moteur == 'sqlite' and incrementale:
+            image, revision, fichiers, details = _sauvegarde_sqlite_incrementale(url, destination, niveau, depuis)
+        elif moteur == 'sqlite':
+            image, revision, fichiers, details = _sauvegarde_sqlite_complete(url, destination, niveau, pages)
         else:
-            print("Usage: python backup_database.py [backup|restore|list] [fichier_sauvegarde]")
-    else:
-        print("Usage: python backup_database.py [backup|restore|list] [fichier_sauvegarde]")
-        print("\nExemples:")
-        print("  python backup_database.py backup")
-        print("  python backup_database.py restore")
-        print("  python backup_database.py restore backups/myxploit_dev_backup_20250101_120000.db")
-        print("  python backup_database.py list")
+            image, revision, fichiers, details = _sauvegarde_postgresql(url, destination, niveau, depuis if incrementale else None)
+    except BaseException:
+        shutil.rmtree(destination, ignore_errors=True)
+        raise
+
+    manifeste = {
+        'format': FORMAT_MANIFESTE,
+        'nom': nom,
+        'type': type_sauvegarde,
+        'moteur': moteur,
+        'source': source,
+        'revision': revision,
+        'image': image.isoformat(),
+        'depuis': depuis.isoformat() if depuis else None,
+        'parent': parent,
+        'motif': motif,
+        'compression': 'gzip',
+        'duree_s': round(time.perf_counter() - debut, 3),
+        'fichiers': fichiers,
+        **details,
+    }
+    _ecrire_manifeste(destination, manifeste)
+    return manifeste
+
+
+# --- Consultation et vérification ---------------------------------------------
+
+def lire_manifeste(dossier, nom):
+    chemin = os.path.join(dossier, nom, NOM_MANIFESTE)
+    if not os.path.exists(chemin):
+        raise FileNotFoundError(f"Sauvegarde introuvable ou incomplète: {os.path.join(dossier, nom)}")
+    with open(chemin, encoding='utf-8') as fichier:
+        return json.load(fichier)
+
+
+def sauvegardes(dossier=DOSSIER_DEFAUT):
+    """Manifestes des sauvegardes terminées, de la plus ancienne à la plus récente"""
+    if not os.path.isdir(dossier):
+        return []
+    return [
+        lire_manifeste(dossier, nom) for nom in sorted(os.listdir(dossier))
+        if os.path.exists(os.path.join(dossier, nom, NOM_MANIFESTE))
+    ]
+
+
+def derniere_sauvegarde(dossier, source):
+    """Manifeste de la sauvegarde la plus récente de `source` (URL sans mot de passe), ou None"""
+    candidates = [manifeste for manifeste in sauvegardes(dossier) if manifeste['source'] == source]
+    return candidates[-1] if candidates else None
+
+
+def chaine_restauration(dossier, source):
+    """Noms de la dernière sauvegarde complète demandée de `source` et des incrémentales qui la suivent"""
+    chaine = []
+    for manifeste in sauvegardes(dossier):
+        if manifeste['source'] != source or manifeste.get('motif') == MOTIF_AVANT_RESTAURATION:
+            continue
+        if manifeste['type'] == 'complete':
+            chaine = [manifeste['nom']]
+        elif chaine:
+            chaine.append(manifeste['nom'])
+    return chaine
+
+
+def verifier(dossier, nom):
+    """Erreurs de la sauvegarde `nom` (fichiers manquants, tailles ou empreintes différentes)"""
+    manifeste = lire_manifeste(dossier, nom)
+    erreurs = []
+    for fichier in manifeste['fichiers']:
+        chemin = os.path.join(dossier, nom, fichier['nom'])
+        if not os.path.exists(chemin):
+            erreurs.append(f"{fichier['nom']}: fichier manquant")
+        elif os.path.getsize(chemin) != fichier['taille']:
+            erreurs.append(f"{fichier['nom']}: taille {os.path.getsize(chemin)} au lieu de {fichier['taille']}")
+        elif sha256_fichier(chemin) != fichier['sha256']:
+            erreurs.append(f"{fichier['nom']}: SHA-256 différent")
+    return erreurs
+
+
+# --- Restauration ------------------------------------------------------------
+
+def _verifier_revision(revision_base, manifeste):
+    if revision_base != manifeste['revision']:
+        raise ValueError(
+            f"Schéma de la base en révision {revision_base}, sauvegarde en révision {manifeste['revision']} : "
+            "migrer la base à la même révision avant de restaurer"
+        )
+
+
+def _restaurer_sqlite_complete(url, chemin_sauvegarde, pages):
+    chemin = make_url(url).database
+    temporaire = chemin + '.restauration.tmp'
+    decompresser(os.path.join(chemin_sauvegarde, 'base.db.gz'), temporaire)
+    try:
+        copie = sqlite3.connect(temporaire)
+        cible = sqlite3.connect(chemin)
+        try:
+            if copie.execute('PRAGMA quick_check').fetchone()[0] != 'ok':
+                raise ValueError('Fichier de sauvegarde SQLite corrompu')
+            copier_sqlite(copie, cible, pages)
+        finally:
+            cible.close()
+            copie.close()
+    finally:
+        os.remove(temporaire)
+
+
+def _requete_fusion(nom, colonnes, cle, source):
+    """INSERT ... ON CONFLICT (clé) DO UPDATE, commun à SQLite et PostgreSQL"""
+    liste = ', '.join(nom_sql(colonne) for colonne in colonnes)
+    mises_a_jour = ', '.join(f'{nom_sql(colonne)} = excluded.{nom_sql(colonne)}' for colonne in colonnes if colonne not in cle)
+    conflit = ', '.join(nom_sql(colonne) for colonne in cle)
+    action = f'DO UPDATE SET {mises_a_jour}' if mises_a_jour else 'DO NOTHING'
+    # WHERE true : lève l'ambiguïté de ON CONFLICT après un SELECT pour SQLite
+    return f'INSERT INTO {nom_sql(nom)} ({liste}) SELECT {liste} FROM {source} WHERE true ON CONFLICT ({conflit}) {action}'
+
+
+def _requete_suppression_absentes(nom, cle, source):
+    """Supprime les lignes d'une table copiée entière qui ne sont plus dans la sauvegarde"""
+    colonnes = ', '.join(nom_sql(colonne) for colonne in cle)
+    return f'DELETE FROM {nom_sql(nom)} WHERE ({colonnes}) NOT IN (SELECT {colonnes} FROM {source})'
+
+
+def _restaurer_sqlite_incrementale(url, chemin_sauvegarde, manifeste):
+    chemin = make_url(url).database
+    temporaire = chemin + '.increment.tmp'
+    decompresser(os.path.join(chemin_sauvegarde, 'increment.db.gz'), temporaire)
+    cible = sqlite3.connect(chemin, isolation_level=None)
+    try:
+        _verifier_revision(_revision(cible.cursor()), manifeste)
+        cible.execute('ATTACH DATABASE ? AS increment', (temporaire,))
+        cible.execute('BEGIN IMMEDIATE')
+        try:
+            for table in manifeste['tables']:
+                source = f"increment.{nom_sql(table['table'])}"
+                colonnes = [ligne[1] for ligne in cible.execute(f"PRAGMA increment.table_info({nom_sql(table['table'])})")]
+                cible.execute(_requete_fusion(table['table'], colonnes, table['cle'], source))
+            for table in reversed(manifeste['tables']):
+                if table['mode'] == 'complete':
+                    cible.execute(_requete_suppression_absentes(table['table'], table['cle'], f"increment.{nom_sql(table['table'])}"))
+            cible.execute('COMMIT')
+        except BaseException:
+            cible.execute('ROLLBACK')
+            raise
+        cible.execute('DETACH DATABASE increment')
+    finally:
+        cible.close()
+        os.remove(temporaire)
+
+
+def _restaurer_postgresql(url, chemin_sauvegarde, manifeste):
+    moteur = create_engine(url)
+    connexion = moteur.raw_connection()
+    try:
+        curseur = connexion.cursor()
+        curseur.execute("SELECT to_regclass('alembic_version') IS NOT NULL")
+        _verifier_revision(_revision(curseur, ['alembic_version'] if curseur.fetchone()[0] else []), manifeste)
+        connexion.rollback()
+        fichiers = manifeste['fichiers']
+        if manifeste['type'] == 'complete':
+            curseur.execute('TRUNCATE ' + ', '.join(nom_sql(fichier['table']) for fichier in fichiers))
+        for fichier in fichiers:
+            nom = fichier['table']
+            with gzip.open(os.path.join(chemin_sauvegarde, fichier['nom']), 'rb') as entree:
+                if manifeste['type'] == 'complete':
+                    curseur.copy_expert(f'COPY {nom_sql(nom)} FROM STDIN WITH (FORMAT csv, HEADER)', entree)
+                    continue
+                temporaire = nom_sql(f'restauration_{nom}')
+                curseur.execute(f'CREATE TEMP TABLE {temporaire} (LIKE {nom_sql(nom)}) ON COMMIT DROP')
+                curseur.copy_expert(f'COPY {temporaire} FROM STDIN WITH (FORMAT csv, HEADER)', entree)
+            curseur.execute(
+                'SELECT column_name FROM information_schema.columns '
+                'WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position', (nom,)
+            )
+            colonnes = [ligne[0] for ligne in curseur.fetchall()]
+            curseur.execute(_requete_fusion(nom, colonnes, fichier['cle'], temporaire))
+        if manifeste['type'] != 'complete':
+            for fichier in reversed(fichiers):
+                if fichier['mode'] == 'complete':
+                    curseur.execute(_requete_suppression_absentes(fichier['table'], fichier['cle'], nom_sql(f"restauration_{fichier['table']}")))
+        # Séquences des clés `id` au-delà des lignes restaurées
+        for fichier in fichiers:
+            if fichier['cle'] == ['id']:
+                nom = nom_sql(fichier['table'])
+                curseur.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {nom}",
+                    (fichier['table'],)
+                )
+        connexion.commit()
+    except BaseException:
+        connexion.rollback()
+        raise
+    finally:
+        connexion.close()
+        moteur.dispose()
+
+
+def restaurer(url, noms, dossier=DOSSIER_DEFAUT, sauvegarde_prealable=True, pages=PAGES_PAR_ETAPE):
+    """Restaure une ou plusieurs sauvegardes, dans l'ordre donné
+
+    Toutes les sauvegardes sont vérifiées avant la première écriture. Retourne
+    le manifeste de la sauvegarde de l'état actuel (None si non demandée).
+    """
+    moteur = moteur_de(url)
+    manifestes = []
+    for nom in noms:
+        manifeste = lire_manifeste(dossier, nom)
+        if manifeste['moteur'] != moteur:
+            raise ValueError(f"{nom}: sauvegarde {manifeste['moteur']}, base {moteur}")
+        erreurs = verifier(dossier, nom)
+        if erreurs:
+            raise ValueError(f"{nom}: sauvegarde altérée ({'; '.join(erreurs)})")
+        manifestes.append(manifeste)
+
+    prealable = None
+    if sauvegarde_prealable and (moteur != 'sqlite' or os.path.exists(make_url(url).database)):
+        prealable = sauvegarder(url, dossier, motif=MOTIF_AVANT_RESTAURATION)
+
+    for manifeste in manifestes:
+        chemin_sauvegarde = os.path.join(dossier, manifeste['nom'])
+        if moteur == 'postgresql':
+            _restaurer_postgresql(url, chemin_sauvegarde, manifeste)
+        elif manifeste['type'] == 'complete':
+            _restaurer_sqlite_complete(url, chemin_sauvegarde, pages)
+        else:
+            _restaurer_sqlite_incrementale(url, chemin_sauvegarde, manifeste)
+    return prealable
+
+
+# --- Ligne de commande ---------------------------------------------------------
+
+def _taille_lisible(octets):
+    for unite in ('o', 'Ko', 'Mo', 'Go'):
+        if octets < 1024 or unite == 'Go':
+            return f"{octets:.0f} {unite}" if unite == 'o' else f"{octets:.1f} {unite}"
+        octets /= 1024
+
+
+def _afficher(manifeste):
+    taille = sum(fichier['taille'] for fichier in manifeste['fichiers'])
+    lignes = sum(fichier.get('lignes') or 0 for fichier in manifeste['fichiers'])
+    print(f"   {manifeste['nom']}  {manifeste['moteur']}  révision {manifeste['revision']}")
+    print(f"   image {manifeste['image']}" + (f"  depuis {manifeste['depuis']}" if manifeste['depuis'] else ''))
+    print(f"   {len(manifeste['fichiers'])} fichier(s), {lignes} lignes, {_taille_lisible(taille)}, {manifeste['duree_s']}s")
+
+
+def _arguments(arguments=None):
+    parseur = argparse.ArgumentParser(description="Sauvegarde et restauration de la base de données")
+    parseur.add_argument('--base', help="URL SQLAlchemy de la base (défaut: base de l'application)")
+    parseur.add_argument('--dossier', default=DOSSIER_DEFAUT, help=f"dossier des sauvegardes (défaut: {DOSSIER_DEFAUT})")
+    commandes = parseur.add_subparsers(dest='commande', required=True)
+
+    sauvegarde = commandes.add_parser('sauvegarder', aliases=['backup'], help="crée une sauvegarde")
+    sauvegarde.add_argument('--incrementale', action='store_true', help="lignes modifiées depuis la dernière sauvegarde")
+    sauvegarde.add_argument('--depuis', type=datetime.fromisoformat, help="incrémentale depuis cette date UTC (AAAA-MM-JJ[THH:MM])")
+    sauvegarde.add_argument('--niveau', type=int, default=NIVEAU_COMPRESSION, choices=range(1, 10), metavar='1-9', help="niveau de compression gzip")
+    sauvegarde.add_argument('--pages', type=int, default=PAGES_PAR_ETAPE, help="SQLite : pages copiées par étape")
+
+    restauration = commandes.add_parser('restaurer', aliases=['restore'], help="restaure une ou plusieurs sauvegardes, dans l'ordre")
+    restauration.add_argument('noms', nargs='*', help="sauvegardes à restaurer (défaut: dernière complète et incrémentales suivantes)")
+    restauration.add_argument('--sans-sauvegarde-prealable', action='store_true', help="ne pas sauvegarder l'état actuel avant")
+
+    commandes.add_parser('lister', aliases=['list'], help="liste les sauvegardes")
+    verification = commandes.add_parser('verifier', help="contrôle tailles et SHA-256 d'une sauvegarde")
+    verification.add_argument('nom')
+    return parseur.parse_args(arguments)
+
+
+def main(arguments=None):
+    args = _arguments(arguments)
+    try:
+        if args.commande in ('lister', 'list'):
+            print("📋 SAUVEGARDES DISPONIBLES")
+            liste = sauvegardes(args.dossier)
+            if not liste:
+                print(f"❌ Aucune sauvegarde dans {args.dossier}")
+            for manifeste in liste:
+                print(f"{'🗄️' if manifeste['type'] == 'complete' else '➕'} {manifeste['type']}")
+                _afficher(manifeste)
+            return 0
+
+        if args.commande == 'verifier':
+            erreurs = verifier(args.dossier, args.nom)
+            for erreur in erreurs:
+                print(f"❌ {erreur}")
+            if not erreurs:
+                print(f"✅ Sauvegarde {args.nom} intacte")
+            return 1 if erreurs else 0
+
+        url = args.base or url_application()
+        if args.commande in ('sauvegarder', 'backup'):
+            print("💾 SAUVEGARDE DE LA BASE DE DONNÉES")
+            manifeste = sauvegarder(
+                url, args.dossier, incrementale=args.incrementale or args.depuis is not None,
+                depuis=args.depuis, niveau=args.niveau, pages=args.pages
+            )
+            print(f"✅ Sauvegarde {manifeste['type']} créée")
+            _afficher(manifeste)
+            return 0
+
+        noms = args.noms or chaine_restauration(args.dossier, make_url(url).render_as_string(hide_password=True))
+        if not noms:
+            print(f"❌ Aucune sauvegarde complète de cette base dans {args.dossier}")
+            return 1
+        print(f"🔄 RESTAURATION DE LA BASE DE DONNÉES: {', '.join(noms)}")
+        prealable = restaurer(url, noms, args.dossier, sauvegarde_prealable=not args.sans_sauvegarde_prealable)
+        if prealable:
+            print(f"💾 État précédent sauvegardé: {prealable['nom']}")
+        print("✅ Base de données restaurée")
+        return 0
+    except (ValueError, FileNotFoundError, sqlite3.Error) as e:
+        print(f"❌ {e}")
+        return 1
+
 
+if __name__ == '__main__':
+    sys.exit(main())
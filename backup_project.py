@@ -1,331 +1,401 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Script de sauvegarde automatique du projet MyXploit
-Crée une sauvegarde complète avec horodatage
+Instantanés du projet MyXploit, dédoublonnés par contenu
+
+Chaque fichier est stocké une seule fois, compressé, sous le nom de l'empreinte
+SHA-256 de son contenu (`backups/projet/objets/`). Un instantané n'est qu'un
+manifeste JSON (`backups/projet/instantanes/`) : chemin, empreinte, taille,
+date de modification et droits de chaque fichier. Deux instantanés partagent
+donc tous leurs fichiers inchangés.
+
+Un fichier dont la taille et la date de modification n'ont pas changé depuis
+l'instantané précédent n'est pas relu : la durée d'un instantané et la place
+qu'il occupe dépendent de ce qui a changé, pas de la taille du projet. Les
+fichiers modifiés sont lus, hachés et compressés en parallèle (zlib et hashlib
+libèrent le GIL : les threads occupent plusieurs cœurs).
+
+La base de données (instance/, *.db) est exclue : voir backup_database.py.
+
+    python backup_project.py                      # nouvel instantané
+    python backup_project.py list                 # instantanés existants
+    python backup_project.py restaurer 2025-08-21_16-46-41 --cible /tmp/myxploit
+    python backup_project.py restaurer 2025-08-21_16-46-41 --cible . templates/base.html
+    python backup_project.py verifier
+    python backup_project.py nettoyer --garder 10
 """
 
+import argparse
+import fnmatch
+import gzip
+import hashlib
+import json
 import os
 import shutil
-import zipfile
-import json
-from datetime import datetime
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
-def create_backup():
-    """Crée une sauvegarde complète du projet"""
-    
-    # Configuration
-    project_root = os.path.dirname(os.path.abspath(__file__))
-    backup_dir = os.path.join(project_root, "backups")
-    
-    # Créer le dossier de sauvegarde s'il n'existe pas
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
-        print(f"✅ Dossier de sauvegarde créé : {backup_dir}")
-    
-    # Horodatage pour le nom de la sauvegarde
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    backup_name = f"myxploit_backup_{timestamp}"
-    backup_path = os.path.join(backup_dir, backup_name)
-    
-    # Dossiers et fichiers à sauvegarder
-    items_to_backup = [
-        "app.py",
-        "models.py",
-        "templates/",
-        "static/",
-        "data/",
-        ".vscode/",
-        "*.md",
-        "*.html",
-        "*.py"
-    ]
-    
-    # Fichiers et dossiers à exclure
-    exclude_patterns = [
-        "__pycache__/",
-        "*.pyc",
-        "*.pyo",
-        "*.pyd",
-        ".git/",
-        "backups/",
-        "venv/",
-        "env/",
-        ".env",
-        "*.log",
-        "*.tmp",
-        "*.bak"
+RACINE_PROJET = os.path.dirname(os.path.abspath(__file__))
+DOSSIER_DEFAUT = os.path.join(RACINE_PROJET, 'backups', 'projet')
+FORMAT_MANIFESTE = 1
+
+# Noms de fichiers ou dossiers exclus, à tout niveau de l'arborescence
+EXCLUSIONS = (
+    '.git', 'backups', '__pycache__', 'venv', 'env', '.venv', 'node_modules', 'instance',
+    '.env', '*.pyc', '*.pyo', '*.pyd', '*.log', '*.tmp', '*.bak', '*.db', '*.db-journal', '*.db-wal', '*.db-shm'
+)
+
+NIVEAU_COMPRESSION = 6
+TAILLE_BLOC = 1024 * 1024
+TRAVAILLEURS = os.cpu_count() or 4
+
+
+def exclu(nom, exclusions=EXCLUSIONS):
+    return any(fnmatch.fnmatch(nom, motif) for motif in exclusions)
+
+
+def parcourir(racine, exclusions=EXCLUSIONS):
+    """`(chemin relatif en /, stat)` des fichiers du projet, dossiers exclus non parcourus"""
+    a_visiter = ['']
+    while a_visiter:
+        relatif = a_visiter.pop()
+        with os.scandir(os.path.join(racine, relatif)) as entrees:
+            for entree in entrees:
+                if exclu(entree.name, exclusions):
+                    continue
+                chemin = f'{relatif}/{entree.name}' if relatif else entree.name
+                if entree.is_dir(follow_symlinks=False):
+                    a_visiter.append(chemin)
+                elif entree.is_file(follow_symlinks=False):
+                    yield chemin, entree.stat(follow_symlinks=False)
+
+
+def empreinte_fichier(chemin):
+    empreinte = hashlib.sha256()
+    with open(chemin, 'rb') as fichier:
+        for bloc in iter(lambda: fichier.read(TAILLE_BLOC), b''):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+class Depot:
+    """Objets compressés adressés par l'empreinte de leur contenu, et manifestes des instantanés"""
+
+    def __init__(self, dossier=DOSSIER_DEFAUT, niveau=NIVEAU_COMPRESSION):
+        self.dossier = dossier
+        self.niveau = niveau
+        self.objets = os.path.join(dossier, 'objets')
+        self.instantanes = os.path.join(dossier, 'instantanes')
+
+    def chemin_objet(self, empreinte):
+        return os.path.join(self.objets, empreinte[:2], empreinte[2:] + '.gz')
+
+    def contient(self, empreinte):
+        return os.path.exists(self.chemin_objet(empreinte))
+
+    def stocker(self, chemin):
+        """Hache un fichier et le stocke s'il est nouveau : `(empreinte, octets ajoutés au dépôt)`"""
+        empreinte = empreinte_fichier(chemin)
+        destination = self.chemin_objet(empreinte)
+        if os.path.exists(destination):
+            return empreinte, 0
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        # Écriture atomique : un objet présent est toujours complet
+        temporaire = f'{destination}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(chemin, 'rb') as entree, open(temporaire, 'wb') as brut:
+            with gzip.GzipFile(filename='', mode='wb', fileobj=brut, compresslevel=self.niveau, mtime=0) as sortie:
+                shutil.copyfileobj(entree, sortie, TAILLE_BLOC)
+        os.replace(temporaire, destination)
+        return empreinte, os.path.getsize(destination)
+
+    def extraire(self, empreinte, destination):
+        """Écrit le contenu d'un objet dans `destination` ; ValueError si l'empreinte ne correspond pas"""
+        controle = hashlib.sha256()
+        temporaire = f'{destination}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with gzip.open(self.chemin_objet(empreinte), 'rb') as entree, open(temporaire, 'wb') as sortie:
+                for bloc in iter(lambda: entree.read(TAILLE_BLOC), b''):
+                    controle.update(bloc)
+                    sortie.write(bloc)
+            if controle.hexdigest() != empreinte:
+                raise ValueError(f"Objet {empreinte} altéré")
+            os.replace(temporaire, destination)
+        finally:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+
+    def controler(self, empreinte):
+        """Vrai si l'objet existe et que son contenu a bien cette empreinte"""
+        controle = hashlib.sha256()
+        try:
+            with gzip.open(self.chemin_objet(empreinte), 'rb') as entree:
+                for bloc in iter(lambda: entree.read(TAILLE_BLOC), b''):
+                    controle.update(bloc)
+        except (OSError, EOFError):
+            return False
+        return controle.hexdigest() == empreinte
+
+    # --- Manifestes ---
+
+    def noms(self):
+        """Noms des instantanés, du plus ancien au plus récent"""
+        if not os.path.isdir(self.instantanes):
+            return []
+        return sorted(nom[:-5] for nom in os.listdir(self.instantanes) if nom.endswith('.json'))
+
+    def lire(self, nom):
+        chemin = os.path.join(self.instantanes, f'{nom}.json')
+        if not os.path.exists(chemin):
+            raise FileNotFoundError(f"Instantané introuvable : {nom}")
+        with open(chemin, encoding='utf-8') as fichier:
+            return json.load(fichier)
+
+    def ecrire(self, manifeste):
+        os.makedirs(self.instantanes, exist_ok=True)
+        chemin = os.path.join(self.instantanes, f"{manifeste['nom']}.json")
+        with open(chemin + '.tmp', 'w', encoding='utf-8') as fichier:
+            json.dump(manifeste, fichier, ensure_ascii=False, indent=1)
+        os.replace(chemin + '.tmp', chemin)
+
+    def nouveau_nom(self):
+        nom = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        existants = set(self.noms())
+        suffixe = 1
+        candidat = nom
+        while candidat in existants:
+            suffixe += 1
+            candidat = f'{nom}_{suffixe}'
+        return candidat
+
+
+def creer_instantane(depot, racine=RACINE_PROJET, travailleurs=TRAVAILLEURS):
+    """Crée un instantané du projet ; retourne son manifeste"""
+    debut = time.perf_counter()
+    noms = depot.noms()
+    # Fichiers de l'instantané précédent : non relus si taille et date sont inchangées
+    precedents = {}
+    if noms:
+        precedents = {fichier['chemin']: fichier for fichier in depot.lire(noms[-1])['fichiers']}
+
+    fichiers = []
+    a_lire = []
+    for chemin, etat in parcourir(racine):
+        fichier = {'chemin': chemin, 'taille': etat.st_size, 'mtime_ns': etat.st_mtime_ns, 'mode': etat.st_mode & 0o777}
+        precedent = precedents.get(chemin)
+        if (precedent and precedent['taille'] == etat.st_size and precedent['mtime_ns'] == etat.st_mtime_ns
+                and depot.contient(precedent['sha256'])):
+            fichier['sha256'] = precedent['sha256']
+        else:
+            a_lire.append(fichier)
+        fichiers.append(fichier)
+
+    ajoutes = 0
+    nouveaux = 0
+    with ThreadPoolExecutor(max_workers=travailleurs) as executeur:
+        resultats = executeur.map(lambda fichier: depot.stocker(os.path.join(racine, fichier['chemin'])), a_lire)
+        for fichier, (empreinte, octets) in zip(a_lire, resultats):
+            fichier['sha256'] = empreinte
+            ajoutes += octets
+            nouveaux += 1 if octets else 0
+
+    fichiers.sort(key=lambda fichier: fichier['chemin'])
+    manifeste = {
+        'format': FORMAT_MANIFESTE,
+        'nom': depot.nouveau_nom(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'racine': racine,
+        'precedent': noms[-1] if noms else None,
+        'statistiques': {
+            'fichiers': len(fichiers),
+            'taille': sum(fichier['taille'] for fichier in fichiers),
+            'fichiers_lus': len(a_lire),
+            'octets_lus': sum(fichier['taille'] for fichier in a_lire),
+            'objets_ajoutes': nouveaux,
+            'octets_ajoutes': ajoutes,
+            'duree_s': round(time.perf_counter() - debut, 3),
+        },
+        'fichiers': fichiers,
+    }
+    depot.ecrire(manifeste)
+    return manifeste
+
+
+def selectionner(fichiers, chemins):
+    """Fichiers du manifeste désignés par `chemins` (fichier, dossier ou motif) ; tous si vide"""
+    if not chemins:
+        return list(fichiers)
+    chemins = [chemin.strip('/').replace(os.sep, '/') for chemin in chemins]
+    return [
+        fichier for fichier in fichiers
+        if any(fichier['chemin'] == chemin or fichier['chemin'].startswith(chemin + '/')
+               or fnmatch.fnmatch(fichier['chemin'], chemin) for chemin in chemins)
     ]
-    
-    print(f"🚀 Début de la sauvegarde : {backup_name}")
-    print(f"📁 Dossier source : {project_root}")
-    print(f"📁 Dossier de destination : {backup_path}")
-    print("-" * 50)
-    
-    try:
-        # Créer le dossier de sauvegarde
-        os.makedirs(backup_path)
-        
-        # Copier les fichiers et dossiers
-        copied_items = []
-        skipped_items = []
-        
-        for item in items_to_backup:
-            source_path = os.path.join(project_root, item)
-            
-            if os.path.exists(source_path):
-                if os.path.isfile(source_path):
-                    # Copier un fichier
-                    dest_path = os.path.join(backup_path, item)
-                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                    shutil.copy2(source_path, dest_path)
-                    copied_items.append(f"📄 {item}")
-                    
-                elif os.path.isdir(source_path):
-                    # Copier un dossier
-                    dest_path = os.path.join(backup_path, item)
-                    if not os.path.exists(dest_path):
-                        shutil.copytree(source_path, dest_path, ignore=shutil.ignore_patterns(*exclude_patterns))
-                        copied_items.append(f"📁 {item}/")
-                    else:
-                        skipped_items.append(f"⚠️ {item}/ (déjà existant)")
-            else:
-                skipped_items.append(f"❌ {item} (introuvable)")
-        
-        # Créer un fichier de métadonnées de sauvegarde
-        metadata = {
-            "backup_name": backup_name,
-            "timestamp": timestamp,
-            "datetime": datetime.now().isoformat(),
-            "project_root": project_root,
-            "backup_path": backup_path,
-            "copied_items": copied_items,
-            "skipped_items": skipped_items,
-            "total_files": len(copied_items),
-            "version": "1.0"
-        }
-        
-        metadata_file = os.path.join(backup_path, "backup_metadata.json")
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
-        
-        # Créer un fichier README de la sauvegarde
-        readme_content = f"""# 🔄 Sauvegarde MyXploit - {backup_name}
-
-## 📋 Informations de la sauvegarde
-
-- **Date et heure :** {datetime.now().strftime("%d/%m/%Y à %H:%M:%S")}
-- **Nom de la sauvegarde :** {backup_name}
-- **Chemin :** {backup_path}
-
-## 📁 Contenu sauvegardé
-
-### Fichiers et dossiers copiés :
-"""
-        
-        for item in copied_items:
-            readme_content += f"- {item}\n"
-        
-        if skipped_items:
-            readme_content += "\n### Éléments ignorés :\n"
-            for item in skipped_items:
-                readme_content += f"- {item}\n"
-        
-        readme_content += f"""
-## 🔧 Restauration
-
-Pour restaurer cette sauvegarde :
-
-1. **Arrêter** l'application MyXploit si elle est en cours d'exécution
-2. **Sauvegarder** l'état actuel (optionnel mais recommandé)
-3. **Remplacer** les fichiers/dossiers par ceux de cette sauvegarde
-4. **Redémarrer** l'application
-
-## 📊 Statistiques
-
-- **Total des éléments sauvegardés :** {len(copied_items)}
-- **Taille de la sauvegarde :** À calculer après compression
-
-## ⚠️ Notes importantes
-
-- Cette sauvegarde contient tous les fichiers de configuration
-- Les données utilisateur et transports sont incluses
-- Vérifiez l'intégrité avant restauration
-- Conservez plusieurs sauvegardes pour la sécurité
-
----
-*Sauvegarde créée automatiquement par backup_project.py*
-"""
-        
-        readme_file = os.path.join(backup_path, "README.md")
-        with open(readme_file, 'w', encoding='utf-8') as f:
-            f.write(readme_content)
-        
-        # Créer une archive ZIP de la sauvegarde
-        zip_path = f"{backup_path}.zip"
-        print(f"📦 Création de l'archive ZIP : {zip_path}")
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(backup_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, backup_path)
-                    zipf.write(file_path, arcname)
-        
-        # Calculer la taille de la sauvegarde
-        backup_size = sum(os.path.getsize(os.path.join(dirpath, filename))
-                         for dirpath, dirnames, filenames in os.walk(backup_path)
-                         for filename in filenames)
-        
-        zip_size = os.path.getsize(zip_path)
-        
-        print("-" * 50)
-        print("✅ SAUVEGARDE TERMINÉE AVEC SUCCÈS !")
-        print(f"📁 Dossier de sauvegarde : {backup_path}")
-        print(f"📦 Archive ZIP : {zip_path}")
-        print(f"📊 Taille du dossier : {backup_size / 1024 / 1024:.2f} MB")
-        print(f"📊 Taille de l'archive : {zip_size / 1024 / 1024:.2f} MB")
-        print(f"📄 Éléments sauvegardés : {len(copied_items)}")
-        
-        if skipped_items:
-            print(f"⚠️ Éléments ignorés : {len(skipped_items)}")
-        
-        print("\n📋 Métadonnées de la sauvegarde :")
-        print(f"   - Nom : {backup_name}")
-        print(f"   - Horodatage : {timestamp}")
-        print(f"   - Chemin : {backup_path}")
-        
-        return True, backup_path, zip_path
-        
-    except Exception as e:
-        print(f"❌ ERREUR lors de la sauvegarde : {str(e)}")
-        return False, None, None
-
-def list_backups():
-    """Liste toutes les sauvegardes disponibles"""
-    project_root = os.path.dirname(os.path.abspath(__file__))
-    backup_dir = os.path.join(project_root, "backups")
-    
-    if not os.path.exists(backup_dir):
-        print("❌ Aucun dossier de sauvegarde trouvé")
-        return
-    
-    print(f"📁 Sauvegardes disponibles dans : {backup_dir}")
-    print("-" * 50)
-    
-    backups = []
-    for item in os.listdir(backup_dir):
-        item_path = os.path.join(backup_dir, item)
-        if os.path.isdir(item_path):
-            # Dossier de sauvegarde
-            metadata_file = os.path.join(item_path, "backup_metadata.json")
-            if os.path.exists(metadata_file):
-                try:
-                    with open(metadata_file, 'r', encoding='utf-8') as f:
-                        metadata = json.load(f)
-                    backups.append({
-                        'name': item,
-                        'type': 'folder',
-                        'timestamp': metadata.get('timestamp', 'N/A'),
-                        'size': sum(os.path.getsize(os.path.join(dirpath, filename))
-                                   for dirpath, dirnames, filenames in os.walk(item_path)
-                                   for filename in filenames)
-                    })
-                except:
-                    backups.append({
-                        'name': item,
-                        'type': 'folder',
-                        'timestamp': 'N/A',
-                        'size': 0
-                    })
-        elif item.endswith('.zip'):
-            # Archive ZIP
-            backups.append({
-                'name': item,
-                'type': 'zip',
-                'timestamp': item.replace('myxploit_backup_', '').replace('.zip', ''),
-                'size': os.path.getsize(item_path)
-            })
-    
-    # Trier par timestamp (plus récent en premier)
-    backups.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    if not backups:
-        print("❌ Aucune sauvegarde trouvée")
-        return
-    
-    for i, backup in enumerate(backups, 1):
-        size_mb = backup['size'] / 1024 / 1024
-        print(f"{i:2d}. 📁 {backup['name']}")
-        print(f"    📅 {backup['timestamp']}")
-        print(f"    📊 {size_mb:.2f} MB")
-        print(f"    🏷️  {backup['type']}")
-        print()
-
-def main():
+
+
+def restaurer(depot, nom, cible, chemins=None, travailleurs=TRAVAILLEURS):
+    """Restaure les fichiers d'un instantané dans `cible` : `(écrits, déjà identiques)`
+
+    Les fichiers présents dans `cible` avec le même contenu ne sont pas réécrits ;
+    les fichiers de `cible` absents de l'instantané ne sont pas supprimés.
+    """
+    fichiers = selectionner(depot.lire(nom)['fichiers'], chemins)
+    manquants = [fichier['chemin'] for fichier in fichiers if not depot.contient(fichier['sha256'])]
+    if manquants:
+        raise ValueError(f"{len(manquants)} objet(s) manquant(s) dans le dépôt, ex. {manquants[0]}")
+
+    def restaurer_fichier(fichier):
+        destination = os.path.join(cible, *fichier['chemin'].split('/'))
+        if (os.path.isfile(destination) and os.path.getsize(destination) == fichier['taille']
+                and empreinte_fichier(destination) == fichier['sha256']):
+            return False
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        depot.extraire(fichier['sha256'], destination)
+        os.chmod(destination, fichier['mode'])
+        os.utime(destination, ns=(fichier['mtime_ns'], fichier['mtime_ns']))
+        return True
+
+    with ThreadPoolExecutor(max_workers=travailleurs) as executeur:
+        ecrits = sum(executeur.map(restaurer_fichier, fichiers))
+    return ecrits, len(fichiers) - ecrits
+
+
+def verifier(depot, noms=None, travailleurs=TRAVAILLEURS):
+    """Objets manquants ou altérés des instantanés `noms` (tous par défaut) : `{empreinte: chemin}`"""
+    references = {}
+    for nom in noms or depot.noms():
+        for fichier in depot.lire(nom)['fichiers']:
+            references.setdefault(fichier['sha256'], fichier['chemin'])
+    with ThreadPoolExecutor(max_workers=travailleurs) as executeur:
+        etats = dict(zip(references, executeur.map(depot.controler, references)))
+    return {empreinte: references[empreinte] for empreinte, intact in etats.items() if not intact}
+
+
+def nettoyer(depot, garder):
+    """Supprime les instantanés au-delà des `garder` plus récents, puis les objets qu'ils sont seuls à référencer
+
+    Retourne `(instantanés supprimés, objets supprimés, octets libérés)`.
+    """
+    noms = depot.noms()
+    supprimes = noms[:-garder] if garder > 0 else noms
+    for nom in supprimes:
+        os.remove(os.path.join(depot.instantanes, f'{nom}.json'))
+
+    references = set()
+    for nom in depot.noms():
+        references.update(fichier['sha256'] for fichier in depot.lire(nom)['fichiers'])
+    objets = 0
+    liberes = 0
+    if os.path.isdir(depot.objets):
+        for prefixe in os.listdir(depot.objets):
+            dossier = os.path.join(depot.objets, prefixe)
+            for nom_objet in os.listdir(dossier):
+                if prefixe + nom_objet.split('.', 1)[0] not in references:
+                    chemin = os.path.join(dossier, nom_objet)
+                    liberes += os.path.getsize(chemin)
+                    os.remove(chemin)
+                    objets += 1
+            if not os.listdir(dossier):
+                os.rmdir(dossier)
+    return len(supprimes), objets, liberes
+
+
+def taille_lisible(octets):
+    for unite in ('o', 'Ko', 'Mo', 'Go'):
+        if octets < 1024 or unite == 'Go':
+            return f"{octets:.0f} {unite}" if unite == 'o' else f"{octets:.1f} {unite}"
+        octets /= 1024
+
+
+def taille_depot(depot):
+    if not os.path.isdir(depot.objets):
+        return 0
+    return sum(entree.stat().st_size for dossier in os.scandir(depot.objets) for entree in os.scandir(dossier.path))
+
+
+def _arguments(arguments=None):
+    parseur = argparse.ArgumentParser(description="Instantanés dédoublonnés du projet MyXploit")
+    parseur.add_argument('--dossier', default=DOSSIER_DEFAUT, help="dépôt des instantanés (défaut: backups/projet)")
+    parseur.add_argument('--travailleurs', type=int, default=TRAVAILLEURS, help="fichiers traités en parallèle")
+    commandes = parseur.add_subparsers(dest='commande')
+
+    creation = commandes.add_parser('creer', aliases=['backup'], help="crée un instantané (commande par défaut)")
+    creation.add_argument('--niveau', type=int, default=NIVEAU_COMPRESSION, choices=range(1, 10), metavar='1-9', help="niveau de compression gzip")
+    commandes.add_parser('lister', aliases=['list', 'ls'], help="liste les instantanés")
+    restauration = commandes.add_parser('restaurer', aliases=['restore'], help="restaure un instantané")
+    restauration.add_argument('nom', help="instantané à restaurer ('dernier' : le plus récent)")
+    restauration.add_argument('chemins', nargs='*', help="fichiers, dossiers ou motifs à restaurer (défaut: tous)")
+    restauration.add_argument('--cible', required=True, help="dossier de destination ('.' : le projet lui-même)")
+    verification = commandes.add_parser('verifier', help="contrôle les objets des instantanés")
+    verification.add_argument('noms', nargs='*', help="instantanés à contrôler (défaut: tous)")
+    nettoyage = commandes.add_parser('nettoyer', help="supprime les anciens instantanés et leurs objets inutilisés")
+    nettoyage.add_argument('--garder', type=int, required=True, help="nombre d'instantanés récents conservés")
+    commandes.add_parser('help', aliases=['h'], help="affiche cette aide")
+    return parseur, parseur.parse_args(arguments)
+
+
+def main(arguments=None):
     """Fonction principale"""
+    parseur, args = _arguments(arguments)
     print("🚛 MyXploit - Script de Sauvegarde")
     print("=" * 50)
-    
-    if len(sys.argv) > 1:
-        command = sys.argv[1].lower()
-        
-        if command == "list" or command == "ls":
-            list_backups()
-        elif command == "help" or command == "h":
-            print("""
-📖 Utilisation du script de sauvegarde :
-
-python backup_project.py          # Créer une nouvelle sauvegarde
-python backup_project.py list     # Lister les sauvegardes existantes
-python backup_project.py help     # Afficher cette aide
-
-🔧 Fonctionnalités :
-- Sauvegarde complète du projet avec horodatage
-- Création d'archives ZIP compressées
-- Métadonnées et documentation automatiques
-- Exclusion des fichiers temporaires et caches
-- Gestion des erreurs et validation
-
-📁 Dossiers sauvegardés :
-- app.py, models.py (code principal)
-- templates/ (interfaces utilisateur)
-- static/ (ressources statiques)
-- data/ (données JSON)
-- .vscode/ (configuration VS Code)
-- Documentation (*.md, *.html)
-
-⚠️ Exclusions :
-- __pycache__/, *.pyc (fichiers Python compilés)
-- .git/ (historique Git)
-- backups/ (sauvegardes précédentes)
-- venv/, env/ (environnements virtuels)
-- *.log, *.tmp (fichiers temporaires)
-            """)
-        else:
-            print(f"❌ Commande inconnue : {command}")
-            print("💡 Utilisez 'python backup_project.py help' pour l'aide")
-    else:
-        # Créer une nouvelle sauvegarde
-        success, backup_path, zip_path = create_backup()
-        
-        if success:
-            print("\n🎉 Sauvegarde terminée avec succès !")
-            print(f"💾 Dossier : {backup_path}")
-            print(f"📦 Archive : {zip_path}")
-        else:
-            print("\n❌ Échec de la sauvegarde")
-            sys.exit(1)
-
-if __name__ == "__main__":
-    main()
-
+    depot = Depot(args.dossier, getattr(args, 'niveau', NIVEAU_COMPRESSION))
 
+    try:
+        if args.commande in (None, 'creer', 'backup'):
+            print(f"🚀 Instantané de {RACINE_PROJET}")
+            manifeste = creer_instantane(depot, travailleurs=args.travailleurs)
+            statistiques = manifeste['statistiques']
+            print(f"✅ Instantané {manifeste['nom']} créé en {statistiques['duree_s']}s")
+            print(f"   {statistiques['fichiers']} fichiers ({taille_lisible(statistiques['taille'])}), "
+                  f"{statistiques['fichiers_lus']} relus, {statistiques['objets_ajoutes']} nouveaux contenus "
+                  f"(+{taille_lisible(statistiques['octets_ajoutes'])})")
+            print(f"📦 Dépôt : {taille_lisible(taille_depot(depot))} pour {len(depot.noms())} instantané(s)")
+            return 0
 
+        if args.commande in ('lister', 'list', 'ls'):
+            noms = depot.noms()
+            if not noms:
+                print(f"❌ Aucun instantané dans {depot.dossier}")
+                return 0
+            print(f"📁 Instantanés dans : {depot.dossier}")
+            for i, nom in enumerate(reversed(noms), 1):
+                statistiques = depot.lire(nom)['statistiques']
+                print(f"{i:2d}. 📁 {nom}")
+                print(f"    📊 {statistiques['fichiers']} fichiers, {taille_lisible(statistiques['taille'])}, "
+                      f"+{taille_lisible(statistiques['octets_ajoutes'])} dans le dépôt")
+            print(f"📦 Dépôt : {taille_lisible(taille_depot(depot))}")
+            return 0
 
+        if args.commande in ('restaurer', 'restore'):
+            noms = depot.noms()
+            nom = noms[-1] if args.nom == 'dernier' and noms else args.nom
+            print(f"🔄 Restauration de {nom} dans {os.path.abspath(args.cible)}")
+            ecrits, identiques = restaurer(depot, nom, args.cible, args.chemins, args.travailleurs)
+            print(f"✅ {ecrits} fichier(s) restauré(s), {identiques} déjà identique(s)")
+            return 0
 
+        if args.commande == 'verifier':
+            problemes = verifier(depot, args.noms, args.travailleurs)
+            for empreinte, chemin in problemes.items():
+                print(f"❌ {chemin} : objet {empreinte[:12]} manquant ou altéré")
+            if not problemes:
+                print("✅ Tous les objets sont intacts")
+            return 1 if problemes else 0
 
+        if args.commande == 'nettoyer':
+            instantanes, objets, liberes = nettoyer(depot, args.garder)
+            print(f"🧹 {instantanes} instantané(s) et {objets} objet(s) supprimés, {taille_lisible(liberes)} libérés")
+            return 0
 
+        parseur.print_help()
+        return 0
+    except (ValueError, FileNotFoundError) as e:
+        print(f"❌ {e}")
+        return 1
 
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Mesures de performance : moteur d'émissions, recalcul, import CSV, listes et référentiel
+
+Chaque taille demandée (1k, 100k, 1M transports...) a sa base dédiée : un
+fichier SQLite par taille (réutilisé d'une exécution à l'autre) ou la base
+PostgreSQL passée par --base, vidée puis repeuplée. Les scénarios qui écrivent
+(recalcul, import) sont annulés par rollback : la base reste identique entre
+deux répétitions.
+
+Les résultats sont écrits en JSON (--sortie) et peuvent être comparés à une
+référence enregistrée (--reference) : code de sortie 1 si un scénario est plus
+lent que la référence au-delà de --tolerance.
+
+    python benchmark.py --tailles 1000,100000 --sortie resultats.json
+    python benchmark.py --tailles 1000 --reference benchmarks/reference.json
+    python benchmark.py --base postgresql://localhost/myxploit_bench --tailles 1000000
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import sqlalchemy
+from sqlalchemy import func, select
+
+import config as configuration
+from app import create_app
+from calculs_transports import calculer_emissions_transport, importer_transports_csv, recalculer_emissions_transports
+from emissions_engine import MODE_STANDARD, MODE_VECTORISE, numpy_disponible
+from extensions import db
+from generateur_donnees import (
+    ENERGIES_DEFAUT, GenerateurTransports, inserer_en_base, preparer_referentiel, vider_donnees, VEHICULES_DEFAUT
+)
+from import_transports import COLONNES_CSV
+from models import Energie, Transport
+from referentiel import charger_referentiel_emissions
+
+TAILLES_DEFAUT = (1000, 100_000)
+SCENARIOS = (
+    'calcul_unitaire', 'recalcul_standard', 'recalcul_vectorise', 'import_csv',
+    'page_transports', 'api_liste_transports', 'api_liste_filtree', 'api_energies', 'api_vehicules'
+)
+# Transports calculés un à un par 'calcul_unitaire', lignes importées par 'import_csv'
+ECHANTILLON_CALCUL = 10_000
+LIGNES_IMPORT_MAX = 100_000
+# Répétitions minimales des scénarios HTTP (quelques millisecondes chacun)
+REPETITIONS_HTTP_MIN = 20
+TAILLE_LOT_INSERTION = 10_000
+
+
+
+def creer_application(url):
+    """Application sur la base de mesure, sans logs fichier ni envoi d'email"""
+    # DATABASE_URL (éventuellement lue dans .env) l'emporterait sur la base de mesure
+    os.environ.pop('DATABASE_URL', None)
+
+    class ConfigBenchmark(configuration.TestingConfig):
+        SQLALCHEMY_DATABASE_URI = url
+        MIGRATIONS_AUTO = True
+        LOG_LEVEL = 'WARNING'
+        LOG_FILE = ''
+        LOG_FORMAT = 'texte'
+        METRIQUES_ACTIVES = False
+        EMAIL_SIMULATION = True
+
+    application = create_app(ConfigBenchmark)
+    with application.app_context():
+        if db.engine.url.render_as_string(hide_password=False) != sqlalchemy.engine.make_url(url).render_as_string(hide_password=False):
+            raise RuntimeError(f"Base inattendue: {db.engine.url} (attendue: {url})")
+    return application
+
+
+def peupler_base(taille, graine=42):
+    """Vide la base puis insère le référentiel par défaut et `taille` transports (valeurs reproductibles)"""
+    vider_donnees(referentiel=True)
+    energies, vehicules = preparer_referentiel()
+    generateur = GenerateurTransports(
+        [(identifiant, 1) for identifiant in sorted(set(energies.values()))],
+        [(identifiant, 1) for identifiant in sorted(set(vehicules.values()))],
+        graine=graine, prefixe='BENCH'
+    )
+    inserer_en_base(generateur, taille, TAILLE_LOT_INSERTION)
+
+
+def preparer_base(args, taille):
+    """URL de la base de mesure pour `taille`, peuplée si nécessaire"""
+    if args.base:
+        url = args.base
+    else:
+        os.makedirs(args.dossier, exist_ok=True)
+        chemin = os.path.join(args.dossier, f'myxploit_bench_{taille}.db')
+        if args.repeupler and os.path.exists(chemin):
+            os.remove(chemin)
+        url = f'sqlite:///{chemin}'
+
+    application = creer_application(url)
+    with application.app_context():
+        existants = db.session.scalar(select(func.count(Transport.id)))
+        if args.repeupler or existants != taille:
+            print(f"🌱 Peuplement de la base: {taille} transports...")
+            debut = time.perf_counter()
+            peupler_base(taille, args.graine)
+            print(f"   {time.perf_counter() - debut:.1f}s")
+    return application
+
+
+def chronometrer(fonction, repetitions, apres=None):
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+        if apres is not None:
+            apres()
+    return durees
+
+
+def csv_import(lignes):
+    """Fichier CSV d'import (colonnes de /import_transports_csv) de `lignes` transports nouveaux"""
+    aleatoire = random.Random(7)
+    tampon = io.StringIO()
+    tampon.write(','.join(COLONNES_CSV) + '\n')
+    for i in range(lignes):
+        tampon.write(
+            f"IMPORT-{i:07d},routier,niveau_2,{aleatoire.randint(1, len(VEHICULES_DEFAUT))},"
+            f"{aleatoire.randint(1, len(ENERGIES_DEFAUT))},{aleatoire.uniform(8, 40):.1f},"
+            f"{aleatoire.uniform(0.5, 25):.2f},{aleatoire.uniform(10, 1200):.1f}\n"
+        )
+    return tampon.getvalue().encode('utf-8')
+
+
+def mesurer(application, taille, scenarios, repetitions):
+    """Exécute les scénarios sur la base de `taille` transports ; liste de résultats"""
+    resultats = []
+    client = application.test_client()
+
+    def resultat(scenario, durees, operations):
+        mediane = statistics.median(durees)
+        resultats.append({
+            'scenario': scenario,
+            'taille': taille,
+            'repetitions': len(durees),
+            'operations': operations,
+            'mediane_s': round(mediane, 6),
+            'min_s': round(min(durees), 6),
+            'max_s': round(max(durees), 6),
+            'operations_par_s': round(operations / mediane, 1) if mediane else None,
+        })
+        print(f"   {scenario:<22} {mediane * 1000:>10.1f} ms  ({operations} op., {len(durees)} rép.)")
+
+    def requete_http(url):
+        def executer():
+            reponse = client.get(url)
+            if reponse.status_code != 200:
+                raise RuntimeError(f"{url}: statut {reponse.status_code}")
+        return executer
+
+    with application.app_context():
+        if 'calcul_unitaire' in scenarios:
+            referentiel = charger_referentiel_emissions()
+            echantillon = db.session.execute(
+                select(Transport).order_by(Transport.id).limit(ECHANTILLON_CALCUL)
+            ).scalars().all()
+
+            def calculer():
+                for transport in echantillon:
+                    calculer_emissions_transport(transport, referentiel)
+            resultat('calcul_unitaire', chronometrer(calculer, repetitions), len(echantillon))
+            db.session.rollback()
+
+        modes = [('recalcul_standard', MODE_STANDARD), ('recalcul_vectorise', MODE_VECTORISE)]
+        for scenario, mode in modes:
+            if scenario not in scenarios:
+                continue
+            if mode == MODE_VECTORISE and not numpy_disponible():
+                print(f"   {scenario:<22} ignoré (NumPy non installé)")
+                continue
+            resultat(scenario, chronometrer(
+                lambda: recalculer_emissions_transports(mode=mode), repetitions, apres=db.session.rollback
+            ), taille)
+
+        if 'import_csv' in scenarios:
+            lignes = min(taille, LIGNES_IMPORT_MAX)
+            contenu = csv_import(lignes)
+            resultat('import_csv', chronometrer(
+                lambda: importer_transports_csv(io.BytesIO(contenu), taille=len(contenu)),
+                repetitions, apres=db.session.rollback
+            ), lignes)
+
+        energie_id = db.session.scalar(select(Energie.id).order_by(Energie.id))
+
+    repetitions_http = max(repetitions, REPETITIONS_HTTP_MIN)
+    requetes = {
+        'page_transports': '/transports',
+        'api_liste_transports': '/api/transports/liste',
+        'api_liste_filtree': f'/api/transports/liste?energie={energie_id}&tri=emis_kg',
+        'api_energies': '/api/energies',
+        'api_vehicules': '/api/vehicules',
+    }
+    for scenario, url in requetes.items():
+        if scenario in scenarios:
+            executer = requete_http(url)
+            executer()  # Première requête (modèles Jinja, cache du référentiel) hors mesure
+            resultat(scenario, chronometrer(executer, repetitions_http), 1)
+    return resultats
+
+
+def informations(args):
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'plateforme': platform.platform(),
+        'base': 'postgresql' if args.base and args.base.startswith('postgres') else 'sqlite',
+        'numpy': numpy_disponible(),
+        'repetitions': args.repetitions,
+        'graine': args.graine,
+    }
+
+
+def comparer(resultats, reference, tolerance):
+    """Compare les médianes à celles de la référence ; retourne les régressions"""
+    references = {(r['scenario'], r['taille']): r for r in reference['resultats']}
+    regressions = []
+    print(f"\n📊 Comparaison avec la référence ({reference['informations'].get('commit') or 'sans commit'}, "
+          f"{reference['informations'].get('date')}), tolérance {tolerance:.0%}")
+    for r in resultats:
+        ancien = references.get((r['scenario'], r['taille']))
+        if ancien is None or not ancien['mediane_s']:
+            print(f"   {r['scenario']:<22} {r['taille']:>9}  (absent de la référence)")
+            continue
+        rapport = r['mediane_s'] / ancien['mediane_s']
+        if rapport > 1 + tolerance:
+            etat = '🔴 régression'
+            regressions.append({**r, 'reference_s': ancien['mediane_s'], 'rapport': round(rapport, 3)})
+        elif rapport < 1 / (1 + tolerance):
+            etat = '🟢 amélioration'
+        else:
+            etat = '⚪ stable'
+        print(f"   {r['scenario']:<22} {r['taille']:>9}  x{rapport:.2f}  {etat}")
+    return regressions
+
+
+def lire_arguments(arguments=None):
+    parseur = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parseur.add_argument('--tailles', default=','.join(map(str, TAILLES_DEFAUT)),
+                         help='Nombres de transports, séparés par des virgules (défaut: %(default)s)')
+    parseur.add_argument('--scenarios', default=','.join(SCENARIOS),
+                         help='Scénarios à exécuter (défaut: tous)')
+    parseur.add_argument('--repetitions', type=int, default=3, help='Répétitions par scénario (défaut: %(default)s)')
+    parseur.add_argument('--base', help='URL d\'une base PostgreSQL dédiée, VIDÉE puis repeuplée (défaut: SQLite)')
+    parseur.add_argument('--dossier', default=os.path.join(tempfile.gettempdir(), 'myxploit_bench'),
+                         help='Dossier des bases SQLite de mesure (défaut: %(default)s)')
+    parseur.add_argument('--repeupler', action='store_true', help='Repeuple la base même si elle a déjà la bonne taille')
+    parseur.add_argument('--graine', type=int, default=42, help='Graine des données générées (défaut: %(default)s)')
+    parseur.add_argument('--sortie', default='benchmark_resultats.json', help='Fichier JSON des résultats (défaut: %(default)s)')
+    parseur.add_argument('--reference', help='Résultats de référence (JSON) à comparer')
+    parseur.add_argument('--tolerance', type=float, default=0.25,
+                         help='Ralentissement toléré avant de signaler une régression (défaut: %(default)s)')
+    parseur.add_argument('--enregistrer-reference', action='store_true',
+                         help='Écrit aussi les résultats dans le fichier --reference')
+    args = parseur.parse_args(arguments)
+
+    args.tailles = [int(taille) for taille in args.tailles.split(',') if taille.strip()]
+    args.scenarios = [nom.strip() for nom in args.scenarios.split(',') if nom.strip()]
+    inconnus = [nom for nom in args.scenarios if nom not in SCENARIOS]
+    if inconnus:
+        parseur.error(f"scénario(s) inconnu(s): {', '.join(inconnus)} (possibles: {', '.join(SCENARIOS)})")
+    if args.enregistrer_reference and not args.reference:
+        parseur.error('--enregistrer-reference demande --reference')
+    return args
+
+
+def main(arguments=None):
+    args = lire_arguments(arguments)
+    print("⏱️ MESURES DE PERFORMANCE")
+    print("=" * 50)
+
+    resultats = []
+    for taille in args.tailles:
+        print(f"\n📦 {taille} transports")
+        application = preparer_base(args, taille)
+        resultats.extend(mesurer(application, taille, args.scenarios, args.repetitions))
+        with application.app_context():
+            db.engine.dispose()
+
+    document = {'informations': informations(args), 'resultats': resultats}
+    with open(args.sortie, 'w', encoding='utf-8') as fichier:
+        json.dump(document, fichier, ensure_ascii=False, indent=2)
+    print(f"\n💾 Résultats écrits dans {args.sortie}")
+
+    regressions = []
+    if args.reference and os.path.exists(args.reference) and not args.enregistrer_reference:
+        with open(args.reference, encoding='utf-8') as fichier:
+            regressions = comparer(resultats, json.load(fichier), args.tolerance)
+    if args.enregistrer_reference:
+        os.makedirs(os.path.dirname(os.path.abspath(args.reference)), exist_ok=True)
+        with open(args.reference, 'w', encoding='utf-8') as fichier:
+            json.dump(document, fichier, ensure_ascii=False, indent=2)
+        print(f"📌 Référence enregistrée: {args.reference}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} régression(s) au-delà de {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+API du dashboard des émissions, servie par les agrégats
+"""
+
+import logging
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy import func, or_, select
+
+from agregats import (
+    CLE_INCONNUE, CLE_TOTAL, DIMENSION_CLIENT, DIMENSION_ENERGIE, DIMENSION_MOIS,
+    DIMENSION_TOTAL, DIMENSION_TRANSPORTEUR, DIMENSION_TYPE_VEHICULE
+)
+from extensions import db
+from models import Client, EmissionsAgregat, Energie, Transport, Transporteur, Vehicule
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('dashboard', __name__)
+
+def lire_agregats(dimension, limite=None):
+    """Lignes d'agrégats d'une dimension, par émissions décroissantes"""
+    requete = (
+        select(EmissionsAgregat)
+        .where(EmissionsAgregat.dimension == dimension, EmissionsAgregat.nb_transports > 0)
+        .order_by(EmissionsAgregat.emis_kg.desc(), EmissionsAgregat.cle)
+    )
+    if limite:
+        requete = requete.limit(limite)
+    return db.session.scalars(requete).all()
+
+
+def compter_agregats(dimension):
+    """Nombre de valeurs connues d'une dimension ayant au moins un transport"""
+    return db.session.scalar(
+        select(func.count(EmissionsAgregat.id)).where(
+            EmissionsAgregat.dimension == dimension,
+            EmissionsAgregat.nb_transports > 0,
+            EmissionsAgregat.cle != CLE_INCONNUE
+        )
+    )
+
+
+def _libelles(modele, cles):
+    """Noms des énergies, véhicules, clients ou transporteurs présents dans une série"""
+    identifiants = [int(cle) for cle in cles if cle.isdigit()]
+    if not identifiants:
+        return {}
+    return {
+        str(identifiant): nom
+        for identifiant, nom in db.session.execute(
+            select(modele.id, modele.nom).where(modele.id.in_(identifiants))
+        )
+    }
+
+
+@bp.route('/api/dashboard', methods=['GET'])
+def api_dashboard():
+    """API pour récupérer les données du dashboard
+    
+    Toutes les séries proviennent de la table `emissions_agregats`, tenue à jour
+    à chaque écriture de transport. Paramètres : `mois` (nombre de mois de la
+    série mensuelle, 12 par défaut) et `limite` (nombre d'entrées des autres séries).
+    """
+    try:
+        try:
+            nb_mois = max(1, int(request.args.get('mois', 12)))
+            limite = max(1, int(request.args.get('limite', 20)))
+        except ValueError:
+            return jsonify({'success': False, 'error': "Paramètres 'mois' et 'limite' entiers attendus"}), 400
+        
+        agregats_totaux = {
+            (agregat.dimension, agregat.cle): agregat
+            for agregat in db.session.scalars(
+                select(EmissionsAgregat).where(or_(
+                    EmissionsAgregat.dimension == DIMENSION_TOTAL,
+                    EmissionsAgregat.dimension == DIMENSION_MOIS
+                ))
+            )
+        }
+        total = agregats_totaux.get((DIMENSION_TOTAL, CLE_TOTAL))
+        ce_mois = agregats_totaux.get((DIMENSION_MOIS, datetime.utcnow().strftime('%Y-%m')))
+        
+        mois = sorted(
+            (agregat for (dimension, cle), agregat in agregats_totaux.items()
+             if dimension == DIMENSION_MOIS and cle != CLE_INCONNUE and agregat.nb_transports > 0),
+            key=lambda agregat: agregat.cle
+        )[-nb_mois:]
+        
+        series = {}
+        for dimension, modele in (
+            (DIMENSION_ENERGIE, Energie),
+            (DIMENSION_TYPE_VEHICULE, Vehicule),
+            (DIMENSION_CLIENT, Client),
+            (DIMENSION_TRANSPORTEUR, Transporteur)
+        ):
+            agregats = lire_agregats(dimension, limite)
+            libelles = _libelles(modele, [agregat.cle for agregat in agregats])
+            series[dimension] = [
+                {
+                    'cle': agregat.cle,
+                    'libelle': libelles.get(agregat.cle, agregat.cle),
+                    'nb_transports': agregat.nb_transports,
+                    'emissions': round(agregat.emis_kg, 3)
+                }
+                for agregat in agregats
+            ]
+        
+        # Derniers transports : parcours de l'index (created_at, id), borné
+        transports_recents = []
+        for transport in db.session.scalars(
+            select(Transport).order_by(Transport.created_at.desc(), Transport.id.desc()).limit(5)
+        ):
+            transports_recents.append({
+                'id': transport.id,
+                'reference': transport.ref,
+                'date': transport.created_at.strftime('%Y-%m-%d') if transport.created_at else None,
+                'client_id': transport.client_id,
+                'emissions': transport.emis_kg or 0
+            })
+        
+        dashboard_data = {
+            'statistiques': {
+                'total_transports': total.nb_transports if total else 0,
+                'transports_ce_mois': ce_mois.nb_transports if ce_mois else 0,
+                'emissions_total': round(total.emis_kg, 3) if total else 0.0,
+                'emissions_ce_mois': round(ce_mois.emis_kg, 3) if ce_mois else 0.0,
+                'clients_actifs': compter_agregats(DIMENSION_CLIENT),
+                'transporteurs_actifs': compter_agregats(DIMENSION_TRANSPORTEUR)
+            },
+            'graphiques': {
+                'emissions_par_mois': [
+                    {'mois': agregat.cle, 'nb_transports': agregat.nb_transports, 'emissions': round(agregat.emis_kg, 3)}
+                    for agregat in mois
+                ],
+                'emissions_par_energie': series[DIMENSION_ENERGIE],
+                'emissions_par_type_vehicule': series[DIMENSION_TYPE_VEHICULE],
+                'emissions_par_client': series[DIMENSION_CLIENT],
+                'emissions_par_transporteur': series[DIMENSION_TRANSPORTEUR]
+            },
+            'transports_recents': transports_recents
+        }
+        
+        return jsonify({
+            'success': True,
+            'dashboard': dashboard_data
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des données du dashboard: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,371 @@
+"""
+API des invitations des clients et transporteurs
+"""
+
+import logging
+import secrets
+import uuid
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request, url_for
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from campagne_invitations import lire_emails_csv, normaliser_email, trier_emails, valider_email
+from extensions import db, file_courriels
+from file_courriels import STATUT_ECHEC, STATUT_EN_ATTENTE, STATUT_ENVOYE, STATUT_SIMULE
+from models import Client, Invitation
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('invitations', __name__)
+
+# Routes pour les invitations de clients
+
+
+@bp.route('/api/invitations', methods=['GET', 'POST'])
+def api_invitations():
+    """API pour gérer les invitations"""
+    if request.method == 'GET':
+        try:
+            invitations = Invitation.query.order_by(Invitation.created_at.desc()).all()
+            invitations_data = []
+            
+            for inv in invitations:
+                invitations_data.append({
+                    'id': inv.id,
+                    'email': inv.email,
+                    'statut': inv.statut,
+                    'nom_entreprise': inv.nom_entreprise,
+                    'nom_utilisateur': inv.nom_utilisateur,
+                    'date_invitation': inv.date_invitation.strftime('%d/%m/%Y %H:%M') if inv.date_invitation else None,
+                    'date_reponse': inv.date_reponse.strftime('%d/%m/%Y %H:%M') if inv.date_reponse else None,
+                    'message_personnalise': inv.message_personnalise,
+                    'statut_envoi': inv.statut_envoi,
+                    'tentatives_envoi': inv.tentatives_envoi,
+                    'erreur_envoi': inv.erreur_envoi,
+                    'date_envoi': inv.date_envoi.strftime('%d/%m/%Y %H:%M') if inv.date_envoi else None
+                })
+            
+            return jsonify({
+                'success': True,
+                'invitations': invitations_data
+            })
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des invitations: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    elif request.method == 'POST':
+        try:
+            data = request.get_json()
+            message_personnalise = data.get('message_personnalise', '')
+            
+            if not normaliser_email(data.get('email')):
+                return jsonify({'success': False, 'error': 'Email requis'}), 400
+            
+            # Même contrôle et même normalisation (minuscules) que les campagnes
+            email = valider_email(data.get('email'))
+            if email is None:
+                return jsonify({'success': False, 'error': 'Adresse email invalide'}), 400
+            
+            # Vérifier si l'email n'est pas déjà invité (casse ignorée)
+            existing_invitation = Invitation.query.filter(func.lower(Invitation.email) == email).first()
+            if existing_invitation:
+                return jsonify({'success': False, 'error': 'Une invitation existe déjà pour cet email'}), 400
+            
+            # Générer un token unique
+            token = secrets.token_urlsafe(32)
+            
+            # Créer l'invitation
+            invitation = Invitation(
+                email=email,
+                token=token,
+                message_personnalise=message_personnalise,
+                statut_envoi=STATUT_EN_ATTENTE,
+                tentatives_envoi=0,
+                url_application=request.host_url.rstrip('/')
+            )
+            
+            db.session.add(invitation)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Même adresse invitée par une requête concurrente (index unique sur lower(email))
+                db.session.rollback()
+                return jsonify({'success': False, 'error': 'Une invitation existe déjà pour cet email'}), 400
+            
+            # Invitation enregistrée en attente d'envoi : la file d'envoi la
+            # réserve et enregistre le résultat sur l'invitation (statut_envoi)
+            file_courriels.signaler()
+            logger.info(f"📧 Email d'invitation en attente d'envoi pour {email}")
+            
+            return jsonify({
+                'success': True,
+                'message': f'Invitation envoyée à {email}',
+                'invitation_id': invitation.id,
+                'statut_envoi': invitation.statut_envoi
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la création de l'invitation: {str(e)}")
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _inserer_invitations(lignes):
+    """Insère les invitations ; retourne l'ensemble des adresses réellement créées
+
+    Sur PostgreSQL et SQLite, une adresse invitée entre-temps par une autre
+    requête (index unique sur lower(email)) est ignorée (ON CONFLICT DO
+    NOTHING). Ailleurs, elle lève IntegrityError.
+    """
+    dialecte = db.session.get_bind().dialect.name
+    if dialecte == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecte
+    elif dialecte == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecte
+    else:
+        db.session.execute(insert(Invitation), lignes)
+        return {ligne['email'] for ligne in lignes}
+    table = Invitation.__table__
+    instruction = insert_dialecte(table).on_conflict_do_nothing().returning(table.c.email)
+    return set(db.session.scalars(instruction, lignes))
+
+
+@bp.route('/api/invitations/campagne', methods=['POST'])
+def api_campagne_invitations():
+    """Invite une liste d'adresses : JSON `{"emails": [...]}` ou fichier CSV `file`
+
+    Les adresses déjà invitées sont écartées par une seule requête, les
+    nouvelles invitations sont créées en attente d'envoi dans une seule
+    transaction : la file d'envoi les réserve par lots (débit limité par
+    COURRIELS_DEBIT_MAX), quel que soit le worker, jusqu'à la dernière. La
+    progression se lit sur /api/invitations/campagnes/<campagne_id>.
+    """
+    try:
+        if 'file' in request.files:
+            valeurs = lire_emails_csv(request.files['file'].stream)
+            message_personnalise = request.form.get('message_personnalise', '')
+        else:
+            data = request.get_json(silent=True) or {}
+            valeurs = data.get('emails')
+            message_personnalise = data.get('message_personnalise', '')
+            if not isinstance(valeurs, list):
+                return jsonify({'success': False, 'error': "Liste 'emails' ou fichier CSV 'file' requis"}), 400
+
+        try:
+            emails, invalides = trier_emails(valeurs)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if not emails:
+            return jsonify({'success': False, 'error': 'Aucune adresse email valide', 'invalides': invalides}), 400
+
+        # Adresses déjà invitées : une requête pour toute la liste
+        deja_invitees = set(db.session.scalars(
+            select(func.lower(Invitation.email)).where(func.lower(Invitation.email).in_(emails))
+        ))
+        nouvelles = [email for email in emails if email not in deja_invitees]
+
+        campagne_id = uuid.uuid4().hex
+        if nouvelles:
+            # Insertion groupée
+            url_application = request.host_url.rstrip('/')
+            creees = _inserer_invitations([{
+                'email': email,
+                'token': secrets.token_urlsafe(32),
+                'message_personnalise': message_personnalise,
+                'statut_envoi': STATUT_EN_ATTENTE,
+                'tentatives_envoi': 0,
+                'url_application': url_application,
+                'campagne_id': campagne_id
+            } for email in nouvelles])
+            db.session.commit()
+            # Adresses invitées par une requête concurrente depuis la vérification
+            deja_invitees.update(set(nouvelles) - creees)
+            nouvelles = [email for email in nouvelles if email in creees]
+            file_courriels.signaler()
+        logger.info(
+            f"📧 Campagne {campagne_id}: {len(nouvelles)} invitation(s) créée(s), "
+            f"{len(deja_invitees)} déjà invitée(s), {len(invalides)} adresse(s) invalide(s)"
+        )
+
+        return jsonify({
+            'success': True,
+            'campagne_id': campagne_id,
+            'invitations_creees': len(nouvelles),
+            'deja_invitees': sorted(deja_invitees),
+            'invalides': invalides,
+            'progression_url': url_for('invitations.api_campagne_progression', campagne_id=campagne_id)
+        }), 202
+
+    except IntegrityError as e:
+        # Base sans INSERT ... ON CONFLICT : campagne annulée, à relancer
+        db.session.rollback()
+        logger.error(f"Conflit lors de la création de la campagne d'invitations: {str(e)}")
+        return jsonify({'success': False, 'error': 'Adresse invitée entre-temps par une autre requête, campagne annulée : la relancer'}), 409
+    except Exception as e:
+        logger.error(f"Erreur lors de la création de la campagne d'invitations: {str(e)}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/invitations/campagnes/<campagne_id>')
+def api_campagne_progression(campagne_id):
+    """Avancement de l'envoi d'une campagne : nombre d'invitations par statut d'envoi
+
+    L'envoi se poursuit depuis la base (file_courriels.py) : une campagne
+    interrompue par l'arrêt d'un worker est reprise par les autres. Les
+    invitations en attente après un échec temporaire sont comptées dans
+    `a_retenter`, avec la date de la prochaine tentative.
+    """
+    try:
+        comptes = dict(db.session.execute(
+            select(Invitation.statut_envoi, func.count(Invitation.id))
+            .where(Invitation.campagne_id == campagne_id)
+            .group_by(Invitation.statut_envoi)
+        ).all())
+        total = sum(comptes.values())
+        if not total:
+            return jsonify({'success': False, 'error': 'Campagne non trouvée'}), 404
+
+        statuts = {statut: comptes.get(statut, 0) for statut in (STATUT_EN_ATTENTE, STATUT_ENVOYE, STATUT_SIMULE, STATUT_ECHEC)}
+        traitees = total - statuts[STATUT_EN_ATTENTE]
+        a_retenter, prochaine_tentative = 0, None
+        if statuts[STATUT_EN_ATTENTE]:
+            a_retenter, prochaine_tentative = db.session.execute(
+                select(func.count(Invitation.id), func.min(Invitation.prochain_envoi))
+                .where(
+                    Invitation.campagne_id == campagne_id,
+                    Invitation.statut_envoi == STATUT_EN_ATTENTE,
+                    Invitation.tentatives_envoi > 0
+                )
+            ).one()
+        return jsonify({
+            'success': True,
+            'campagne_id': campagne_id,
+            'total': total,
+            'statuts': statuts,
+            'a_retenter': a_retenter,
+            'prochaine_tentative': prochaine_tentative.strftime('%d/%m/%Y %H:%M:%S') if prochaine_tentative else None,
+            'progression': round(100 * traitees / total, 1),
+            'terminee': traitees == total
+        })
+    except Exception as e:
+        logger.error(f"Erreur lors du suivi de la campagne {campagne_id}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/invitations/<int:invitation_id>/resend', methods=['POST'])
+def resend_invitation(invitation_id):
+    """Relancer une invitation existante"""
+    try:
+        invitation = Invitation.query.get(invitation_id)
+        
+        if not invitation:
+            return jsonify({'success': False, 'error': 'Invitation non trouvée'}), 404
+        
+        if invitation.statut == 'acceptee':
+            return jsonify({'success': False, 'error': 'Cette invitation a déjà été acceptée'}), 400
+        
+        # Mettre à jour la date d'invitation et repartir d'un envoi en attente
+        invitation.date_invitation = datetime.utcnow()
+        invitation.statut_envoi = STATUT_EN_ATTENTE
+        invitation.tentatives_envoi = 0
+        invitation.erreur_envoi = None
+        invitation.prochain_envoi = None
+        invitation.url_application = request.host_url.rstrip('/')
+        db.session.commit()
+        
+        # Renvoyer l'email d'invitation (en arrière-plan)
+        file_courriels.signaler()
+        logger.info(f"📧 Email d'invitation relancé (en attente d'envoi) pour {invitation.email}")
+        return jsonify({
+            'success': True,
+            'message': f'Invitation relancée à {invitation.email}',
+            'statut_envoi': invitation.statut_envoi
+        })
+            
+    except Exception as e:
+        logger.error(f"Erreur lors de la relance de l'invitation {invitation_id}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/clients/<client_id>/invitation-status')
+def get_client_invitation_status(client_id):
+    """Récupérer le statut d'invitation d'un client"""
+    try:
+        # Récupérer le client
+        client = Client.query.get(client_id)
+        if not client:
+            return jsonify({'success': False, 'error': 'Client non trouvé'}), 404
+        
+        # Chercher une invitation pour cet email (adresses enregistrées en minuscules)
+        invitation = Invitation.query.filter(func.lower(Invitation.email) == normaliser_email(client.email)).first()
+        
+        if invitation:
+            return jsonify({
+                'success': True,
+                'has_invitation': True,
+                'invitation': {
+                    'id': invitation.id,
+                    'statut': invitation.statut,
+                    'statut_envoi': invitation.statut_envoi,
+                    'date_invitation': invitation.date_invitation.strftime('%d/%m/%Y %H:%M') if invitation.date_invitation else None,
+                    'date_reponse': invitation.date_reponse.strftime('%d/%m/%Y %H:%M') if invitation.date_reponse else None
+                }
+            })
+        else:
+            return jsonify({
+                'success': True,
+                'has_invitation': False
+            })
+            
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération du statut d'invitation pour le client {client_id}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/invitation/<token>/reponse', methods=['POST'])
+def api_invitation_reponse(token):
+    """API pour accepter/refuser une invitation"""
+    try:
+        invitation = Invitation.query.filter_by(token=token).first()
+        
+        if not invitation:
+            return jsonify({'success': False, 'error': 'Invitation invalide'}), 404
+        
+        if invitation.statut != 'en_attente':
+            return jsonify({'success': False, 'error': 'Cette invitation a déjà été traitée'}), 400
+        
+        data = request.get_json()
+        action = data.get('action')  # 'accepter' ou 'refuser'
+        nom_entreprise = data.get('nom_entreprise', '')
+        nom_utilisateur = data.get('nom_utilisateur', '')
+        
+        if action == 'accepter':
+            if not nom_entreprise or not nom_utilisateur:
+                return jsonify({'success': False, 'error': 'Nom d\'entreprise et nom d\'utilisateur requis'}), 400
+            
+            invitation.statut = 'acceptee'
+            invitation.nom_entreprise = nom_entreprise
+            invitation.nom_utilisateur = nom_utilisateur
+            invitation.date_reponse = datetime.utcnow()
+            
+            # TODO: Créer le compte utilisateur
+            logger.info(f"✅ Invitation acceptée par {nom_utilisateur} ({nom_entreprise})")
+            
+        elif action == 'refuser':
+            invitation.statut = 'refusee'
+            invitation.date_reponse = datetime.utcnow()
+            logger.info(f"❌ Invitation refusée par {invitation.email}")
+        
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': f'Invitation {action} avec succès'
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement de l'invitation: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,367 @@
+"""
+Pages HTML (navigation, listes, administration) et pages d'erreur
+
+Un worker API (APP_BLUEPRINTS=api) n'enregistre pas ce blueprint.
+"""
+
+import logging
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from sqlalchemy import func, select
+
+from agregats import CLE_TOTAL, DIMENSION_CLIENT, DIMENSION_TOTAL
+from blueprints.dashboard import compter_agregats
+from blueprints.transports import paginer_transports
+from extensions import db
+from models import EmissionsAgregat, Energie, Invitation, Transport, Vehicule
+from pagination import CurseurInvalide
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('pages', __name__)
+
+@bp.route('/')
+def index():
+    """Page d'accueil"""
+    try:
+        return render_template('index.html')
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de l'affichage de l'index: {str(e)}")
+        return f"""
+        <html>
+        <head><title>MyXploit - Statut</title></head>
+        <body>
+            <h1>🚀 MyXploit - Application en cours de démarrage</h1>
+            <p>L'application est en cours d'initialisation...</p>
+            <p>Erreur: {str(e)}</p>
+            <p><a href="/health">Vérifier le statut</a></p>
+        </body>
+        </html>
+        """, 500
+
+
+@bp.route('/myxploit')
+def myxploit_home():
+    """Page d'accueil MyXploit (côté client)"""
+    try:
+        return render_template('myxploit_home.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage de l'accueil MyXploit: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/administration')
+def administration_home():
+    """Page d'accueil Administration (côté admin)"""
+    try:
+        return render_template('administration_home.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage de l'accueil Administration: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/administration')
+def administration():
+    """Page d'administration"""
+    try:
+        return render_template('administration.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage de l'administration: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/parametrage_clients')
+def parametrage_clients():
+    """Page de paramétrage des clients"""
+    try:
+        return render_template('clients.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage des clients: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/parametrage_energies')
+def parametrage_energies():
+    """Page de paramétrage des énergies"""
+    try:
+        # Récupérer toutes les énergies pour l'affichage
+        energies = Energie.query.all()
+        return render_template('parametrage_energies.html', energies=energies)
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage des énergies: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/parametrage_vehicules')
+def parametrage_vehicules():
+    """Page de paramétrage des véhicules"""
+    try:
+        return render_template('parametrage_vehicules.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage des véhicules: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/import_csv')
+def import_csv():
+    """Page d'import CSV"""
+    try:
+        return render_template('import_csv.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage de l'import CSV: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/nouveau_transport')
+def nouveau_transport():
+    """Page de sélection du mode de création de transport"""
+    try:
+        return render_template('nouveau_transport.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage du choix de création: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/logout')
+def logout():
+    """Déconnexion"""
+    return render_template('login.html')
+
+
+@bp.route('/parametrage_transporteurs')
+def parametrage_transporteurs():
+    """Page de paramétrage des transporteurs"""
+    try:
+        return render_template('parametrage_transporteurs.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage des transporteurs: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/parametrage_dashboards')
+def parametrage_dashboards():
+    """Page de paramétrage des dashboards"""
+    try:
+        return render_template('parametrage_dashboards.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage des dashboards: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/parametrage_impact')
+def parametrage_impact():
+    """Page de configuration de l'impact environnemental"""
+    try:
+        return render_template('parametrage_impact.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage de la configuration d'impact: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/parametrage_systeme')
+def parametrage_systeme():
+    """Page de paramètres système"""
+    try:
+        return render_template('parametrage_systeme.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage des paramètres système: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/mon-entreprise')
+def mon_entreprise():
+    """Page de gestion de l'entreprise (côté client)"""
+    try:
+        return render_template('mon_entreprise.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage de mon entreprise: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/transports')
+def transports():
+    """Liste des transports (une page à la fois)"""
+    try:
+        try:
+            # Totaux calculés en base sur l'ensemble des transports filtrés,
+            # une fois par filtre (repris par le curseur des pages suivantes)
+            page = paginer_transports(request.args, totaux={
+                'poids_tonnes': func.coalesce(func.sum(Transport.poids_tonnes), 0.0),
+                'emis_kg': func.coalesce(func.sum(Transport.emis_kg), 0.0)
+            })
+        except (ValueError, CurseurInvalide) as e:
+            flash(str(e), 'error')
+            return redirect(url_for('pages.transports'))
+        
+        # Récupérer les véhicules et énergies pour l'affichage
+        vehicules = {v.id: v for v in Vehicule.query.all()}
+        energies = {e.id: e for e in Energie.query.all()}
+        
+        # Paramètres conservés dans les liens de pagination
+        filtres = {cle: valeur for cle, valeur in request.args.items() if cle != 'apres' and valeur}
+        
+        logger.info(f"Affichage de {len(page['transports'])} transports sur {page['total']}")
+        
+        return render_template('liste_transports.html', 
+                            transports=page['transports'],
+                            total_transports=page['total'],
+                            total_poids=page['totaux']['poids_tonnes'],
+                            total_emis=page['totaux']['emis_kg'],
+                            page_suivante=page['suivant'],
+                            page_courante=request.args.get('apres'),
+                            filtres=filtres,
+                            tri=page['tri'],
+                            ordre=page['ordre'],
+                            date_selected=request.args.get('date', ''),
+                            energie_filter=request.args.get('energie', ''),
+                            type_transport_filter=request.args.get('type_transport', ''),
+                            client_filter=request.args.get('client', ''),
+                            vehicules=vehicules,
+                            energies=energies,
+                            clients={})
+                        
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage des transports: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/transport')
+@bp.route('/transport/<int:transport_id>')
+def transport(transport_id=None):
+    """Page de création/modification d'un transport"""
+    try:
+        transport = None
+        if transport_id:
+            transport = Transport.query.get_or_404(transport_id)
+        
+        # Récupérer les véhicules et énergies pour le formulaire
+        vehicules = Vehicule.query.all()
+        energies = Energie.query.all()
+        
+        return render_template('transport.html', 
+                            transport=transport,
+                            vehicules=vehicules,
+                            energies=energies)
+                            
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage du transport: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/dashboard')
+def dashboard():
+    """Dashboard principal"""
+    try:
+        # Statistiques lues dans les agrégats : coût indépendant du nombre de transports
+        total = db.session.scalar(
+            select(EmissionsAgregat.nb_transports).where(
+                EmissionsAgregat.dimension == DIMENSION_TOTAL,
+                EmissionsAgregat.cle == CLE_TOTAL
+            )
+        )
+        total_transports = total or 0
+        total_clients = compter_agregats(DIMENSION_CLIENT)
+        
+        logger.info(f"Affichage du dashboard - {total_transports} transports")
+        
+        return render_template('dashboard.html', 
+                            total_transports=total_transports,
+                            total_clients=total_clients)
+                        
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage du dashboard: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/clients')
+def clients():
+    """Page de gestion des clients (côté client)"""
+    try:
+        return render_template('clients.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage des clients: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/transporteurs')
+def transporteurs():
+    """Page de gestion des transporteurs (côté client)"""
+    try:
+        return render_template('transporteurs.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage des transporteurs: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/invitations')
+def invitations():
+    """Page de gestion des invitations de clients"""
+    try:
+        logger.info("🔍 Tentative d'accès à la page invitations")
+        
+        # Vérifier si le template existe
+        import os
+        template_path = os.path.join(current_app.template_folder, 'invitations.html')
+        if not os.path.exists(template_path):
+            logger.error(f"❌ Template non trouvé: {template_path}")
+            return f"Template non trouvé: {template_path}", 404
+        
+        logger.info("✅ Template trouvé, rendu de la page")
+        return render_template('invitations.html')
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de l'affichage des invitations: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.route('/invitation/<token>')
+def invitation_accept(token):
+    """Page pour accepter/refuser une invitation"""
+    try:
+        invitation = Invitation.query.filter_by(token=token).first()
+        
+        if not invitation:
+            return render_template('error.html', error='Invitation invalide ou expirée'), 404
+        
+        if invitation.statut != 'en_attente':
+            return render_template('error.html', error='Cette invitation a déjà été traitée'), 400
+        
+        return render_template('invitation_accept.html', invitation=invitation)
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage de l'invitation: {str(e)}")
+        return render_template('error.html', error=str(e)), 500
+
+
+@bp.app_errorhandler(404)
+def not_found(error):
+    """Gestion des erreurs 404"""
+    return render_template('error.html', error='Page non trouvée'), 404
+
+
+@bp.app_errorhandler(500)
+def internal_error(error):
+    """Gestion des erreurs 500"""
+    try:
+        db.session.rollback()
+    except Exception as rollback_error:
+        logger.error(f"❌ Erreur lors du rollback: {str(rollback_error)}")
+    
+    logger.error(f"❌ Erreur interne 500: {str(error)}")
+    logger.error(f"❌ Type d'erreur: {type(error).__name__}")
+    
+    try:
+        return render_template('error.html', error='Erreur interne du serveur'), 500
+    except Exception as template_error:
+        logger.error(f"❌ Erreur lors du rendu du template d'erreur: {str(template_error)}")
+        return f"""
+        <html>
+        <head><title>Erreur 500 - MyXploit</title></head>
+        <body>
+            <h1>❌ Erreur interne du serveur</h1>
+            <p>Une erreur s'est produite lors du traitement de votre demande.</p>
+            <p>Détails: {str(error)}</p>
+            <p><a href="/health">Vérifier le statut de l'application</a></p>
+        </body>
+        </html>
+        """, 500
@@ -0,0 +1,406 @@
+"""
+API des clients et des transporteurs
+"""
+
+import logging
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+
+from courriels import envoyer_email_confirmation_client, envoyer_email_confirmation_transporteur
+from extensions import db
+from models import Client, Invitation, Transporteur
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('partenaires', __name__)
+
+@bp.route('/api/clients', methods=['GET', 'POST', 'PUT', 'DELETE'])
+def api_clients():
+    """API pour gérer les clients"""
+    if request.method == 'GET':
+        try:
+            clients = Client.query.all()
+            clients_data = []
+            
+            for client in clients:
+                clients_data.append({
+                    'id': client.id,
+                    'nom': client.nom,
+                    'email': client.email,
+                    'telephone': client.telephone,
+                    'adresse': client.adresse,
+                    'siret': client.siret,
+                    'site_web': client.site_web,
+                    'description': client.description,
+                    'statut': client.statut,
+                    'created_at': client.created_at.strftime('%Y-%m-%d %H:%M:%S') if client.created_at else None
+                })
+            
+            return jsonify({
+                'success': True,
+                'clients': clients_data
+            })
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des clients: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    elif request.method == 'POST':
+        try:
+            data = request.get_json()
+            
+            # Validation des données
+            if not data.get('nom') or not data.get('email'):
+                return jsonify({'success': False, 'error': 'Nom et email sont obligatoires'}), 400
+            
+            # Vérifier si l'email existe déjà
+            if Client.query.filter_by(email=data['email']).first():
+                return jsonify({'success': False, 'error': 'Un client avec cet email existe déjà'}), 400
+            
+            # Créer le nouveau client
+            nouveau_client = Client(
+                nom=data.get('nom'),
+                email=data.get('email'),
+                telephone=data.get('telephone'),
+                adresse=data.get('adresse'),
+                siret=data.get('siret'),
+                site_web=data.get('site_web'),
+                description=data.get('description'),
+                statut='actif'
+            )
+            
+            db.session.add(nouveau_client)
+            db.session.commit()
+            
+            logger.info(f"✅ Nouveau client créé: {nouveau_client.nom} ({nouveau_client.email})")
+            
+            # Envoyer un email de confirmation
+            try:
+                email_en_file = envoyer_email_confirmation_client(nouveau_client)
+                if email_en_file:
+                    logger.info(f"📧 Email de confirmation mis en file pour {nouveau_client.email}")
+                else:
+                    logger.warning(f"⚠️ Échec de l'envoi d'email à {nouveau_client.email}")
+            except Exception as email_error:
+                logger.warning(f"⚠️ Erreur lors de l'envoi d'email: {str(email_error)}")
+            
+            return jsonify({
+                'success': True,
+                'message': 'Client créé avec succès. Un email de confirmation a été envoyé.',
+                'client': {
+                    'id': nouveau_client.id,
+                    'nom': nouveau_client.nom,
+                    'email': nouveau_client.email,
+                    'telephone': nouveau_client.telephone,
+                    'adresse': nouveau_client.adresse,
+                    'statut': nouveau_client.statut
+                }
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la création du client: {str(e)}")
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    elif request.method == 'PUT':
+        try:
+            data = request.get_json()
+            client_id = data.get('id')
+            
+            if not client_id:
+                return jsonify({'success': False, 'error': 'ID du client manquant'}), 400
+            
+            client = Client.query.get(client_id)
+            if not client:
+                return jsonify({'success': False, 'error': 'Client non trouvé'}), 404
+            
+            # Mettre à jour les champs
+            if data.get('nom'):
+                client.nom = data['nom']
+            if data.get('email'):
+                # Vérifier si l'email existe déjà pour un autre client
+                existing_client = Client.query.filter_by(email=data['email']).first()
+                if existing_client and existing_client.id != client_id:
+                    return jsonify({'success': False, 'error': 'Un autre client utilise déjà cet email'}), 400
+                client.email = data['email']
+            if data.get('telephone'):
+                client.telephone = data['telephone']
+            if data.get('adresse'):
+                client.adresse = data['adresse']
+            if data.get('siret'):
+                client.siret = data['siret']
+            if data.get('site_web'):
+                client.site_web = data['site_web']
+            if data.get('description'):
+                client.description = data['description']
+            if data.get('statut'):
+                client.statut = data['statut']
+            
+            client.updated_at = datetime.utcnow()
+            db.session.commit()
+            
+            logger.info(f"✅ Client modifié: {client.nom}")
+            
+            return jsonify({
+                'success': True,
+                'message': 'Client modifié avec succès',
+                'client': {
+                    'id': client.id,
+                    'nom': client.nom,
+                    'email': client.email,
+                    'telephone': client.telephone,
+                    'adresse': client.adresse,
+                    'statut': client.statut
+                }
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la modification du client: {str(e)}")
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    elif request.method == 'DELETE':
+        try:
+            data = request.get_json()
+            client_id = data.get('id')
+            
+            if not client_id:
+                return jsonify({'success': False, 'error': 'ID du client manquant'}), 400
+            
+            client = Client.query.get(client_id)
+            if not client:
+                return jsonify({'success': False, 'error': 'Client non trouvé'}), 404
+            
+            nom_client = client.nom
+            db.session.delete(client)
+            db.session.commit()
+            
+            logger.info(f"✅ Client supprimé: {nom_client} (ID: {client_id})")
+            
+            return jsonify({
+                'success': True,
+                'message': 'Client supprimé avec succès'
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression du client: {str(e)}")
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/clients/<int:client_id>', methods=['DELETE'])
+def delete_client_by_id(client_id):
+    """Supprimer un client par son ID"""
+    try:
+        client = Client.query.get(client_id)
+        if not client:
+            return jsonify({'success': False, 'error': 'Client non trouvé'}), 404
+        
+        nom_client = client.nom
+        
+        # Vérifier s'il y a des transports associés à ce client
+        from sqlalchemy import text
+        transports_count = db.session.execute(
+            text("SELECT COUNT(*) FROM transports WHERE client_id = :client_id"),
+            {'client_id': client_id}
+        ).scalar()
+        
+        if transports_count > 0:
+            return jsonify({
+                'success': False, 
+                'error': f'Impossible de supprimer ce client car il a {transports_count} transport(s) associé(s). Supprimez d\'abord les transports.'
+            }), 400
+        
+        # Supprimer les invitations associées à ce client
+        invitations = Invitation.query.filter_by(email=client.email).all()
+        for invitation in invitations:
+            db.session.delete(invitation)
+        
+        # Supprimer le client
+        db.session.delete(client)
+        db.session.commit()
+        
+        logger.info(f"✅ Client supprimé: {nom_client} (ID: {client_id})")
+        
+        return jsonify({
+            'success': True,
+            'message': f'Client "{nom_client}" supprimé avec succès'
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la suppression du client {client_id}: {str(e)}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/transporteurs', methods=['GET', 'POST', 'PUT', 'DELETE'])
+def api_transporteurs():
+    """API pour gérer les transporteurs"""
+    if request.method == 'GET':
+        try:
+            transporteurs = Transporteur.query.all()
+            transporteurs_data = []
+            
+            for transporteur in transporteurs:
+                transporteurs_data.append({
+                    'id': transporteur.id,
+                    'nom': transporteur.nom,
+                    'email': transporteur.email,
+                    'telephone': transporteur.telephone,
+                    'adresse': transporteur.adresse,
+                    'siret': transporteur.siret,
+                    'site_web': transporteur.site_web,
+                    'description': transporteur.description,
+                    'statut': transporteur.statut,
+                    'created_at': transporteur.created_at.strftime('%Y-%m-%d %H:%M:%S') if transporteur.created_at else None
+                })
+            
+            return jsonify({
+                'success': True,
+                'transporteurs': transporteurs_data
+            })
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des transporteurs: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    elif request.method == 'POST':
+        try:
+            data = request.get_json()
+            
+            # Validation des données
+            if not data.get('nom') or not data.get('email'):
+                return jsonify({'success': False, 'error': 'Nom et email sont obligatoires'}), 400
+            
+            # Vérifier si l'email existe déjà
+            if Transporteur.query.filter_by(email=data['email']).first():
+                return jsonify({'success': False, 'error': 'Un transporteur avec cet email existe déjà'}), 400
+            
+            # Créer le nouveau transporteur
+            nouveau_transporteur = Transporteur(
+                nom=data.get('nom'),
+                email=data.get('email'),
+                telephone=data.get('telephone'),
+                adresse=data.get('adresse'),
+                siret=data.get('siret'),
+                site_web=data.get('site_web'),
+                description=data.get('description'),
+                statut='actif'
+            )
+            
+            db.session.add(nouveau_transporteur)
+            db.session.commit()
+            
+            logger.info(f"✅ Nouveau transporteur créé: {nouveau_transporteur.nom} ({nouveau_transporteur.email})")
+            
+            # Envoyer un email de confirmation
+            try:
+                email_en_file = envoyer_email_confirmation_transporteur(nouveau_transporteur)
+                if email_en_file:
+                    logger.info(f"📧 Email de confirmation mis en file pour {nouveau_transporteur.email}")
+                else:
+                    logger.warning(f"⚠️ Échec de l'envoi d'email à {nouveau_transporteur.email}")
+            except Exception as email_error:
+                logger.warning(f"⚠️ Erreur lors de l'envoi d'email: {str(email_error)}")
+            
+            return jsonify({
+                'success': True,
+                'message': 'Transporteur créé avec succès. Un email de confirmation a été envoyé.',
+                'transporteur': {
+                    'id': nouveau_transporteur.id,
+                    'nom': nouveau_transporteur.nom,
+                    'email': nouveau_transporteur.email,
+                    'telephone': nouveau_transporteur.telephone,
+                    'adresse': nouveau_transporteur.adresse,
+                    'statut': nouveau_transporteur.statut
+                }
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la création du transporteur: {str(e)}")
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    elif request.method == 'PUT':
+        try:
+            data = request.get_json()
+            transporteur_id = data.get('id')
+            
+            if not transporteur_id:
+                return jsonify({'success': False, 'error': 'ID du transporteur manquant'}), 400
+            
+            transporteur = Transporteur.query.get(transporteur_id)
+            if not transporteur:
+                return jsonify({'success': False, 'error': 'Transporteur non trouvé'}), 404
+            
+            # Mettre à jour les champs
+            if data.get('nom'):
+                transporteur.nom = data['nom']
+            if data.get('email'):
+                # Vérifier si l'email existe déjà pour un autre transporteur
+                existing_transporteur = Transporteur.query.filter_by(email=data['email']).first()
+                if existing_transporteur and existing_transporteur.id != transporteur_id:
+                    return jsonify({'success': False, 'error': 'Un autre transporteur utilise déjà cet email'}), 400
+                transporteur.email = data['email']
+            if data.get('telephone'):
+                transporteur.telephone = data['telephone']
+            if data.get('adresse'):
+                transporteur.adresse = data['adresse']
+            if data.get('siret'):
+                transporteur.siret = data['siret']
+            if data.get('site_web'):
+                transporteur.site_web = data['site_web']
+            if data.get('description'):
+                transporteur.description = data['description']
+            if data.get('statut'):
+                transporteur.statut = data['statut']
+            
+            transporteur.updated_at = datetime.utcnow()
+            db.session.commit()
+            
+            logger.info(f"✅ Transporteur modifié: {transporteur.nom}")
+            
+            return jsonify({
+                'success': True,
+                'message': 'Transporteur modifié avec succès',
+                'transporteur': {
+                    'id': transporteur.id,
+                    'nom': transporteur.nom,
+                    'email': transporteur.email,
+                    'telephone': transporteur.telephone,
+                    'adresse': transporteur.adresse,
+                    'statut': transporteur.statut
+                }
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la modification du transporteur: {str(e)}")
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    elif request.method == 'DELETE':
+        try:
+            data = request.get_json()
+            transporteur_id = data.get('id')
+            
+            if not transporteur_id:
+                return jsonify({'success': False, 'error': 'ID du transporteur manquant'}), 400
+            
+            transporteur = Transporteur.query.get(transporteur_id)
+            if not transporteur:
+                return jsonify({'success': False, 'error': 'Transporteur non trouvé'}), 404
+            
+            nom_transporteur = transporteur.nom
+            db.session.delete(transporteur)
+            db.session.commit()
+            
+            logger.info(f"✅ Transporteur supprimé: {nom_transporteur} (ID: {transporteur_id})")
+            
+            return jsonify({
+                'success': True,
+                'message': 'Transporteur supprimé avec succès'
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression du transporteur: {str(e)}")
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
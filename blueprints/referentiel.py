@@ -0,0 +1,492 @@
+"""
+API des véhicules et des énergies
+"""
+
+import logging
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+
+from calculs_transports import recalculer_emissions_dependantes
+from extensions import db
+from models import Energie, Transport, Vehicule
+from referentiel import reponse_referentiel
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('referentiel', __name__)
+
+@bp.route('/api/vehicules', methods=['GET', 'POST'])
+def api_vehicules():
+    """API pour récupérer et créer des véhicules"""
+    if request.method == 'GET':
+        try:
+            return reponse_referentiel('vehicules')
+        
+        except Exception as e:
+            logger.error(f"Erreur API véhicules GET: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+    
+    elif request.method == 'POST':
+        """Créer un nouveau véhicule"""
+        try:
+            logger.info("=== CRÉATION DE VÉHICULE ===")
+            
+            data = request.get_json()
+            logger.info(f"📥 Données reçues: {data}")
+            
+            # Validation des données
+            if not data:
+                return jsonify({'success': False, 'error': 'Données JSON manquantes'}), 400
+                
+            if not data.get('nom'):
+                return jsonify({'success': False, 'error': 'Nom du véhicule requis'}), 400
+            
+            # Créer le véhicule
+            nouveau_vehicule = Vehicule(
+                nom=data['nom'],
+                type=data.get('type', 'PORTEUR'),
+                energie_id=data.get('energie_id'),
+                charge_utile=float(data.get('capacite', 0)),
+                consommation=float(data.get('consommation', 0)),
+                emissions=float(data.get('emissions', 0)),
+                description=data.get('description', '')
+            )
+            
+            db.session.add(nouveau_vehicule)
+            db.session.commit()
+            
+            logger.info(f"✅ Véhicule créé avec succès: {nouveau_vehicule.id}")
+            
+            return jsonify({
+                'success': True,
+                'message': 'Véhicule créé avec succès',
+                'vehicule': {
+                    'id': nouveau_vehicule.id,
+                    'nom': nouveau_vehicule.nom,
+                    'type': nouveau_vehicule.type,
+                    'energie_id': nouveau_vehicule.energie_id,
+                    'consommation': nouveau_vehicule.consommation,
+                    'emissions': nouveau_vehicule.emissions,
+                    'charge_utile': nouveau_vehicule.charge_utile,
+                    'description': nouveau_vehicule.description
+                }
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur création véhicule: {str(e)}")
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': f'Erreur lors de la création: {str(e)}'
+            }), 500
+
+
+@bp.route('/api/vehicules/<int:vehicule_id>', methods=['PUT', 'DELETE'])
+def api_vehicule_detail(vehicule_id):
+    """API pour modifier et supprimer un véhicule spécifique"""
+    try:
+        vehicule = Vehicule.query.get(vehicule_id)
+        if not vehicule:
+            return jsonify({'success': False, 'error': 'Véhicule non trouvé'}), 404
+        
+        if request.method == 'PUT':
+            """Modifier un véhicule"""
+            data = request.get_json()
+            logger.info(f"📝 Modification véhicule {vehicule_id}: {data}")
+            
+            anciennes_valeurs = (vehicule.consommation, vehicule.emissions)
+            
+            if data.get('nom'):
+                vehicule.nom = data['nom']
+            if data.get('type'):
+                vehicule.type = data['type']
+            if data.get('energie_id') is not None:
+                vehicule.energie_id = data['energie_id']
+            if data.get('capacite') is not None:
+                vehicule.charge_utile = float(data['capacite'])
+            if data.get('consommation') is not None:
+                vehicule.consommation = float(data['consommation'])
+            if data.get('emissions') is not None:
+                vehicule.emissions = float(data['emissions'])
+            if data.get('description') is not None:
+                vehicule.description = data['description']
+            
+            valeurs_modifiees = (vehicule.consommation, vehicule.emissions) != anciennes_valeurs
+            db.session.commit()
+            logger.info(f"✅ Véhicule {vehicule_id} modifié avec succès")
+            
+            # Recalculer uniquement les transports qui utilisent ce véhicule
+            transports_recalcules = recalculer_emissions_dependantes(vehicule_id=vehicule_id) if valeurs_modifiees else 0
+            
+            return jsonify({
+                'success': True,
+                'message': 'Véhicule modifié avec succès',
+                'transports_recalcules': transports_recalcules
+            })
+        
+        elif request.method == 'DELETE':
+            """Supprimer un véhicule"""
+            # Vérifier si le véhicule est utilisé dans des transports
+            transports_utilisant_vehicule = Transport.query.filter_by(vehicule_id=vehicule_id).count()
+            if transports_utilisant_vehicule > 0:
+                return jsonify({
+                    'success': False,
+                    'error': f'Ce véhicule est utilisé par {transports_utilisant_vehicule} transport(s). Impossible de le supprimer.'
+                }), 400
+            
+            db.session.delete(vehicule)
+            db.session.commit()
+            logger.info(f"✅ Véhicule {vehicule_id} supprimé avec succès")
+            
+            return jsonify({
+                'success': True,
+                'message': 'Véhicule supprimé avec succès'
+            })
+    
+    except Exception as e:
+        logger.error(f"Erreur API véhicule {vehicule_id}: {str(e)}")
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@bp.route('/api/energies')
+def api_energies():
+    """API pour récupérer les énergies"""
+    try:
+        return reponse_referentiel('energies')
+    
+    except Exception as e:
+        logger.error(f"Erreur API énergies: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@bp.route('/api/energies', methods=['POST'])
+def creer_energie():
+    """Créer une nouvelle énergie"""
+    try:
+        logger.info("=== CRÉATION D'ÉNERGIE ===")
+        
+        data = request.get_json()
+        logger.info(f"📥 JSON parsé: {data}")
+        logger.info(f"📊 Type de données: {type(data)}")
+        
+        # Validation des données
+        if not data:
+            logger.error("❌ Données JSON manquantes ou invalides")
+            return jsonify({'success': False, 'error': 'Données JSON manquantes ou invalides'}), 400
+            
+        if not data.get('nom') or not data.get('identifiant'):
+            logger.error(f"❌ Validation échouée - nom: '{data.get('nom')}', identifiant: '{data.get('identifiant')}'")
+            return jsonify({'success': False, 'error': 'Nom et identifiant requis'}), 400
+        
+        # Vérifier si l'identifiant existe déjà
+        logger.info(f"🔍 Vérification de l'identifiant: {data['identifiant']}")
+        energie_existante = Energie.query.filter_by(identifiant=data['identifiant']).first()
+        if energie_existante:
+            logger.error(f"❌ Identifiant déjà existant: {data['identifiant']} (ID: {energie_existante.id})")
+            return jsonify({'success': False, 'error': 'Cet identifiant existe déjà'}), 400
+        else:
+            logger.info(f"✅ Identifiant disponible: {data['identifiant']}")
+        
+        # Validation des types de données
+        try:
+            unite = data.get('unite', 'L')
+            logger.info(f"🔍 Unité: '{unite}' (type: {type(unite)})")
+            
+            facteur = None
+            if data.get('facteur') is not None:
+                facteur = float(data.get('facteur'))
+                logger.info(f"🔍 Facteur: {facteur} (type: {type(facteur)})")
+            else:
+                logger.info("🔍 Facteur: None (non fourni)")
+            
+            description = data.get('description', '')
+            logger.info(f"🔍 Description: '{description}' (type: {type(description)})")
+            
+        except (ValueError, TypeError) as e:
+            logger.error(f"❌ Erreur de conversion de type: {str(e)}")
+            return jsonify({'success': False, 'error': f'Type de données invalide: {str(e)}'}), 400
+        
+        # Créer la nouvelle énergie
+        logger.info("🏗️ Création de l'énergie avec les données validées:")
+        logger.info(f"   - nom: {data['nom']}")
+        logger.info(f"   - identifiant: {data['identifiant']}")
+        logger.info(f"   - unite: {unite}")
+        logger.info(f"   - facteur: {facteur}")
+        logger.info(f"   - description: {description}")
+        
+        nouvelle_energie = Energie(
+            nom=data['nom'],
+            identifiant=data['identifiant'],
+            unite=unite,
+            facteur=facteur,
+            description=description
+        )
+        
+        logger.info(f"📝 Objet énergie créé: {nouvelle_energie.nom} (ID: {nouvelle_energie.id})")
+        logger.info("📊 Attributs de l'objet:")
+        logger.info(f"   - nom: {nouvelle_energie.nom}")
+        logger.info(f"   - identifiant: {nouvelle_energie.identifiant}")
+        logger.info(f"   - unite: {nouvelle_energie.unite}")
+        logger.info(f"   - facteur: {nouvelle_energie.facteur}")
+        logger.info(f"   - description: {nouvelle_energie.description}")
+        
+        # Vérifier la validité de l'objet avant l'ajout
+        try:
+            db.session.add(nouvelle_energie)
+            logger.info("✅ Objet ajouté à la session")
+            
+            # Vérifier que l'objet est valide
+            db.session.flush()
+            logger.info("✅ Objet validé par la base de données")
+            
+            db.session.commit()
+            logger.info(f"💾 Énergie sauvegardée en base avec l'ID: {nouvelle_energie.id}")
+            
+        except Exception as db_error:
+            logger.error(f"❌ Erreur lors de la sauvegarde en base: {str(db_error)}")
+            logger.error(f"❌ Type d'erreur: {type(db_error).__name__}")
+            db.session.rollback()
+            return jsonify({'success': False, 'error': f'Erreur de base de données: {str(db_error)}'}), 500
+        
+        logger.info(f"✅ Nouvelle énergie créée: {nouvelle_energie.nom}")
+        return jsonify({
+            'success': True, 
+            'message': 'Énergie créée avec succès',
+            'energie_id': nouvelle_energie.id,
+            'id': nouvelle_energie.id
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la création de l'énergie: {str(e)}")
+        logger.error(f"❌ Type d'erreur: {type(e).__name__}")
+        logger.error(f"❌ Détails de l'erreur: {str(e)}")
+        
+        try:
+            db.session.rollback()
+            logger.info("✅ Rollback effectué")
+        except Exception as rollback_error:
+            logger.error(f"❌ Erreur lors du rollback: {str(rollback_error)}")
+        
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/energies/<int:energie_id>', methods=['PUT'])
+def modifier_energie(energie_id):
+    """Modifier une énergie existante"""
+    try:
+        energie = Energie.query.get_or_404(energie_id)
+        data = request.get_json()
+        
+        # Validation des données
+        if not data.get('nom'):
+            return jsonify({'success': False, 'error': 'Nom requis'}), 400
+        
+        # Vérifier si l'identifiant existe déjà (sauf pour cette énergie)
+        if data.get('identifiant') and data['identifiant'] != energie.identifiant:
+            if Energie.query.filter_by(identifiant=data['identifiant']).first():
+                return jsonify({'success': False, 'error': 'Cet identifiant existe déjà'}), 400
+        
+        # Mettre à jour l'énergie
+        ancien_facteur = energie.facteur
+        energie.nom = data['nom']
+        if data.get('identifiant'):
+            energie.identifiant = data['identifiant']
+        if data.get('unite'):
+            energie.unite = data['unite']
+        if data.get('facteur') is not None:
+            energie.facteur = float(data['facteur'])
+        energie.description = data.get('description', '')
+        facteur_modifie = energie.facteur != ancien_facteur
+        
+        db.session.commit()
+        
+        logger.info(f"✅ Énergie modifiée: {energie.nom}")
+        
+        # Recalculer uniquement les transports qui utilisent cette énergie
+        transports_recalcules = recalculer_emissions_dependantes(energie_id=energie_id) if facteur_modifie else 0
+        
+        return jsonify({
+            'success': True,
+            'message': 'Énergie modifiée avec succès',
+            'transports_recalcules': transports_recalcules
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la modification de l'énergie: {str(e)}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/energies/<int:energie_id>', methods=['DELETE'])
+def supprimer_energie(energie_id):
+    """Supprimer une énergie"""
+    try:
+        energie = Energie.query.get_or_404(energie_id)
+        
+        # Vérifier si l'énergie est utilisée dans des transports
+        transports_utilisant_energie = Transport.query.filter_by(energie_id=energie_id).count()
+        if transports_utilisant_energie > 0:
+            return jsonify({
+                'success': False, 
+                'error': f'Cette énergie est utilisée par {transports_utilisant_energie} transport(s). Impossible de la supprimer.'
+            }), 400
+        
+        nom_energie = energie.nom
+        db.session.delete(energie)
+        db.session.commit()
+        
+        logger.info(f"✅ Énergie supprimée: {nom_energie}")
+        return jsonify({'success': True, 'message': 'Énergie supprimée avec succès'})
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la suppression de l'énergie: {str(e)}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/energies/<int:energie_id>/facteurs', methods=['PUT'])
+def modifier_facteurs_energie(energie_id):
+    """Modifier les facteurs d'émission d'une énergie"""
+    try:
+        energie = Energie.query.get_or_404(energie_id)
+        data = request.get_json()
+        
+        # Validation des données
+        if not data:
+            return jsonify({'success': False, 'error': 'Données manquantes'}), 400
+        
+        ancien_facteur = energie.facteur
+        
+        # Mettre à jour les facteurs avec gestion d'erreur robuste
+        try:
+            if 'phase_amont' in data:
+                if hasattr(energie, 'phase_amont'):
+                    energie.phase_amont = float(data['phase_amont'])
+                else:
+                    logger.warning("⚠️ Colonne 'phase_amont' non disponible")
+            
+            if 'phase_fonctionnement' in data:
+                if hasattr(energie, 'phase_fonctionnement'):
+                    energie.phase_fonctionnement = float(data['phase_fonctionnement'])
+                else:
+                    logger.warning("⚠️ Colonne 'phase_fonctionnement' non disponible")
+            
+            if 'total' in data:
+                energie.facteur = float(data['total'])
+            
+            # Mettre à jour les données supplémentaires
+            if 'donnees_supplementaires' in data:
+                if hasattr(energie, 'donnees_supplementaires'):
+                    energie.donnees_supplementaires = data['donnees_supplementaires']
+                else:
+                    logger.warning("⚠️ Colonne 'donnees_supplementaires' non disponible")
+                    
+        except AttributeError as attr_error:
+            logger.warning(f"⚠️ Colonne non disponible: {str(attr_error)}")
+            # Continuer avec les colonnes disponibles
+        except ValueError as val_error:
+            logger.error(f"❌ Erreur de conversion de valeur: {str(val_error)}")
+            return jsonify({'success': False, 'error': f'Valeur invalide: {str(val_error)}'}), 400
+        
+        facteur_modifie = energie.facteur != ancien_facteur
+        db.session.commit()
+        
+        logger.info(f"✅ Facteurs mis à jour pour l'énergie {energie.nom}")
+        
+        # Recalculer uniquement les transports qui utilisent cette énergie
+        transports_recalcules = recalculer_emissions_dependantes(energie_id=energie_id) if facteur_modifie else 0
+        
+        return jsonify({
+            'success': True, 
+            'message': 'Facteurs mis à jour avec succès',
+            'transports_recalcules': transports_recalcules,
+            'energie': {
+                'id': energie.id,
+                'nom': energie.nom,
+                'phase_amont': getattr(energie, 'phase_amont', 0),
+                'phase_fonctionnement': getattr(energie, 'phase_fonctionnement', 0),
+                'total': energie.facteur,
+                'donnees_supplementaires': getattr(energie, 'donnees_supplementaires', {})
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la mise à jour des facteurs: {str(e)}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/energies/<int:energie_id>/donnees', methods=['POST'])
+def ajouter_donnee_energie(energie_id):
+    """Ajouter une nouvelle donnée à une énergie"""
+    try:
+        energie = Energie.query.get_or_404(energie_id)
+        data = request.get_json()
+        
+        # Validation des données
+        if not data.get('nom') or data.get('valeur') is None:
+            return jsonify({'success': False, 'error': 'Nom et valeur requis'}), 400
+        
+        # Récupérer ou créer les données supplémentaires
+        donnees_supp = getattr(energie, 'donnees_supplementaires', {}) or {}
+        
+        # Ajouter la nouvelle donnée
+        donnees_supp[data['nom']] = {
+            'valeur': float(data['valeur']),
+            'unite': data.get('unite', 'kg éq. CO₂'),
+            'description': data.get('description', ''),
+            'date_ajout': datetime.utcnow().isoformat()
+        }
+        
+        # Mettre à jour l'énergie
+        energie.donnees_supplementaires = donnees_supp
+        db.session.commit()
+        
+        logger.info(f"✅ Donnée ajoutée à l'énergie {energie.nom}: {data['nom']}")
+        return jsonify({
+            'success': True,
+            'message': 'Donnée ajoutée avec succès',
+            'donnee': donnees_supp[data['nom']]
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de l'ajout de la donnée: {str(e)}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/energies/<int:energie_id>/donnees/<nom_donnee>', methods=['DELETE'])
+def supprimer_donnee_energie(energie_id, nom_donnee):
+    """Supprimer une donnée d'une énergie"""
+    try:
+        energie = Energie.query.get_or_404(energie_id)
+        
+        # Récupérer les données supplémentaires
+        donnees_supp = getattr(energie, 'donnees_supplementaires', {}) or {}
+        
+        if nom_donnee not in donnees_supp:
+            return jsonify({'success': False, 'error': 'Donnée non trouvée'}), 404
+        
+        # Supprimer la donnée
+        del donnees_supp[nom_donnee]
+        energie.donnees_supplementaires = donnees_supp
+        db.session.commit()
+        
+        logger.info(f"✅ Donnée supprimée de l'énergie {energie.nom}: {nom_donnee}")
+        return jsonify({'success': True, 'message': 'Donnée supprimée avec succès'})
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la suppression de la donnée: {str(e)}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,323 @@
+"""
+Santé de l'application et routes de diagnostic
+"""
+
+import os
+import logging
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, jsonify, render_template
+from sqlalchemy import text
+
+from extensions import db, file_courriels, metriques
+from models import Client, Energie, Invitation, Transport, Transporteur, Vehicule
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('systeme', __name__)
+
+def statistiques_pool():
+    """Occupation et réglages du pool de connexions du worker courant"""
+    pool = db.engine.pool
+    statistiques = {'type': type(pool).__name__, 'pid': os.getpid()}
+    if hasattr(pool, 'checkedout'):
+        statistiques.update({
+            'taille': pool.size(),
+            'disponibles': pool.checkedin(),
+            'utilisees': pool.checkedout(),
+            'debordement': max(0, pool.overflow())
+        })
+    options = current_app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    statistiques['reglages'] = {
+        cle: options[cle]
+        for cle in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+        if cle in options
+    }
+    return statistiques
+
+
+@bp.route('/health')
+def health_check():
+    """Point de contrôle de santé pour le déploiement"""
+    try:
+        # Vérifier la base de données
+        db.session.execute(text('SELECT 1'))
+        db_status = 'OK'
+        db_details = 'Connexion réussie'
+    except Exception as e:
+        db_status = f'ERROR: {str(e)}'
+        db_details = f'Type: {type(e).__name__}'
+    
+    # Vérifier les modèles
+    try:
+        energie_count = Energie.query.count()
+        transport_count = Transport.query.count()
+        vehicule_count = Vehicule.query.count()
+        models_status = 'OK'
+        models_details = {
+            'energies': energie_count,
+            'transports': transport_count,
+            'vehicules': vehicule_count
+        }
+    except Exception as e:
+        models_status = f'ERROR: {str(e)}'
+        models_details = f'Type: {type(e).__name__}'
+    
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.utcnow().isoformat(),
+        'database': {
+            'status': db_status,
+            'details': db_details,
+            'pool': statistiques_pool()
+        },
+        'models': {
+            'status': models_status,
+            'details': models_details
+        },
+        'courriels': file_courriels.etat(),
+        'app_info': {
+            'flask_version': '2.3.3',
+            'sqlalchemy_version': '2.0.43',
+            'environment': current_app.config.get('ENV', 'production'),
+            'blueprints': list(current_app.blueprints)
+        }
+    })
+
+
+@bp.route('/metrics')
+def metrics():
+    """Mesures des requêtes HTTP et SQL de tous les workers (étiquette `pid`), format texte Prometheus (METRIQUES_ACTIVES)"""
+    if not metriques.actives:
+        return jsonify({'success': False, 'error': 'Mesures désactivées (METRIQUES_ACTIVES)'}), 404
+    return Response(metriques.exposition(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/debug/database')
+def debug_database():
+    """Route de diagnostic pour la structure de la base de données"""
+    try:
+        # Vérifier la structure de la table energies
+        with db.engine.connect() as conn:
+            # Pour PostgreSQL
+            if 'postgresql' in str(db.engine.url):
+                # Récupérer la structure de la table energies
+                result = conn.execute(text("""
+                    SELECT column_name, data_type, is_nullable, column_default
+                    FROM information_schema.columns 
+                    WHERE table_name = 'energies'
+                    ORDER BY ordinal_position
+                """))
+                
+                columns = []
+                for row in result:
+                    columns.append({
+                        'name': row[0],
+                        'type': row[1],
+                        'nullable': row[2],
+                        'default': row[3]
+                    })
+                
+                # Vérifier les colonnes manquantes
+                missing_columns = []
+                required_columns = ['phase_amont', 'phase_fonctionnement', 'donnees_supplementaires']
+                existing_columns = [col['name'] for col in columns]
+                
+                for col in required_columns:
+                    if col not in existing_columns:
+                        missing_columns.append(col)
+                
+                # Vérifier les données existantes
+                try:
+                    energie_count = Energie.query.count()
+                    vehicule_count = Vehicule.query.count()
+                    sample_energies = Energie.query.limit(3).all()
+                    sample_vehicules = Vehicule.query.limit(3).all()
+                    
+                    sample_data = {
+                        'energies': [],
+                        'vehicules': []
+                    }
+                    
+                    for e in sample_energies:
+                        sample_data['energies'].append({
+                            'id': e.id,
+                            'nom': e.nom,
+                            'has_phase_amont': hasattr(e, 'phase_amont'),
+                            'has_phase_fonctionnement': hasattr(e, 'phase_fonctionnement'),
+                            'has_donnees_supplementaires': hasattr(e, 'donnees_supplementaires')
+                        })
+                    
+                    for v in sample_vehicules:
+                        sample_data['vehicules'].append({
+                            'id': v.id,
+                            'nom': v.nom,
+                            'type': v.type,
+                            'consommation': v.consommation,
+                            'emissions': v.emissions,
+                            'charge_utile': v.charge_utile
+                        })
+                        
+                except Exception as model_error:
+                    sample_data = f"Erreur modèles: {str(model_error)}"
+                
+                return jsonify({
+                    'success': True,
+                    'database_type': 'PostgreSQL',
+                    'table': 'energies',
+                    'columns': columns,
+                    'missing_columns': missing_columns,
+                    'total_columns': len(columns),
+                    'data_info': {
+                        'total_energies': energie_count if 'energie_count' in locals() else 'N/A',
+                        'sample_data': sample_data
+                    }
+                })
+            else:
+                return jsonify({
+                    'success': True,
+                    'database_type': 'SQLite',
+                    'message': 'Structure automatiquement gérée par SQLAlchemy'
+                })
+                
+    except Exception as e:
+        logger.error(f"❌ Erreur lors du diagnostic de la base: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': type(e).__name__
+        }), 500
+
+
+@bp.route('/debug')
+def debug_page():
+    """Page de debug pour diagnostiquer la base de données"""
+    return render_template('debug.html')
+
+
+@bp.route('/debug/invitations')
+def debug_invitations():
+    """Debug spécifique pour les invitations"""
+    try:
+        # Vérifier les modèles
+        invitations_count = Invitation.query.count()
+        clients_count = Client.query.count() if 'Client' in globals() else 0
+        transporteurs_count = Transporteur.query.count() if 'Transporteur' in globals() else 0
+        
+        # Vérifier les templates
+        import os
+        template_folder = current_app.template_folder
+        invitations_template = os.path.join(template_folder, 'invitations.html')
+        base_template = os.path.join(template_folder, 'base.html')
+        
+        debug_info = {
+            'status': 'OK',
+            'models': {
+                'invitations_count': invitations_count,
+                'clients_count': clients_count,
+                'transporteurs_count': transporteurs_count
+            },
+            'templates': {
+                'template_folder': template_folder,
+                'invitations_template_exists': os.path.exists(invitations_template),
+                'base_template_exists': os.path.exists(base_template),
+                'invitations_template_path': invitations_template,
+                'base_template_path': base_template
+            },
+            'routes': {
+                '/invitations': 'invitations()',
+                '/api/invitations': 'api_invitations()',
+                '/invitation/<token>': 'invitation_accept(token)'
+            }
+        }
+        
+        return jsonify(debug_info)
+        
+    except Exception as e:
+        logger.error(f"Erreur debug invitations: {str(e)}")
+        return jsonify({
+            'status': 'ERROR',
+            'error': str(e),
+            'error_type': type(e).__name__
+        }), 500
+
+
+@bp.route('/test-invitations')
+def test_invitations_page():
+    """Page de test pour diagnostiquer les problèmes d'invitations"""
+    try:
+        return render_template('test_invitations.html')
+    except Exception as e:
+        logger.error(f"Erreur lors de l'affichage de la page de test invitations: {str(e)}")
+        return f"Erreur page de test: {str(e)}", 500
+
+
+@bp.route('/debug/vehicules')
+def debug_vehicules_page():
+    """Page de debug spécifique pour les véhicules"""
+    return render_template('debug_vehicules.html')
+
+
+@bp.route('/debug/migrate')
+def force_migration():
+    """Route pour forcer la migration des colonnes manquantes"""
+    try:
+        with db.engine.connect() as conn:
+            if 'postgresql' in str(db.engine.url):
+                # Forcer l'ajout des colonnes manquantes
+                columns_to_add = [
+                    ('phase_amont', 'FLOAT DEFAULT 0.0'),
+                    ('phase_fonctionnement', 'FLOAT DEFAULT 0.0'),
+                    ('donnees_supplementaires', 'JSONB DEFAULT \'{}\'')
+                ]
+                
+                added_columns = []
+                existing_columns = []
+                errors = []
+                
+                for column_name, column_definition in columns_to_add:
+                    try:
+                        # Vérifier si la colonne existe
+                        result = conn.execute(text(f"""
+                            SELECT column_name 
+                            FROM information_schema.columns 
+                            WHERE table_name = 'energies' 
+                            AND column_name = '{column_name}'
+                        """))
+                        
+                        if not result.fetchone():
+                            # Ajouter la colonne
+                            conn.execute(text(f"ALTER TABLE energies ADD COLUMN {column_name} {column_definition}"))
+                            added_columns.append(column_name)
+                        else:
+                            existing_columns.append(column_name)
+                            
+                    except Exception as col_error:
+                        if "already exists" in str(col_error).lower() or "duplicate column" in str(col_error).lower():
+                            existing_columns.append(column_name)
+                        else:
+                            errors.append(f"{column_name}: {str(col_error)}")
+                
+                # Valider les changements
+                conn.commit()
+                
+                return jsonify({
+                    'success': True,
+                    'message': 'Migration terminée',
+                    'added_columns': added_columns,
+                    'existing_columns': existing_columns,
+                    'errors': errors
+                })
+            else:
+                return jsonify({
+                    'success': True,
+                    'message': 'SQLite détecté - migration non nécessaire'
+                })
+                
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la migration forcée: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': type(e).__name__
+        }), 500
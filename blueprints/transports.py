@@ -0,0 +1,893 @@
+"""
+API des transports : pagination, CRUD par lots, phases, import CSV, export et recalculs
+"""
+
+import os
+import sys
+import json
+import uuid
+import logging
+from datetime import datetime, timedelta
+
+import click
+from flask import Blueprint, Response, current_app, jsonify, request, url_for
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from calculs_transports import phases_du_transport, recalculer_transport_phases
+from emissions_engine import MODE_STANDARD, MODE_VECTORISE
+from export_transports import exporter_transports, FORMATS_EXPORT, TAILLE_LOT_EXPORT, verifier_format
+from extensions import db, gestionnaire_jobs
+from import_transports import COLONNES_OBLIGATOIRES
+from models import Client, PhaseTransport, Transport, Transporteur
+from pagination import CurseurInvalide, decoder_curseur, encoder_curseur, segments_page
+from phases_transport import valeurs_phase, valeurs_phases
+from plans_requetes import controler_plans
+from referentiel import charger_referentiel_emissions
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('transports', __name__)
+
+# Colonnes de tri proposées par les listes de transports (toujours départagées par l'id)
+TRIS_TRANSPORTS = {
+    'date': Transport.created_at,
+    'ref': Transport.ref,
+    'emis_kg': Transport.emis_kg,
+    'id': Transport.id
+}
+
+
+# Paramètres de filtre de la liste des transports (voir conditions_filtres_transports)
+FILTRES_TRANSPORTS = ('energie', 'type_vehicule', 'niveau_calcul', 'type_transport', 'date', 'date_debut', 'date_fin')
+
+
+def _lire_date(valeur, nom):
+    try:
+        return datetime.strptime(valeur, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"Paramètre '{nom}' invalide (format attendu: AAAA-MM-JJ)")
+
+
+def conditions_filtres_transports(args):
+    """Construit les conditions SQL des filtres de la liste des transports
+    
+    Filtres reconnus : energie, type_vehicule (id ou valeur saisie), niveau_calcul,
+    type_transport, date (un jour), date_debut et date_fin (incluses) sur la date
+    de création.
+    """
+    conditions = []
+    for nom in ('niveau_calcul', 'type_transport'):
+        valeur = (args.get(nom) or '').strip()
+        if valeur:
+            conditions.append(getattr(Transport, nom) == valeur)
+    # Un id d'énergie ou de véhicule est filtré sur la clé étrangère (indexée avec la date)
+    for nom, colonne_texte, colonne_id in (
+        ('energie', Transport.energie, Transport.energie_id),
+        ('type_vehicule', Transport.type_vehicule, Transport.vehicule_id)
+    ):
+        valeur = (args.get(nom) or '').strip()
+        if valeur:
+            conditions.append(colonne_id == int(valeur) if valeur.isdigit() else colonne_texte == valeur)
+    
+    jour = args.get('date')
+    if jour:
+        debut = _lire_date(jour, 'date')
+        conditions.append(Transport.created_at >= debut)
+        conditions.append(Transport.created_at < debut + timedelta(days=1))
+    if args.get('date_debut'):
+        conditions.append(Transport.created_at >= _lire_date(args['date_debut'], 'date_debut'))
+    if args.get('date_fin'):
+        fin = _lire_date(args['date_fin'], 'date_fin') + timedelta(days=1)
+        conditions.append(Transport.created_at < fin)
+    return conditions
+
+
+def paginer_transports(args, totaux=None):
+    """Retourne une page de transports filtrés, triée et paginée par curseur
+    
+    Paramètres : filtres de `conditions_filtres_transports`, tri (date, ref,
+    emis_kg, id), ordre (asc/desc), limite, apres (curseur de la page suivante).
+    `totaux` (nom -> expression d'agrégat SQL) est calculé sur l'ensemble filtré
+    avec le nombre total, une fois par filtre : la première page les calcule et
+    le curseur les transmet aux pages suivantes.
+    Lève ValueError si un paramètre est invalide.
+    """
+    tri = args.get('tri') or 'date'
+    if tri not in TRIS_TRANSPORTS:
+        raise ValueError(f"Tri invalide: {tri} (valeurs possibles: {', '.join(TRIS_TRANSPORTS)})")
+    ordre = args.get('ordre') or 'desc'
+    if ordre not in ('asc', 'desc'):
+        raise ValueError(f"Ordre invalide: {ordre} (valeurs possibles: asc, desc)")
+    try:
+        limite = int(args.get('limite') or current_app.config['TRANSPORTS_PAGE_TAILLE'])
+    except ValueError:
+        raise ValueError("Paramètre 'limite' invalide")
+    limite = max(1, min(limite, current_app.config['TRANSPORTS_PAGE_MAX']))
+    
+    conditions = conditions_filtres_transports(args)
+    colonne = TRIS_TRANSPORTS[tri]
+    descendant = ordre == 'desc'
+    totaux = totaux or {}
+    
+    # Segments d'index (valeurs non NULL puis NULL) lus jusqu'à remplir la page,
+    # avec une ligne de plus pour savoir s'il existe une page suivante
+    transports = []
+    for requete in segments_page(select(Transport).where(*conditions), colonne, Transport.id, args.get('apres'), descendant):
+        transports.extend(db.session.scalars(requete.limit(limite + 1 - len(transports))).all())
+        if len(transports) > limite:
+            break
+    
+    # Totaux repris du curseur s'ils portent sur les mêmes filtres
+    cle_filtres = json.dumps({nom: args.get(nom) for nom in FILTRES_TRANSPORTS if args.get(nom)}, sort_keys=True)
+    report = decoder_curseur(args['apres'])[2] if args.get('apres') else None
+    if not (isinstance(report, dict) and report.get('filtres') == cle_filtres
+            and set(report.get('totaux', {})) == set(totaux) | {'total'}):
+        noms = ['total'] + list(totaux)
+        valeurs = db.session.execute(
+            select(func.count(Transport.id), *totaux.values()).where(*conditions)
+        ).one()
+        report = {'filtres': cle_filtres, 'totaux': dict(zip(noms, valeurs))}
+    
+    suivant = None
+    if len(transports) > limite:
+        transports = transports[:limite]
+        dernier = transports[-1]
+        suivant = encoder_curseur(getattr(dernier, colonne.key), dernier.id, report)
+    
+    return {
+        'transports': transports,
+        'total': report['totaux']['total'],
+        'totaux': report['totaux'],
+        'limite': limite,
+        'tri': tri,
+        'ordre': ordre,
+        'suivant': suivant,
+        'conditions': conditions
+    }
+
+
+def serialiser_transport(transport):
+    """Représentation JSON d'un transport pour les listes"""
+    return {
+        'id': transport.id,
+        'ref': transport.ref,
+        'emis_kg': transport.emis_kg or 0,
+        'emis_tkm': transport.emis_tkm or 0,
+        'type_transport': transport.type_transport,
+        'niveau_calcul': transport.niveau_calcul,
+        'type_vehicule': transport.type_vehicule,
+        'energie': transport.energie,
+        'conso_vehicule': transport.conso_vehicule,
+        'poids_tonnes': transport.poids_tonnes,
+        'distance_km': transport.distance_km,
+        'client_id': transport.client_id,
+        'transporteur_id': transport.transporteur_id,
+        'energie_id': transport.energie_id,
+        'vehicule_id': transport.vehicule_id,
+        'created_at': transport.created_at.isoformat() if transport.created_at else None,
+        'updated_at': transport.updated_at.isoformat() if transport.updated_at else None
+    }
+
+
+def requetes_critiques_transports():
+    """Requêtes sur les transports dont le plan doit passer par un index"""
+    def liste(filtres):
+        return (
+            select(Transport.id)
+            .where(*conditions_filtres_transports(filtres))
+            .order_by(Transport.created_at.desc(), Transport.id.desc())
+            .limit(current_app.config['TRANSPORTS_PAGE_TAILLE'])
+        )
+    
+    def page_suivante(colonne, valeur, descendant=False):
+        # Premier segment lu après un curseur : plage de l'index (colonne, id)
+        segment = segments_page(select(Transport.id), colonne, Transport.id, encoder_curseur(valeur, 1000), descendant)[0]
+        return segment.limit(current_app.config['TRANSPORTS_PAGE_TAILLE'])
+    
+    return {
+        'transports liés à une énergie': select(func.count()).select_from(Transport).where(Transport.energie_id == 1),
+        'transports liés à un véhicule': select(func.count()).select_from(Transport).where(Transport.vehicule_id == 1),
+        'liste filtrée par énergie': liste({'energie': '1'}),
+        'liste filtrée par véhicule': liste({'type_vehicule': '1'}),
+        'liste filtrée par niveau de calcul': liste({'niveau_calcul': 'niveau_1'}),
+        'liste filtrée par période': liste({'date_debut': '2024-01-01', 'date_fin': '2024-01-31'}),
+        'transport par référence': select(Transport.id).where(Transport.ref == 'REF'),
+        'page suivante, tri croissant par date': page_suivante(Transport.created_at, datetime(2024, 1, 1)),
+        'page suivante, tri croissant par émissions': page_suivante(Transport.emis_kg, 12.5),
+        'page suivante, tri décroissant par date': page_suivante(Transport.created_at, datetime(2024, 1, 1), True),
+    }
+
+
+@click.command('verifier-plans')
+@with_appcontext
+def commande_verifier_plans():
+    """Vérifie que les requêtes critiques sur les transports utilisent un index"""
+    with db.engine.connect() as connexion:
+        resultats = controler_plans(connexion, requetes_critiques_transports(), Transport.__tablename__)
+    
+    for resultat in resultats:
+        if resultat.parcours_sequentiels:
+            print(f"❌ {resultat.nom}: parcours séquentiel")
+            for ligne in resultat.lignes:
+                print(f"     {ligne}")
+        else:
+            print(f"✅ {resultat.nom}: {' | '.join(ligne.strip() for ligne in resultat.lignes)}")
+    
+    if any(resultat.parcours_sequentiels for resultat in resultats):
+        raise SystemExit(1)
+
+
+@click.command('exporter-transports')
+@click.option('--format', 'format_export', type=click.Choice(list(FORMATS_EXPORT)), default='csv', show_default=True)
+@click.option('--sortie', default='-', help="Fichier de destination ('-' : sortie standard)")
+@click.option('--energie', help="Id ou valeur saisie de l'énergie")
+@click.option('--type-vehicule', help="Id ou valeur saisie du véhicule")
+@click.option('--niveau-calcul')
+@click.option('--type-transport')
+@click.option('--date', help="Jour de création (AAAA-MM-JJ)")
+@click.option('--date-debut', help="Première date de création incluse (AAAA-MM-JJ)")
+@click.option('--date-fin', help="Dernière date de création incluse (AAAA-MM-JJ)")
+@click.option('--taille-lot', type=int, default=TAILLE_LOT_EXPORT, show_default=True)
+@with_appcontext
+def commande_exporter_transports(format_export, sortie, taille_lot, **filtres):
+    """Exporte en continu les transports filtrés (mêmes filtres que la liste)"""
+    try:
+        conditions = conditions_filtres_transports(filtres)
+        morceaux = exporter_transports(db.engine, conditions, format_export, taille_lot)
+    except ValueError as e:
+        click.echo(f"❌ {e}", err=True)
+        raise SystemExit(1)
+    
+    fichier = sys.stdout.buffer if sortie == '-' else open(sortie, 'wb')
+    taille = 0
+    try:
+        for morceau in morceaux:
+            fichier.write(morceau)
+            taille += len(morceau)
+    finally:
+        if fichier is not sys.stdout.buffer:
+            fichier.close()
+        else:
+            fichier.flush()
+    click.echo(f"✅ Export {format_export} terminé : {taille} octets", err=True)
+
+
+# Commandes `flask` enregistrées avec le blueprint
+COMMANDES = (commande_verifier_plans, commande_exporter_transports)
+
+
+@bp.route('/import_transports_csv', methods=['POST'])
+def import_transports_csv():
+    """Import de transports depuis un fichier CSV
+    
+    Le fichier est enregistré puis importé par la file de tâches : la réponse
+    contient l'identifiant de la tâche à suivre via /api/jobs/<job_id>.
+    """
+    try:
+        if 'file' not in request.files:
+            return jsonify({'success': False, 'error': 'Aucun fichier sélectionné'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'success': False, 'error': 'Aucun fichier sélectionné'}), 400
+        
+        if not file.filename.endswith('.csv'):
+            return jsonify({'success': False, 'error': 'Le fichier doit être au format CSV'}), 400
+        
+        # Enregistrer le fichier pour la tâche de fond
+        dossier = current_app.config['JOBS_DOSSIER']
+        os.makedirs(dossier, exist_ok=True)
+        chemin = os.path.join(dossier, f"import_{uuid.uuid4().hex}.csv")
+        file.save(chemin)
+        
+        job_id = gestionnaire_jobs.soumettre('import_transports_csv', {
+            'fichier': chemin,
+            'nom_fichier': file.filename
+        })
+        
+        return jsonify({
+            'success': True,
+            'message': 'Import lancé en arrière-plan',
+            'job_id': job_id,
+            'statut_url': url_for('transports.api_job', job_id=job_id)
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de l'import CSV: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/transports/recalculer-emissions', methods=['POST'])
+def recalculer_emissions():
+    """Endpoint pour lancer le recalcul des émissions de tous les transports
+    
+    Le recalcul est confié à la file de tâches : la réponse contient l'identifiant
+    de la tâche à suivre via /api/jobs/<job_id>.
+    """
+    try:
+        data = request.get_json() or {}
+        action = data.get('action', 'recalculer_tous')
+        mode = data.get('mode', current_app.config.get('EMISSIONS_MODE_CALCUL', MODE_STANDARD))
+        
+        logger.info(f"Recalcul des émissions - Action: {action}, mode: {mode}")
+        
+        if mode not in (MODE_STANDARD, MODE_VECTORISE):
+            return jsonify({
+                'success': False,
+                'error': f'Mode de calcul non reconnu: {mode}'
+            }), 400
+        
+        if action == 'recalculer_tous':
+            job_id = gestionnaire_jobs.soumettre('recalcul_emissions', {'action': action, 'mode': mode})
+            
+            return jsonify({
+                'success': True,
+                'message': 'Recalcul lancé en arrière-plan',
+                'job_id': job_id,
+                'statut_url': url_for('transports.api_job', job_id=job_id)
+            }), 202
+            
+        else:
+            return jsonify({
+                'success': False,
+                'error': f'Action non reconnue: {action}'
+            }), 400
+            
+    except Exception as e:
+        logger.error(f"Erreur lors du recalcul des émissions: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Erreur serveur: {str(e)}'
+        }), 500
+
+
+@bp.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """API pour suivre la progression et le résultat d'une tâche de fond"""
+    try:
+        etat = gestionnaire_jobs.etat(job_id)
+        if etat is None:
+            return jsonify({'success': False, 'error': 'Tâche non trouvée'}), 404
+        
+        return jsonify({
+            'success': True,
+            'job': etat
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération de la tâche {job_id}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/transports/liste')
+@bp.route('/api/transports/liste-mise-a-jour')
+def liste_transports_mise_a_jour():
+    """Liste paginée des transports avec les émissions à jour
+    
+    Accepte les mêmes filtres et paramètres de tri que la page /transports ;
+    `suivant` est le curseur à passer en `apres` pour obtenir la page suivante.
+    """
+    try:
+        try:
+            page = paginer_transports(request.args)
+        except (ValueError, CurseurInvalide) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        transports_data = [serialiser_transport(t) for t in page['transports']]
+        
+        logger.info(f"Liste des transports: {len(transports_data)} sur {page['total']}")
+        
+        return jsonify({
+            'success': True,
+            'transports': transports_data,
+            'total': page['total'],
+            'limite': page['limite'],
+            'tri': page['tri'],
+            'ordre': page['ordre'],
+            'suivant': page['suivant']
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération de la liste des transports: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Erreur serveur: {str(e)}'
+        }), 500
+
+
+@bp.route('/api/transports/export')
+def export_transports():
+    """Export en continu des transports filtrés et de leurs émissions
+    
+    Accepte les filtres de la liste des transports ; `format` : csv (défaut),
+    ndjson, parquet ou arrow. Les lignes, triées par id, sont envoyées au fil de
+    la lecture sans construire le document complet en mémoire.
+    """
+    try:
+        format_export = request.args.get('format') or 'csv'
+        try:
+            verifier_format(format_export)
+            conditions = conditions_filtres_transports(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        type_mime, extension = FORMATS_EXPORT[format_export]
+        nom_fichier = f"transports_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.{extension}"
+        logger.info(f"Export des transports au format {format_export}")
+        
+        return Response(
+            exporter_transports(db.engine, conditions, format_export),
+            content_type=type_mime,
+            headers={'Content-Disposition': f'attachment; filename="{nom_fichier}"'}
+        )
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de l'export des transports: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Erreur serveur: {str(e)}'
+        }), 500
+
+
+# Champs d'un transport acceptés par l'API, par type
+CHAMPS_TRANSPORT_TEXTE = ('ref', 'type_transport', 'niveau_calcul', 'type_vehicule', 'energie')
+
+
+CHAMPS_TRANSPORT_NOMBRE = ('conso_vehicule', 'poids_tonnes', 'distance_km')
+
+
+CHAMPS_TRANSPORT_ENTIER = ('client_id', 'transporteur_id')
+
+
+class ErreurLot(Exception):
+    """Lot refusé en entier (taille, format, mode atomique)"""
+    
+    def __init__(self, message, code=400, resultats=None):
+        super().__init__(message)
+        self.code = code
+        self.resultats = resultats
+
+
+def valeurs_transport(donnees, creation=True):
+    """Valide et convertit les champs d'un transport reçu par l'API
+    
+    Seuls les champs présents sont retournés (mise à jour partielle) ; en
+    création, les champs obligatoires de l'import CSV sont exigés.
+    Lève ValueError si une valeur est invalide.
+    """
+    if not isinstance(donnees, dict):
+        raise ValueError('Objet transport attendu')
+    
+    valeurs = {}
+    for champ in CHAMPS_TRANSPORT_TEXTE:
+        if champ in donnees:
+            valeur = donnees[champ]
+            valeurs[champ] = (str(valeur).strip() or None) if valeur is not None else None
+    for champ in CHAMPS_TRANSPORT_NOMBRE:
+        if champ in donnees:
+            valeur = donnees[champ]
+            try:
+                valeurs[champ] = float(valeur) if valeur not in (None, '') else None
+            except (TypeError, ValueError):
+                raise ValueError(f"Champ '{champ}': nombre attendu")
+    for champ in CHAMPS_TRANSPORT_ENTIER:
+        if champ in donnees:
+            valeur = donnees[champ]
+            try:
+                valeurs[champ] = int(valeur) if valeur not in (None, '') else None
+            except (TypeError, ValueError):
+                raise ValueError(f"Champ '{champ}': entier attendu")
+    
+    if creation:
+        manquants = [champ for champ in COLONNES_OBLIGATOIRES if not valeurs.get(champ)]
+        if manquants:
+            raise ValueError(f"Champs obligatoires manquants: {', '.join(manquants)}")
+    elif 'ref' in valeurs and not valeurs['ref']:
+        raise ValueError('Référence vide')
+    if valeurs.get('ref') and len(valeurs['ref']) > 50:
+        raise ValueError('Référence trop longue (50 caractères maximum)')
+    return valeurs
+
+
+def _lire_lot_transports(donnees):
+    """Normalise le corps d'une requête en liste ; indique s'il s'agissait d'un lot"""
+    if isinstance(donnees, dict) and isinstance(donnees.get('transports'), list):
+        donnees = donnees['transports']
+    est_lot = isinstance(donnees, list)
+    elements = donnees if est_lot else [donnees]
+    if not elements or elements == [None]:
+        raise ErreurLot('Aucun transport fourni')
+    maximum = current_app.config['TRANSPORTS_API_MAX_LOT']
+    if len(elements) > maximum:
+        raise ErreurLot(f'Lot trop volumineux: {len(elements)} transports (maximum {maximum})', 413)
+    return elements, est_lot
+
+
+def _references_inconnues(valeurs_par_element):
+    """Vérifie en une requête par table les clients et transporteurs référencés"""
+    inconnus = {}
+    for champ, modele in (('client_id', Client), ('transporteur_id', Transporteur)):
+        identifiants = {valeurs[champ] for valeurs in valeurs_par_element if valeurs.get(champ) is not None}
+        if identifiants:
+            existants = set(db.session.scalars(select(modele.id).where(modele.id.in_(identifiants))))
+            inconnus[champ] = identifiants - existants
+    return inconnus
+
+
+def _verifier_references(valeurs, inconnus):
+    for champ, identifiants in inconnus.items():
+        if valeurs.get(champ) in identifiants:
+            raise ValueError(f"Champ '{champ}': {valeurs[champ]} inexistant")
+
+
+def _appliquer_emissions(transport, referentiel, phases=None):
+    """Calcule les émissions d'un transport (ou de ses phases) et les enregistre si le calcul réussit"""
+    _, resultat = recalculer_transport_phases(transport, phases or [], referentiel)
+    return resultat
+
+
+def _resultat_element(index, transport, emissions):
+    resultat = {'index': index, 'success': True, 'transport': serialiser_transport(transport)}
+    if not emissions['success']:
+        resultat['avertissement'] = emissions.get('error')
+    return resultat
+
+
+def creer_transports(elements):
+    """Crée un lot de transports avec calcul des émissions ; retourne les résultats par élément
+    
+    Les références sont vérifiées en une requête, le référentiel d'émissions
+    est chargé une fois et les insertions partent en un seul flush.
+    La transaction n'est pas validée ici.
+    """
+    resultats = [None] * len(elements)
+    valides = []
+    for index, donnees in enumerate(elements):
+        try:
+            valides.append((index, valeurs_transport(donnees, creation=True)))
+        except ValueError as e:
+            ref = donnees.get('ref') if isinstance(donnees, dict) else None
+            resultats[index] = {'index': index, 'ref': ref, 'success': False, 'error': str(e)}
+    
+    refs = {valeurs['ref'] for _, valeurs in valides}
+    refs_existantes = set(db.session.scalars(select(Transport.ref).where(Transport.ref.in_(refs)))) if refs else set()
+    inconnus = _references_inconnues([valeurs for _, valeurs in valides])
+    referentiel = charger_referentiel_emissions()
+    
+    crees = []
+    for index, valeurs in valides:
+        try:
+            if valeurs['ref'] in refs_existantes:
+                raise ValueError('Référence déjà existante')
+            _verifier_references(valeurs, inconnus)
+        except ValueError as e:
+            resultats[index] = {'index': index, 'ref': valeurs['ref'], 'success': False, 'error': str(e)}
+            continue
+        refs_existantes.add(valeurs['ref'])
+        transport = Transport(**valeurs)
+        crees.append((index, transport, _appliquer_emissions(transport, referentiel)))
+    
+    db.session.add_all([transport for _, transport, _ in crees])
+    db.session.flush()
+    for index, transport, emissions in crees:
+        resultats[index] = _resultat_element(index, transport, emissions)
+    return resultats
+
+
+def modifier_transports(elements):
+    """Met à jour un lot de transports identifiés par 'id' ou 'ref' et recalcule leurs émissions"""
+    resultats = [None] * len(elements)
+    valides = []
+    for index, donnees in enumerate(elements):
+        try:
+            valeurs = valeurs_transport(donnees, creation=False)
+            if donnees.get('id') is None and not donnees.get('ref'):
+                raise ValueError("Identifiant 'id' ou 'ref' manquant")
+            valides.append((index, donnees, valeurs))
+        except (ValueError, AttributeError) as e:
+            resultats[index] = {'index': index, 'success': False, 'error': str(e)}
+    
+    # Chargement des transports ciblés : une requête par type d'identifiant
+    ids = set()
+    for _, donnees, _ in valides:
+        if donnees.get('id') is not None:
+            try:
+                ids.add(int(donnees['id']))
+            except (TypeError, ValueError):
+                pass
+    refs = {donnees['ref'] for _, donnees, _ in valides if donnees.get('id') is None}
+    par_id = {t.id: t for t in db.session.scalars(select(Transport).where(Transport.id.in_(ids)))} if ids else {}
+    par_ref = {t.ref: t for t in db.session.scalars(select(Transport).where(Transport.ref.in_(refs)))} if refs else {}
+    
+    # Nouvelles références : une requête pour détecter les conflits
+    nouvelles_refs = {
+        valeurs['ref'] for _, donnees, valeurs in valides
+        if donnees.get('id') is not None and valeurs.get('ref')
+    }
+    refs_prises = {
+        ref: identifiant for ref, identifiant in db.session.execute(
+            select(Transport.ref, Transport.id).where(Transport.ref.in_(nouvelles_refs))
+        )
+    } if nouvelles_refs else {}
+    inconnus = _references_inconnues([valeurs for _, _, valeurs in valides])
+    referentiel = charger_referentiel_emissions()
+    
+    # Phases des transports ciblés : une requête pour tout le lot
+    phases_par_ref = {}
+    refs_ciblees = [t.ref for t in par_id.values()] + [t.ref for t in par_ref.values()]
+    if refs_ciblees:
+        for phase in db.session.scalars(
+            select(PhaseTransport)
+            .where(PhaseTransport.transport_ref.in_(refs_ciblees))
+            .order_by(PhaseTransport.ordre, PhaseTransport.id)
+        ):
+            phases_par_ref.setdefault(phase.transport_ref, []).append(phase)
+    
+    modifies = []
+    renommages = []
+    for index, donnees, valeurs in valides:
+        try:
+            if donnees.get('id') is not None:
+                try:
+                    transport = par_id.get(int(donnees['id']))
+                except (TypeError, ValueError):
+                    raise ValueError("Champ 'id': entier attendu")
+            else:
+                transport = par_ref.get(donnees['ref'])
+                valeurs.pop('ref', None)
+            if transport is None:
+                raise ValueError('Transport non trouvé')
+            nouvelle_ref = valeurs.get('ref')
+            if nouvelle_ref and nouvelle_ref != transport.ref:
+                if refs_prises.get(nouvelle_ref, transport.id) != transport.id:
+                    raise ValueError('Référence déjà existante')
+                refs_prises[nouvelle_ref] = transport.id
+            _verifier_references(valeurs, inconnus)
+        except ValueError as e:
+            resultats[index] = {'index': index, 'success': False, 'error': str(e)}
+            continue
+        phases = phases_par_ref.get(transport.ref)
+        if nouvelle_ref and nouvelle_ref != transport.ref and phases:
+            renommages.append((transport.ref, nouvelle_ref))
+        for champ, valeur in valeurs.items():
+            setattr(transport, champ, valeur)
+        modifies.append((index, transport, _appliquer_emissions(transport, referentiel, phases)))
+    
+    db.session.flush()
+    # Sans ON UPDATE CASCADE effectif (SQLite), les phases suivent la nouvelle référence
+    for ancienne_ref, nouvelle_ref in renommages:
+        db.session.execute(
+            update(PhaseTransport.__table__)
+            .where(PhaseTransport.transport_ref == ancienne_ref)
+            .values(transport_ref=nouvelle_ref)
+        )
+    for index, transport, emissions in modifies:
+        resultats[index] = _resultat_element(index, transport, emissions)
+    return resultats
+
+
+def supprimer_transports(elements):
+    """Supprime un lot de transports désignés par id (entier ou objet {'id': ...})"""
+    resultats = [None] * len(elements)
+    ids = {}
+    for index, element in enumerate(elements):
+        identifiant = element.get('id') if isinstance(element, dict) else element
+        try:
+            ids[index] = int(identifiant)
+        except (TypeError, ValueError):
+            resultats[index] = {'index': index, 'success': False, 'error': "Identifiant 'id' manquant ou invalide"}
+    
+    transports = {
+        t.id: t for t in db.session.scalars(select(Transport).where(Transport.id.in_(set(ids.values()))))
+    } if ids else {}
+    supprimes = set()
+    for index, identifiant in ids.items():
+        transport = transports.get(identifiant)
+        if transport is None or identifiant in supprimes:
+            resultats[index] = {'index': index, 'id': identifiant, 'success': False, 'error': 'Transport non trouvé'}
+            continue
+        supprimes.add(identifiant)
+        db.session.delete(transport)
+        resultats[index] = {'index': index, 'id': identifiant, 'ref': transport.ref, 'success': True}
+    
+    refs_supprimees = [resultat['ref'] for resultat in resultats if resultat['success']]
+    if refs_supprimees:
+        db.session.execute(delete(PhaseTransport).where(PhaseTransport.transport_ref.in_(refs_supprimees)))
+    db.session.flush()
+    return resultats
+
+
+@bp.route('/api/transports', methods=['GET', 'POST', 'PUT', 'DELETE'])
+def api_transports():
+    """API pour gérer les transports
+    
+    GET : liste paginée (mêmes paramètres que /api/transports/liste).
+    POST, PUT, DELETE : un transport (objet) ou un lot (tableau, ou objet
+    {'transports': [...]}) traité dans une seule transaction. Les émissions sont
+    calculées à l'écriture et chaque élément a son propre résultat. Avec
+    `?atomique=true`, le lot est entièrement annulé si un élément échoue.
+    """
+    if request.method == 'GET':
+        try:
+            try:
+                page = paginer_transports(request.args)
+            except (ValueError, CurseurInvalide) as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            
+            return jsonify({
+                'success': True,
+                'transports': [serialiser_transport(t) for t in page['transports']],
+                'total': page['total'],
+                'suivant': page['suivant']
+            })
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des transports: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    operations = {
+        'POST': (creer_transports, 'créé', 'création'),
+        'PUT': (modifier_transports, 'modifié', 'modification'),
+        'DELETE': (supprimer_transports, 'supprimé', 'suppression')
+    }
+    operation, participe, nom_operation = operations[request.method]
+    atomique = request.args.get('atomique', 'false').lower() == 'true'
+    
+    try:
+        elements, est_lot = _lire_lot_transports(request.get_json(silent=True))
+        resultats = operation(elements)
+        erreurs = sum(1 for resultat in resultats if not resultat['success'])
+        
+        if erreurs and not est_lot:
+            erreur = resultats[0]['error']
+            raise ErreurLot(erreur, 404 if erreur == 'Transport non trouvé' else 400)
+        if erreurs and atomique:
+            raise ErreurLot(f'{erreurs} transport(s) en erreur, lot annulé', 400, resultats)
+        db.session.commit()
+        
+        logger.info(f"✅ API transports ({nom_operation}): {len(resultats) - erreurs} succès, {erreurs} erreurs")
+        
+        if not est_lot:
+            reponse = {'success': True, 'message': f'Transport {participe} avec succès'}
+            if 'transport' in resultats[0]:
+                reponse['transport'] = resultats[0]['transport']
+            if 'avertissement' in resultats[0]:
+                reponse['avertissement'] = resultats[0]['avertissement']
+            return jsonify(reponse), 201 if request.method == 'POST' else 200
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(resultats) - erreurs} transport(s) {participe}(s), {erreurs} erreur(s)',
+            'succes': len(resultats) - erreurs,
+            'erreurs': erreurs,
+            'resultats': resultats
+        })
+    
+    except ErreurLot as e:
+        db.session.rollback()
+        reponse = {'success': False, 'error': str(e)}
+        if e.resultats is not None:
+            reponse['resultats'] = e.resultats
+        return jsonify(reponse), e.code
+    except IntegrityError as e:
+        # Écriture concurrente d'une même référence entre la vérification et l'insertion
+        db.session.rollback()
+        logger.error(f"Conflit lors de la {nom_operation} des transports: {str(e)}")
+        return jsonify({'success': False, 'error': 'Conflit d\'intégrité (référence déjà existante ?), lot annulé'}), 409
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erreur lors de la {nom_operation} des transports: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def serialiser_phase(phase):
+    """Représentation JSON d'une phase de transport"""
+    return {
+        'id': str(phase.id),
+        'ordre': phase.ordre,
+        'type': phase.type,
+        'energie': phase.energie,
+        'vehicule_id': phase.vehicule_id,
+        'ville_depart': phase.ville_depart,
+        'ville_arrivee': phase.ville_arrivee,
+        'consommation': phase.consommation,
+        'distance_km': phase.distance_km,
+        'poids_tonnes': phase.poids_tonnes,
+        'date': phase.date.isoformat() if phase.date else None,
+        'emis_kg': phase.emis_kg or 0,
+        'emis_tkm': phase.emis_tkm or 0,
+        # Nom lu par l'affichage des phases de la liste des transports
+        'emis_total': phase.emis_kg or 0
+    }
+
+
+@bp.route('/api/transport/<ref>/phases', methods=['GET', 'PUT', 'POST', 'DELETE'])
+def api_phases_transport(ref):
+    """API des phases d'un transport
+    
+    GET : phases (objet indexé par id) et émissions du transport.
+    PUT ou POST avec {'phases': [...]} : remplace toutes les phases.
+    POST avec une phase : ajoute la phase ; PUT avec 'phase_id' : la modifie.
+    DELETE avec {'phase_id': ...} : supprime la phase.
+    Chaque écriture recalcule les phases et le total de ce seul transport.
+    """
+    try:
+        transport = Transport.query.filter_by(ref=ref).first()
+        if not transport:
+            return jsonify({'success': False, 'error': 'Transport non trouvé'}), 404
+        
+        resultats = None
+        message = None
+        if request.method == 'GET':
+            phases = phases_du_transport(ref)
+        else:
+            data = request.get_json(silent=True) or {}
+            try:
+                if request.method in ('PUT', 'POST') and 'phases' in data:
+                    nouvelles = valeurs_phases(data['phases'])
+                    db.session.execute(delete(PhaseTransport).where(PhaseTransport.transport_ref == ref))
+                    phases = [PhaseTransport(transport_ref=ref, **valeurs) for valeurs in nouvelles]
+                    db.session.add_all(phases)
+                    message = f'{len(phases)} phase(s) enregistrée(s)'
+                
+                elif request.method == 'POST':
+                    valeurs = valeurs_phase(data)
+                    phases = list(phases_du_transport(ref))
+                    if valeurs['ordre'] is None:
+                        valeurs['ordre'] = max((p.ordre or 0 for p in phases), default=0) + 1
+                    phase = PhaseTransport(transport_ref=ref, **valeurs)
+                    db.session.add(phase)
+                    phases.append(phase)
+                    message = 'Phase ajoutée avec succès'
+                
+                else:
+                    phases = list(phases_du_transport(ref))
+                    phase_id = str(data.get('phase_id'))
+                    phase = next((p for p in phases if str(p.id) == phase_id), None)
+                    if phase is None:
+                        return jsonify({'success': False, 'error': 'Phase non trouvée'}), 404
+                    
+                    if request.method == 'PUT':
+                        valeurs = valeurs_phase(data)
+                        if valeurs['ordre'] is None:
+                            valeurs.pop('ordre')
+                        for champ, valeur in valeurs.items():
+                            setattr(phase, champ, valeur)
+                        message = 'Phase modifiée avec succès'
+                    else:
+                        db.session.delete(phase)
+                        phases.remove(phase)
+                        message = 'Phase supprimée avec succès'
+            except ValueError as e:
+                db.session.rollback()
+                return jsonify({'success': False, 'error': str(e)}), 400
+            
+            phases.sort(key=lambda p: (p.ordre or 0, p.id or 0))
+            resultats, _ = recalculer_transport_phases(transport, phases)
+            db.session.flush()
+        
+        reponse = {
+            'success': True,
+            'transport': {
+                'ref': transport.ref,
+                'emis_kg': transport.emis_kg or 0,
+                'emis_tkm': transport.emis_tkm or 0
+            },
+            'phases': {str(phase.id): serialiser_phase(phase) for phase in phases}
+        }
+        if message:
+            reponse['message'] = message
+            reponse['erreurs_phases'] = {
+                str(phase.id): resultat['error']
+                for phase, resultat in zip(phases, resultats) if not resultat['success']
+            }
+            db.session.commit()
+            logger.info(f"✅ Phases du transport {ref}: {message} ({transport.emis_kg} kg CO₂e)")
+        
+        return jsonify(reponse)
+    
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"❌ Erreur API phases du transport {ref}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,74 @@
+"""
+Cache en mémoire des données de référence (énergies, véhicules)
+
+Chaque entrée est associée au numéro de version du référentiel au moment de
+son chargement. Le numéro est stocké en base et incrémenté à chaque écriture
+d'énergie ou de véhicule : tous les workers voient donc l'invalidation, au
+prix d'une lecture de clé primaire par accès.
+"""
+
+import hashlib
+import json
+import threading
+from collections import namedtuple
+
+# Corps JSON prêt à servir et son ETag
+ReponseEnCache = namedtuple('ReponseEnCache', ['corps', 'etag'])
+
+
+def serialiser(donnees):
+    """Sérialise une réponse JSON et calcule son ETag (empreinte du contenu)"""
+    corps = json.dumps(donnees, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return ReponseEnCache(corps, hashlib.sha1(corps).hexdigest())
+
+
+class CacheReferentiel:
+    """Valeurs calculées à la demande et conservées tant que la version ne change pas
+
+    Une valeur n'entre dans le cache que si elle est lue dans une session neuve,
+    hors de la transaction de l'appelant : le cache, partagé par tout le
+    processus, ne contient que des données validées. Une transaction qui a
+    modifié le référentiel (version différente de la version validée) reçoit une
+    valeur construite depuis sa propre session, qui n'est pas conservée.
+    """
+
+    def __init__(self, lire_version):
+        # lire_version(session) -> numéro de version, ou None si non versionné
+        self._lire_version = lire_version
+        self._chargeurs = {}
+        self._entrees = {}
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, nom, chargeur):
+        """Déclare la fonction `chargeur(session)` qui construit la valeur `nom`"""
+        self._chargeurs[nom] = chargeur
+
+    def obtenir(self, nom, session, ouvrir_session):
+        """Retourne la valeur `nom` vue par `session`, depuis le cache si possible
+
+        `ouvrir_session()` fournit une session neuve (gestionnaire de contexte)
+        pour reconstruire une entrée absente. Une version None (référentiel non
+        versionné) désactive le cache.
+        """
+        chargeur = self._chargeurs[nom]
+        version = self._lire_version(session)
+        if version is None:
+            return chargeur(session)
+        entree = self._entrees.get(nom)
+        if entree is not None and entree[0] == version:
+            return entree[1]
+
+        with ouvrir_session() as session_validee:
+            # Version lue avant les données : une écriture validée entre les deux
+            # lectures donne au pire une entrée plus récente que sa version,
+            # remplacée au prochain changement de version
+            if self._lire_version(session_validee) != version:
+                return chargeur(session)
+            valeur = chargeur(session_validee)
+        with self._verrou:
+            self._entrees[nom] = (version, valeur)
+        return valeur
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
@@ -0,0 +1,389 @@
+"""
+Calcul, recalcul et import des émissions des transports
+
+Traitements par lots partagés par les routes et les tâches de fond.
+"""
+
+import itertools
+import os
+import time
+import logging
+from types import SimpleNamespace
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, insert, or_, select, update
+
+from agregats import cles_transport, DeltasAgregats
+from agregats_sql import appliquer_deltas_agregats
+from emissions_engine import (
+    calculer_emissions, calculer_emissions_phases, calculer_lot, calculer_lot_vectorise, MODE_STANDARD,
+    MODE_VECTORISE, numpy_disponible, TAILLE_LOT_DEFAUT, TAILLE_LOT_VECTORISE
+)
+from extensions import db, gestionnaire_jobs
+from journalisation import ResumeJournal
+from import_transports import (
+    convertir_ligne, ligne_complete, lire_lots, MAX_RESULTATS_DETAILLES, ResultatsImport,
+    TAILLE_LOT_IMPORT
+)
+from models import Energie, PhaseTransport, Transport
+from referentiel import charger_referentiel_emissions
+
+logger = logging.getLogger(__name__)
+
+def importer_transports_csv(flux, taille=None, progression=None, taille_lot=None):
+    """Importe en continu les transports d'un fichier CSV ouvert en binaire
+    
+    Le fichier est lu par lots : chaque lot est validé, dédoublonné par une seule
+    requête sur les références puis inséré par un INSERT groupé. La progression
+    est rapportée en octets lus sur `taille`. Retourne un `ResultatsImport` ;
+    la transaction n'est pas validée ici : l'appelant décide du commit ou du rollback.
+    """
+    taille_lot = taille_lot or current_app.config.get('IMPORT_CSV_TAILLE_LOT', TAILLE_LOT_IMPORT)
+    resultats = ResultatsImport(current_app.config.get('IMPORT_CSV_MAX_RESULTATS', MAX_RESULTATS_DETAILLES))
+    deltas = DeltasAgregats()
+    # INSERT hors ORM : les clés energie_id / vehicule_id sont résolues ici
+    referentiel = charger_referentiel_emissions()
+    
+    if progression is not None:
+        progression(0, taille)
+    
+    for lignes, octets_lus in lire_lots(flux, taille_lot):
+        # Une seule requête pour toutes les références déjà en base de ce lot
+        # (les lots précédents, déjà insérés, sont vus par cette requête)
+        refs_candidates = {ligne['ref'] for ligne in lignes if ligne_complete(ligne)}
+        refs_existantes = set()
+        if refs_candidates:
+            refs_existantes = set(db.session.execute(
+                select(Transport.ref).where(Transport.ref.in_(refs_candidates))
+            ).scalars())
+        
+        a_inserer = []
+        for ligne in lignes:
+            # Validation des données obligatoires
+            if not ligne_complete(ligne):
+                resultats.erreur(ligne.get('ref') or 'N/A', 'Données obligatoires manquantes')
+                continue
+            
+            # Vérifier si la référence existe déjà (en base ou plus haut dans le lot)
+            if ligne['ref'] in refs_existantes:
+                resultats.erreur(ligne['ref'], 'Référence déjà existante')
+                continue
+            
+            try:
+                valeurs = convertir_ligne(ligne)
+            except (ValueError, TypeError) as e:
+                resultats.erreur(ligne['ref'], str(e))
+                continue
+            
+            # Valeurs par défaut explicites : elles déterminent les agrégats du transport
+            valeurs['created_at'] = datetime.utcnow()
+            valeurs['emis_kg'] = 0.0
+            valeurs['energie_id'], valeurs['vehicule_id'] = referentiel.references(
+                valeurs['energie'], valeurs['type_vehicule']
+            )
+            deltas.ajouter(cles_transport(SimpleNamespace(**valeurs)), 0.0)
+            
+            refs_existantes.add(ligne['ref'])
+            a_inserer.append(valeurs)
+            resultats.succes(ligne['ref'])
+        
+        if a_inserer:
+            db.session.execute(insert(Transport.__table__), a_inserer)
+        
+        if progression is not None:
+            progression(octets_lus, taille)
+    
+    # INSERT groupé hors ORM : les agrégats sont mis à jour explicitement
+    appliquer_deltas_agregats(deltas)
+    return resultats
+
+
+@gestionnaire_jobs.tache('import_transports_csv')
+def job_import_transports_csv(parametres, progression):
+    """Tâche de fond : import d'un fichier CSV déposé dans le dossier des tâches"""
+    chemin = parametres['fichier']
+    try:
+        with open(chemin, 'rb') as fichier:
+            resultats = importer_transports_csv(fichier, os.path.getsize(chemin), progression)
+        
+        # Sauvegarder tous les transports créés
+        db.session.commit()
+        logger.info(f"✅ Import CSV terminé: {resultats.transports_crees} créés, {resultats.erreurs} erreurs")
+    finally:
+        try:
+            os.remove(chemin)
+        except OSError as e:
+            logger.warning(f"⚠️ Fichier d'import non supprimé {chemin}: {str(e)}")
+    
+    return {
+        'success': True,
+        'message': f'Import terminé: {resultats.transports_crees} créés, {resultats.erreurs} erreurs',
+        'transports_crees': resultats.transports_crees,
+        'erreurs': resultats.erreurs,
+        'resultats': resultats.details,
+        'resultats_tronques': resultats.tronques
+    }
+
+
+def calculer_emissions_transport(transport, referentiel=None):
+    """Calcule les émissions CO₂e d'un transport selon son niveau de calcul"""
+    if referentiel is None:
+        try:
+            referentiel = charger_referentiel_emissions()
+        except Exception as e:
+            logger.error(f"Erreur lors du calcul des émissions pour le transport {transport.ref}: {str(e)}")
+            return {
+                'success': False,
+                'error': f'Erreur de calcul: {str(e)}',
+                'emis_kg': 0,
+                'emis_tkm': 0
+            }
+    
+    return calculer_emissions(transport, referentiel)
+
+
+def phases_du_transport(ref):
+    """Phases d'un transport dans leur ordre d'affichage"""
+    return db.session.scalars(
+        select(PhaseTransport)
+        .where(PhaseTransport.transport_ref == ref)
+        .order_by(PhaseTransport.ordre, PhaseTransport.id)
+    ).all()
+
+
+def recalculer_transport_phases(transport, phases=None, referentiel=None):
+    """Recalcule les phases d'un transport et reporte leur total sur le transport
+    
+    Sans phase, le transport est recalculé selon son niveau de calcul. Retourne
+    `(resultats_phases, total)` ; la transaction n'est pas validée ici.
+    """
+    if phases is None:
+        phases = phases_du_transport(transport.ref)
+    if referentiel is None:
+        referentiel = charger_referentiel_emissions()
+    
+    if not phases:
+        resultat = calculer_emissions_transport(transport, referentiel)
+        if resultat['success']:
+            transport.emis_kg = resultat['emis_kg']
+            transport.emis_tkm = resultat['emis_tkm']
+        return [], resultat
+    
+    resultats, total = calculer_emissions_phases(phases, referentiel, transport.poids_tonnes)
+    for phase, resultat in zip(phases, resultats):
+        phase.emis_kg = resultat['emis_kg']
+        phase.emis_tkm = resultat['emis_tkm']
+    transport.emis_kg = total['emis_kg']
+    transport.emis_tkm = total['emis_tkm']
+    return resultats, total
+
+
+def recalculer_emissions_transports(filtre=None, taille_lot=None, mode=MODE_STANDARD, progression=None):
+    """Recalcule les émissions des transports par lots
+    
+    Le référentiel véhicules/énergies est chargé une seule fois, chaque lot est
+    calculé en mémoire puis écrit avec un UPDATE groupé. En mode 'vectorise',
+    chaque lot est calculé en colonnes NumPy. Les transports détaillés en phases
+    reçoivent ensuite le total de leurs phases recalculées. La transaction n'est
+    pas validée ici : l'appelant décide du commit ou du rollback.
+    `progression(traites, total)` est appelé après chaque lot. Une seule ligne
+    de journal résume le recalcul, erreurs regroupées par message.
+    Retourne `(succes, erreurs, resultats)`, un résultat par transport.
+    """
+    if mode == MODE_VECTORISE and not numpy_disponible():
+        logger.warning("⚠️ NumPy non installé - recalcul en mode standard")
+        mode = MODE_STANDARD
+    calculer = calculer_lot_vectorise if mode == MODE_VECTORISE else calculer_lot
+    if taille_lot is None:
+        taille_lot = TAILLE_LOT_VECTORISE if mode == MODE_VECTORISE else TAILLE_LOT_DEFAUT
+    
+    referentiel = charger_referentiel_emissions()
+    colonnes = (
+        Transport.id, Transport.ref, Transport.niveau_calcul, Transport.type_vehicule,
+        Transport.energie, Transport.conso_vehicule, Transport.poids_tonnes,
+        Transport.distance_km, Transport.emis_kg, Transport.emis_tkm,
+        Transport.created_at, Transport.client_id, Transport.transporteur_id
+    )
+    
+    deltas = DeltasAgregats()
+    succes = 0
+    erreurs = 0
+    resultats = []
+    dernier_id = 0
+    debut = time.perf_counter()
+    lots = 0
+    mis_a_jour = 0
+    erreurs_par_type = ResumeJournal()
+    
+    total = None
+    if progression is not None:
+        requete_total = select(func.count(Transport.id))
+        if filtre is not None:
+            requete_total = requete_total.where(filtre)
+        total = db.session.execute(requete_total).scalar()
+        progression(0, total)
+    
+    # Les transports détaillés en phases sont traités à part (total de leurs phases)
+    a_des_phases = select(PhaseTransport.id).where(PhaseTransport.transport_ref == Transport.ref).exists()
+    
+    while True:
+        requete = select(*colonnes).where(Transport.id > dernier_id, ~a_des_phases)
+        if filtre is not None:
+            requete = requete.where(filtre)
+        lot = db.session.execute(requete.order_by(Transport.id).limit(taille_lot)).all()
+        if not lot:
+            break
+        dernier_id = lot[-1].id
+        
+        resultats_lot, mises_a_jour = calculer(lot, referentiel)
+        
+        if mises_a_jour:
+            maintenant = datetime.utcnow()
+            lignes_par_id = {ligne.id: ligne for ligne in lot}
+            for valeurs in mises_a_jour:
+                valeurs['updated_at'] = maintenant
+                ancienne = lignes_par_id[valeurs['id']]
+                deltas.modifier_emissions(cles_transport(ancienne), ancienne.emis_kg, valeurs['emis_kg'])
+            db.session.execute(update(Transport), mises_a_jour)
+        
+        for resultat in resultats_lot:
+            if resultat['success']:
+                succes += 1
+            else:
+                erreurs += 1
+                erreurs_par_type.compter(resultat['error'], resultat['ref'])
+        resultats.extend(resultats_lot)
+        lots += 1
+        mis_a_jour += len(mises_a_jour)
+        
+        if progression is not None:
+            progression(succes + erreurs, total)
+    
+    # UPDATE groupé hors ORM : les agrégats sont mis à jour explicitement, en une fois
+    appliquer_deltas_agregats(deltas)
+    
+    dernier_id = 0
+    while True:
+        requete = select(Transport).where(Transport.id > dernier_id, a_des_phases)
+        if filtre is not None:
+            requete = requete.where(filtre)
+        lot = db.session.scalars(requete.order_by(Transport.id).limit(taille_lot)).all()
+        if not lot:
+            break
+        dernier_id = lot[-1].id
+        
+        phases_par_ref = {}
+        for phase in db.session.scalars(
+            select(PhaseTransport)
+            .where(PhaseTransport.transport_ref.in_([t.ref for t in lot]))
+            .order_by(PhaseTransport.ordre, PhaseTransport.id)
+        ):
+            phases_par_ref.setdefault(phase.transport_ref, []).append(phase)
+        
+        for transport in lot:
+            _, total_phases = recalculer_transport_phases(transport, phases_par_ref.get(transport.ref, []), referentiel)
+            if total_phases['success']:
+                succes += 1
+                resultats.append({
+                    'ref': transport.ref,
+                    'emis_kg': total_phases['emis_kg'],
+                    'emis_tkm': total_phases['emis_tkm'],
+                    'success': True
+                })
+            else:
+                erreurs += 1
+                erreurs_par_type.compter(total_phases['error'], transport.ref)
+                resultats.append({'ref': transport.ref, 'error': total_phases['error'], 'success': False})
+        
+        # Écriture par l'ORM : les agrégats suivent via les événements de flush
+        db.session.flush()
+        lots += 1
+        if progression is not None:
+            progression(succes + erreurs, total)
+    
+    duree = time.perf_counter() - debut
+    logger.info(
+        f"📊 Recalcul des émissions ({mode}): {succes + erreurs} transports en {lots} lot(s), "
+        f"{mis_a_jour} mis à jour, {erreurs} erreur(s) en {duree:.1f}s",
+        extra={
+            'operation': 'recalcul_emissions', 'mode': mode, 'transports': succes + erreurs, 'lots': lots,
+            'mis_a_jour': mis_a_jour, 'succes': succes, 'erreurs': erreurs, 'duree_s': round(duree, 3)
+        }
+    )
+    if erreurs_par_type:
+        logger.warning(
+            f"⚠️ Transports non recalculés: {erreurs_par_type.texte()}",
+            extra={'operation': 'recalcul_emissions', 'erreurs_par_type': erreurs_par_type.detail()}
+        )
+    
+    return succes, erreurs, resultats
+
+
+def recalculer_emissions_dependantes(energie_id=None, vehicule_id=None):
+    """Recalcule uniquement les transports qui référencent une énergie ou un véhicule
+    
+    Appelé après la validation d'une modification de facteur : seuls les
+    transports dépendants sont relus et réécrits. Retourne le nombre de
+    transports recalculés (0 si le recalcul automatique est désactivé ou échoue).
+    """
+    if not current_app.config.get('EMISSIONS_RECALCUL_AUTO', True):
+        return 0
+    
+    conditions = []
+    if energie_id is not None:
+        conditions.append(Transport.energie_id == energie_id)
+        # Les phases désignent l'énergie par son id ou son identifiant métier
+        codes = [str(energie_id)]
+        energie = db.session.get(Energie, energie_id)
+        if energie is not None and energie.identifiant:
+            codes.append(energie.identifiant)
+        conditions.append(Transport.ref.in_(
+            select(PhaseTransport.transport_ref).where(PhaseTransport.energie.in_(codes))
+        ))
+    if vehicule_id is not None:
+        conditions.append(Transport.vehicule_id == vehicule_id)
+        conditions.append(Transport.ref.in_(
+            select(PhaseTransport.transport_ref).where(PhaseTransport.vehicule_id == vehicule_id)
+        ))
+    if not conditions:
+        return 0
+    
+    try:
+        succes, erreurs, _ = recalculer_emissions_transports(filtre=or_(*conditions))
+        db.session.commit()
+        logger.info(f"🔄 Recalcul incrémental (énergie={energie_id}, véhicule={vehicule_id}): {succes} succès, {erreurs} erreurs")
+        return succes + erreurs
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"❌ Erreur lors du recalcul incrémental des émissions: {str(e)}")
+        return 0
+
+
+@gestionnaire_jobs.tache('recalcul_emissions')
+def job_recalcul_emissions(parametres, progression):
+    """Tâche de fond : recalcul des émissions de tous les transports
+    
+    Le résultat enregistré avec la tâche contient les compteurs et les premières
+    erreurs seulement, comme celui de l'import CSV : la ligne de la tâche ne
+    grossit pas avec le nombre de transports.
+    """
+    succes, erreurs, resultats = recalculer_emissions_transports(
+        mode=parametres.get('mode', MODE_STANDARD),
+        progression=progression
+    )
+    max_details = current_app.config.get('IMPORT_CSV_MAX_RESULTATS', MAX_RESULTATS_DETAILLES)
+    details = list(itertools.islice((resultat for resultat in resultats if not resultat['success']), max_details))
+    
+    # Sauvegarder toutes les modifications
+    db.session.commit()
+    logger.info(f"Base de données mise à jour: {succes} succès, {erreurs} erreurs")
+    
+    return {
+        'success': True,
+        'message': f'Recalcul terminé: {succes} succès, {erreurs} erreurs',
+        'succes': succes,
+        'erreurs': erreurs,
+        'resultats': details,
+        'resultats_tronques': erreurs > len(details)
+    }
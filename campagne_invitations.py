@@ -0,0 +1,89 @@
+"""
+Campagnes d'invitations : lecture et contrôle d'une liste d'adresses email
+
+Les adresses viennent d'une liste JSON ou d'un fichier CSV (colonne `email` si
+l'en-tête en comporte une, sinon première colonne ; séparateur `,` ou `;`).
+Elles sont normalisées (espaces, casse) et dédoublonnées avant la recherche des
+invitations existantes. `valider_email` applique le même contrôle à une
+invitation unique.
+"""
+
+import csv
+import io
+import itertools
+import re
+
+# Nombre maximal d'adresses valides par campagne
+MAX_EMAILS_CAMPAGNE = 5000
+
+# Contrôle de forme volontairement simple : le serveur SMTP tranche
+MOTIF_EMAIL = re.compile(r'^[^@\s,;<>]+@[^@\s,;<>]+\.[^@\s,;<>]+$')
+
+# En-têtes reconnus pour la colonne des adresses
+EN_TETES_EMAIL = ('email', 'e-mail', 'mail', 'courriel', 'adresse email')
+
+
+def normaliser_email(valeur):
+    """Adresse sans espaces, en minuscules ('' si vide)"""
+    if valeur is None:
+        return ''
+    return str(valeur).strip().lower()
+
+
+def valider_email(valeur):
+    """Adresse normalisée si sa forme est valide, sinon None"""
+    email = normaliser_email(valeur)
+    return email if MOTIF_EMAIL.match(email) else None
+
+
+def lire_emails_csv(flux_binaire, encodage='utf-8-sig'):
+    """Valeurs de la colonne des adresses d'un fichier CSV"""
+    texte = io.TextIOWrapper(flux_binaire, encoding=encodage, newline='')
+    try:
+        debut = texte.read(4096)
+        try:
+            dialecte = csv.Sniffer().sniff(debut, delimiters=',;\t')
+        except csv.Error:
+            dialecte = csv.excel
+        # Début déjà lu, complété jusqu'à la fin de sa dernière ligne, puis le reste du flux
+        lignes = itertools.chain(io.StringIO(debut + texte.readline()), texte)
+        lecteur = csv.reader(lignes, dialecte)
+
+        premiere = next(lecteur, None)
+        if premiere is None:
+            return []
+        en_tetes = [normaliser_email(cellule) for cellule in premiere]
+        colonne = next((i for i, nom in enumerate(en_tetes) if nom in EN_TETES_EMAIL), None)
+        valeurs = []
+        if colonne is None:
+            # Pas d'en-tête : la première ligne est déjà une adresse
+            colonne = 0
+            valeurs.append(premiere[0] if premiere else '')
+        valeurs.extend(ligne[colonne] for ligne in lecteur if len(ligne) > colonne)
+        return valeurs
+    finally:
+        # Ne pas fermer le flux de l'appelant avec le wrapper
+        texte.detach()
+
+
+def trier_emails(valeurs, maximum=MAX_EMAILS_CAMPAGNE):
+    """Sépare les adresses valides (normalisées, sans doublon, ordre conservé) des invalides
+
+    ValueError si la campagne dépasse `maximum` adresses valides.
+    """
+    valides = []
+    invalides = []
+    vues = set()
+    for valeur in valeurs:
+        if not normaliser_email(valeur):
+            continue
+        email = valider_email(valeur)
+        if email is None:
+            invalides.append(str(valeur).strip())
+            continue
+        if email not in vues:
+            vues.add(email)
+            valides.append(email)
+    if len(valides) > maximum:
+        raise ValueError(f'{len(valides)} adresses : au plus {maximum} par campagne')
+    return valides, invalides
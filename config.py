@@ -1,5 +1,6 @@
 
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Charger les variables d'environnement
@@ -10,15 +11,103 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
-    # Configuration des logs
+    # Configuration des logs : niveau, fichier (vide : console seulement),
+    # format 'json' (un objet par ligne) ou 'texte', rotation du fichier
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.environ.get('LOG_FILE', 'emissions.log')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    LOG_TAILLE_MAX = int(os.environ.get('LOG_TAILLE_MAX', 10_000_000))   # octets, 0 : rotation externe (logrotate)
+    LOG_SAUVEGARDES = int(os.environ.get('LOG_SAUVEGARDES', 5))
+    
+    # Mode de calcul des recalculs massifs d'émissions ('standard' ou 'vectorise')
+    EMISSIONS_MODE_CALCUL = os.environ.get('EMISSIONS_MODE_CALCUL', 'standard')
+    # Recalcul automatique des transports dépendants après modification d'un facteur
+    EMISSIONS_RECALCUL_AUTO = os.environ.get('EMISSIONS_RECALCUL_AUTO', 'true').lower() == 'true'
+    
+    # File de tâches en arrière-plan (recalculs, imports CSV)
+    JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', 2))
+    JOBS_DOSSIER = os.environ.get('JOBS_DOSSIER') or os.path.join(tempfile.gettempdir(), 'myxploit_jobs')
+    JOBS_SYNCHRONES = False
+    # Battement des tâches en cours et délai au-delà duquel une tâche d'un autre
+    # hôte sans battement est passée en échec (worker disparu)
+    JOBS_BATTEMENT = float(os.environ.get('JOBS_BATTEMENT', 30.0))             # secondes
+    JOBS_DELAI_ABANDON = float(os.environ.get('JOBS_DELAI_ABANDON', 600.0))    # secondes
+    
+    # Serveur SMTP. Sans mot de passe, les envois sont simulés (journalisés) ;
+    # EMAIL_SIMULATION=false envoie quand même (serveur local sans authentification)
+    SMTP_SERVER = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
+    SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+    SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', 'true').lower() == 'true'
+    EMAIL_EMETTEUR = os.environ.get('EMAIL_EMETTEUR', 'noreply@myxploit.com')
+    EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD', '')
+    EMAIL_SIMULATION = os.environ.get('EMAIL_SIMULATION', 'false' if EMAIL_PASSWORD else 'true').lower() == 'true'
+    
+    # File d'envoi des emails : messages par lot, tentatives, délai initial entre
+    # tentatives (doublé à chaque fois) et fermeture de la connexion SMTP inactive
+    COURRIELS_SYNCHRONES = False
+    COURRIELS_TAILLE_LOT = int(os.environ.get('COURRIELS_TAILLE_LOT', 50))
+    COURRIELS_TENTATIVES_MAX = int(os.environ.get('COURRIELS_TENTATIVES_MAX', 5))
+    COURRIELS_DELAI_REPRISE = float(os.environ.get('COURRIELS_DELAI_REPRISE', 2.0))    # secondes
+    COURRIELS_INACTIVITE = float(os.environ.get('COURRIELS_INACTIVITE', 30.0))         # secondes
+    COURRIELS_TIMEOUT_SMTP = float(os.environ.get('COURRIELS_TIMEOUT_SMTP', 30.0))     # secondes
+    COURRIELS_DEBIT_MAX = float(os.environ.get('COURRIELS_DEBIT_MAX', 10))             # emails/s par worker, 0 : sans limite
+    # Invitations : lecture des envois en attente en base et durée de réservation
+    # d'une invitation par le worker qui l'envoie (reprise par un autre au-delà)
+    COURRIELS_SCRUTATION = float(os.environ.get('COURRIELS_SCRUTATION', 10.0))         # secondes
+    COURRIELS_BAIL = float(os.environ.get('COURRIELS_BAIL', 600.0))                    # secondes
+    # URL publique du site, pour les liens des invitations créées sans URL enregistrée
+    URL_APPLICATION = os.environ.get('URL_APPLICATION', 'http://localhost:5000')
+    
+    # Import CSV en continu : lignes par lot et nombre de résultats détaillés renvoyés
+    IMPORT_CSV_TAILLE_LOT = int(os.environ.get('IMPORT_CSV_TAILLE_LOT', 5000))
+    IMPORT_CSV_MAX_RESULTATS = int(os.environ.get('IMPORT_CSV_MAX_RESULTATS', 1000))
+    
+    # Listes paginées de transports : taille de page par défaut et maximale
+    TRANSPORTS_PAGE_TAILLE = int(os.environ.get('TRANSPORTS_PAGE_TAILLE', 100))
+    TRANSPORTS_PAGE_MAX = int(os.environ.get('TRANSPORTS_PAGE_MAX', 1000))
+    # Nombre maximal de transports par requête de l'API /api/transports
+    TRANSPORTS_API_MAX_LOT = int(os.environ.get('TRANSPORTS_API_MAX_LOT', 5000))
+    
+    # Migrations du schéma appliquées au démarrage si la base est en retard.
+    # Désactivé par défaut : `flask db upgrade` est lancé une fois avant les workers
+    MIGRATIONS_AUTO = os.environ.get('MIGRATIONS_AUTO', 'false').lower() == 'true'
+    
+    # Blueprints enregistrés : 'tous', 'api' (sans les pages HTML) ou liste de noms
+    # séparés par des virgules (voir BLUEPRINTS dans app.py)
+    APP_BLUEPRINTS = os.environ.get('APP_BLUEPRINTS', 'tous')
+    
+    # Mesures par endpoint (durée, requêtes SQL) exposées sur /metrics ; une
+    # même requête SQL répétée au moins METRIQUES_SEUIL_N_PLUS_1 fois est signalée
+    METRIQUES_ACTIVES = os.environ.get('METRIQUES_ACTIVES', 'false').lower() == 'true'
+    METRIQUES_SEUIL_N_PLUS_1 = int(os.environ.get('METRIQUES_SEUIL_N_PLUS_1', 10))
+    # Instantanés des mesures de chaque worker, lus par /metrics quel que soit le
+    # worker qui répond : dossier partagé, fréquence de publication et
+    # conservation après l'arrêt d'un worker
+    METRIQUES_DOSSIER = os.environ.get('METRIQUES_DOSSIER') or os.path.join(tempfile.gettempdir(), 'myxploit_metriques')
+    METRIQUES_INTERVALLE = float(os.environ.get('METRIQUES_INTERVALLE', 5.0))     # secondes
+    METRIQUES_RETENTION = float(os.environ.get('METRIQUES_RETENTION', 600.0))     # secondes
+    
+    # Pool de connexions (par processus worker)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))      # secondes d'attente d'une connexion libre
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))    # secondes avant renouvellement
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # Durée maximale d'une requête PostgreSQL en millisecondes (0 : illimitée)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    # Connexions autorisées pour l'ensemble des workers (0 : pas de plafond) ;
+    # le pool de chaque worker est réduit à sa part (WEB_CONCURRENCY workers)
+    DB_CONNEXIONS_MAX = int(os.environ.get('DB_CONNEXIONS_MAX', 0))
 
 class DevelopmentConfig(Config):
     """Configuration de développement"""
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL') or \
         'sqlite:///myxploit_dev.db'
+    # Base locale mise à jour automatiquement au lancement
+    MIGRATIONS_AUTO = os.environ.get('MIGRATIONS_AUTO', 'true').lower() == 'true'
+    # Logs lisibles en console pendant le développement
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'texte')
     
     # Configuration locale
     HOST = '127.0.0.1'
@@ -38,6 +127,18 @@ class ProductionConfig(Config):
     
     SQLALCHEMY_DATABASE_URI = database_url
     
+    # Pool : PostgreSQL Render ferme les connexions inactives, elles sont donc
+    # testées avant usage et renouvelées avant d'être coupées côté serveur
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 280))
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    
+    # Logs sur la sortie standard seulement (collectés par l'hébergeur) : aucun
+    # fichier partagé par les workers
+    LOG_FILE = os.environ.get('LOG_FILE', '')
+    DB_CONNEXIONS_MAX = int(os.environ.get('DB_CONNEXIONS_MAX', 80))
+    
     # Configuration serveur
     HOST = os.environ.get('HOST', '0.0.0.0')
     PORT = int(os.environ.get('PORT', 5000))
@@ -52,6 +153,11 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///myxploit_test.db'  # Base de données persistante pour les tests
     WTF_CSRF_ENABLED = False
+    JOBS_SYNCHRONES = True  # Tâches exécutées immédiatement pour des tests déterministes
+    COURRIELS_SYNCHRONES = True  # Emails envoyés dans la requête, sans délai entre tentatives
+    MIGRATIONS_AUTO = True
+    DB_POOL_SIZE = 2
+    DB_MAX_OVERFLOW = 2
 
 # Dictionnaire des configurations
 config = {
@@ -61,6 +167,37 @@ config = {
     'default': DevelopmentConfig
 }
 
+def options_moteur(parametres, url):
+    """SQLALCHEMY_ENGINE_OPTIONS construites depuis les paramètres DB_* d'une configuration
+    
+    `parametres` est la configuration Flask (ou tout objet dict-like) et `url`
+    l'URL finale de la base. Les options de pool ne s'appliquent pas à une base
+    SQLite en mémoire ; le délai maximal des requêtes est propre à PostgreSQL.
+    """
+    url = url or ''
+    options = {'pool_pre_ping': parametres['DB_POOL_PRE_PING']}
+    if url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') == 'sqlite:'):
+        return options
+    
+    taille = parametres['DB_POOL_SIZE']
+    debordement = parametres['DB_MAX_OVERFLOW']
+    plafond = parametres['DB_CONNEXIONS_MAX']
+    if plafond:
+        workers = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+        part = max(1, plafond // workers)
+        taille = min(taille, part)
+        debordement = max(0, min(debordement, part - taille))
+    
+    options.update({
+        'pool_size': taille,
+        'max_overflow': debordement,
+        'pool_timeout': parametres['DB_POOL_TIMEOUT'],
+        'pool_recycle': parametres['DB_POOL_RECYCLE'],
+    })
+    if url.startswith('postgresql') and parametres['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={parametres['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
 def get_config():
     """Retourne la configuration selon l'environnement"""
     config_name = os.environ.get('FLASK_ENV', 'development')
@@ -0,0 +1,160 @@
+"""
+Envoi des emails (confirmations, invitations)
+
+Les corps des emails sont des modèles Jinja (templates/emails/<nom>.html et
+.txt), compilés une fois par processus puis conservés dans le cache de
+l'environnement Jinja de l'application. Un lot de destinataires (campagne
+d'invitations) est rendu avec les mêmes modèles compilés.
+
+Les emails d'invitation ne passent pas par la file en mémoire : les routes
+enregistrent l'invitation (`en_attente`) puis réveillent la file d'envoi, qui
+réserve les invitations à envoyer (`reserver_invitations`) et enregistre leur
+statut (`enregistrer_statuts_envoi`).
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, or_, select, update
+
+from extensions import db, file_courriels
+from file_courriels import Courriel, STATUT_EN_ATTENTE, STATUT_ENVOYE, STATUT_SIMULE
+from models import Invitation
+
+logger = logging.getLogger(__name__)
+
+# Sujet de chaque modèle d'email
+SUJETS = {
+    'confirmation_client': "Bienvenue chez MyXploit - Votre compte a été créé",
+    'confirmation_transporteur': "Bienvenue chez MyXploit - Votre compte transporteur a été créé",
+    'invitation': "Invitation à rejoindre MyXploit - Plateforme de gestion des transports",
+}
+
+def envoyer_email(destinataire, sujet, contenu_html, contenu_texte=None):
+    """Dépose un email dans la file d'envoi ; retourne True si le message est accepté
+
+    L'envoi SMTP se fait en arrière-plan (file_courriels.py) : la requête
+    n'attend pas le serveur.
+    """
+    try:
+        file_courriels.envoyer(destinataire, sujet, contenu_html, contenu_texte)
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la mise en file de l'email à {destinataire}: {str(e)}")
+        return False
+
+
+def enregistrer_statuts_envoi(resultats):
+    """Reporte le résultat d'un lot d'envois sur les invitations concernées (une requête)
+
+    La réservation est levée ; une invitation à retenter reste `en_attente`
+    jusqu'à sa prochaine tentative (`prochain_envoi`).
+    """
+    maintenant = datetime.utcnow()
+    lignes = []
+    for resultat in resultats:
+        if resultat.courriel.invitation_id is None:
+            continue
+        ligne = {
+            'id': resultat.courriel.invitation_id,
+            'statut_envoi': resultat.statut,
+            'tentatives_envoi': resultat.courriel.tentatives,
+            'erreur_envoi': resultat.erreur,
+            'envoi_reserve_jusqu_a': None
+        }
+        if resultat.statut in (STATUT_ENVOYE, STATUT_SIMULE):
+            ligne['date_envoi'] = maintenant
+        if resultat.delai is not None:
+            ligne['prochain_envoi'] = maintenant + timedelta(seconds=resultat.delai)
+        lignes.append(ligne)
+    if lignes:
+        db.session.execute(update(Invitation), lignes)
+        db.session.commit()
+
+
+def rendre_emails(modele, contextes, **commun):
+    """Corps HTML et texte du modèle pour chaque contexte : liste de `(html, texte)`
+
+    `commun` regroupe les valeurs partagées par tout le lot. Le HTML est
+    échappé automatiquement (message personnalisé saisi par l'utilisateur).
+    """
+    environnement = current_app.jinja_env
+    modele_html = environnement.get_template(f'emails/{modele}.html')
+    modele_texte = environnement.get_template(f'emails/{modele}.txt')
+    rendus = []
+    for contexte in contextes:
+        valeurs = {**commun, **contexte}
+        rendus.append((modele_html.render(valeurs), modele_texte.render(valeurs)))
+    return rendus
+
+
+def _coordonnees(partenaire):
+    return {'nom': partenaire.nom, 'email': partenaire.email, 'telephone': partenaire.telephone}
+
+
+def envoyer_email_confirmation_client(client):
+    """Envoyer un email de confirmation à un nouveau client"""
+    [(contenu_html, contenu_texte)] = rendre_emails('confirmation_client', [_coordonnees(client)])
+    return envoyer_email(client.email, SUJETS['confirmation_client'], contenu_html, contenu_texte)
+
+
+def envoyer_email_confirmation_transporteur(transporteur):
+    """Envoyer un email de confirmation à un nouveau transporteur"""
+    [(contenu_html, contenu_texte)] = rendre_emails('confirmation_transporteur', [_coordonnees(transporteur)])
+    return envoyer_email(transporteur.email, SUJETS['confirmation_transporteur'], contenu_html, contenu_texte)
+
+
+def reserver_invitations(limite):
+    """Source de la file d'envoi : réserve au plus `limite` invitations à envoyer et rend leurs emails
+
+    Invitations `en_attente` dont la tentative est due et qui ne sont pas
+    réservées, ou dont la réservation a expiré (worker arrêté pendant l'envoi).
+    La réservation est une mise à jour conditionnelle : deux workers ne
+    réservent jamais la même invitation.
+    """
+    maintenant = datetime.utcnow()
+    a_envoyer = and_(
+        Invitation.statut_envoi == STATUT_EN_ATTENTE,
+        or_(Invitation.prochain_envoi.is_(None), Invitation.prochain_envoi <= maintenant),
+        or_(Invitation.envoi_reserve_jusqu_a.is_(None), Invitation.envoi_reserve_jusqu_a < maintenant)
+    )
+    ids = db.session.scalars(select(Invitation.id).where(a_envoyer).order_by(Invitation.id).limit(limite)).all()
+    if not ids:
+        db.session.rollback()
+        return []
+    invitations = db.session.execute(
+        update(Invitation)
+        .where(Invitation.id.in_(ids), a_envoyer)
+        .values(envoi_reserve_jusqu_a=maintenant + timedelta(seconds=current_app.config['COURRIELS_BAIL']))
+        .returning(
+            Invitation.id, Invitation.email, Invitation.token, Invitation.message_personnalise,
+            Invitation.url_application, Invitation.tentatives_envoi
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return courriels_invitation(invitations)
+
+
+def courriels_invitation(invitations):
+    """Emails d'un lot d'invitations, rendus avec les mêmes modèles compilés
+
+    `invitations` : lignes avec `id`, `email`, `token`, `message_personnalise`,
+    `url_application` et `tentatives_envoi`.
+    """
+    url_defaut = current_app.config['URL_APPLICATION']
+    rendus = rendre_emails('invitation', [
+        {
+            # URL de base pour l'acceptation de l'invitation
+            'url_acceptation': f"{(invitation.url_application or url_defaut).rstrip('/')}/invitation/{invitation.token}",
+            'message_personnalise': invitation.message_personnalise
+        }
+        for invitation in invitations
+    ])
+    courriels = []
+    for invitation, (contenu_html, contenu_texte) in zip(invitations, rendus):
+        courriel = Courriel(invitation.email, SUJETS['invitation'], contenu_html, contenu_texte, invitation_id=invitation.id)
+        courriel.tentatives = invitation.tentatives_envoi or 0
+        courriels.append(courriel)
+    return courriels
@@ -0,0 +1,462 @@
+"""
+Moteur de calcul des émissions CO₂e
+
+Les calculs travaillent sur un référentiel de véhicules et d'énergies chargé
+une seule fois, ce qui permet de traiter des lots entiers de transports sans
+aucune requête supplémentaire par ligne.
+"""
+
+import importlib
+import importlib.util
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Taille des lots lus et écrits lors d'un recalcul massif
+TAILLE_LOT_DEFAUT = 1000
+# Les lots vectorisés sont plus gros : le coût par ligne y est quasi nul
+TAILLE_LOT_VECTORISE = 50000
+
+# Modes de calcul disponibles pour les recalculs massifs
+MODE_STANDARD = 'standard'
+MODE_VECTORISE = 'vectorise'
+
+# Instantanés légers des données de référence (indépendants de la session SQLAlchemy)
+VehiculeRef = namedtuple('VehiculeRef', ['id', 'consommation', 'emissions'])
+EnergieRef = namedtuple('EnergieRef', ['id', 'facteur'])
+
+
+class ReferentielEmissions:
+    """Véhicules et énergies indexés par identifiant pour les calculs d'émissions"""
+
+    def __init__(self, vehicules=None, energies=None, identifiants_energies=None):
+        self.vehicules = {str(v.id): v for v in (vehicules or [])}
+        self.energies = {str(e.id): e for e in (energies or [])}
+        # Identifiants métier ('gazole', ...) -> id, utilisés par les phases
+        self.identifiants_energies = dict(identifiants_energies or {})
+
+    @classmethod
+    def depuis_modeles(cls, vehicules, energies):
+        """Construit le référentiel à partir d'objets Vehicule / Energie"""
+        energies = [e for e in energies if e is not None]
+        return cls(
+            [VehiculeRef(v.id, v.consommation, v.emissions) for v in vehicules if v is not None],
+            [EnergieRef(e.id, e.facteur) for e in energies],
+            {e.identifiant: str(e.id) for e in energies if getattr(e, 'identifiant', None)}
+        )
+
+    def vehicule(self, identifiant):
+        """Retourne le véhicule référencé par un transport (ou None)"""
+        if identifiant is None:
+            return None
+        return self.vehicules.get(str(identifiant).strip())
+
+    def energie(self, identifiant):
+        """Retourne l'énergie référencée par un transport (ou None)"""
+        if identifiant is None:
+            return None
+        return self.energies.get(str(identifiant).strip())
+
+    def energie_par_code(self, valeur):
+        """Retourne l'énergie désignée par son id ou son identifiant métier (ou None)"""
+        energie = self.energie(valeur)
+        if energie is None and valeur is not None:
+            energie = self.energie(self.identifiants_energies.get(str(valeur).strip()))
+        return energie
+
+    def references(self, energie, type_vehicule):
+        """Clés `(energie_id, vehicule_id)` désignées par les champs texte d'un transport
+
+        Même résolution que le calcul : None si la valeur ne désigne aucune ligne.
+        """
+        energie = self.energie(energie)
+        vehicule = self.vehicule(type_vehicule)
+        return (energie.id if energie else None, vehicule.id if vehicule else None)
+
+    def tableaux(self):
+        """Colonnes NumPy du référentiel et index identifiant -> position
+
+        Les valeurs absentes sont ramenées à 0.0, ce qui reproduit les tests
+        de véracité (`if not vehicule.consommation`) du calcul unitaire. Chaque
+        colonne se termine par une sentinelle à 0.0 lue par l'index -1
+        (référence inconnue).
+        """
+        if getattr(self, '_tableaux', None) is None:
+            np = _numpy()
+            vehicules = list(self.vehicules.values())
+            energies = list(self.energies.values())
+            self._tableaux = {
+                'index_vehicules': {cle: i for i, cle in enumerate(self.vehicules)},
+                'index_energies': {cle: i for i, cle in enumerate(self.energies)},
+                'vehicules_consommation': np.array([v.consommation or 0.0 for v in vehicules] + [0.0], dtype=np.float64),
+                'vehicules_emissions': np.array([v.emissions or 0.0 for v in vehicules] + [0.0], dtype=np.float64),
+                'energies_facteur': np.array([e.facteur or 0.0 for e in energies] + [0.0], dtype=np.float64)
+            }
+        return self._tableaux
+
+
+def _echec(message):
+    return {
+        'success': False,
+        'error': message,
+        'emis_kg': 0,
+        'emis_tkm': 0
+    }
+
+
+def calculer_emissions(transport, referentiel):
+    """Calcule les émissions CO₂e d'un transport selon son niveau de calcul
+
+    `transport` peut être un objet Transport ou une ligne de requête exposant
+    les mêmes attributs ; `referentiel` fournit véhicules et énergies.
+    """
+    try:
+        # Vérifier les données minimales
+        if not transport.poids_tonnes or not transport.distance_km:
+            return _echec('Poids ou distance manquant')
+
+        emis_kg = 0
+        emis_tkm = 0
+
+        # Niveau 1 : Calcul basé sur le véhicule et l'énergie
+        if transport.niveau_calcul and 'niveau_1' in transport.niveau_calcul:
+            if not transport.type_vehicule:
+                return _echec('Type de véhicule manquant pour niveau 1')
+
+            vehicule = referentiel.vehicule(transport.type_vehicule)
+            if not vehicule:
+                return _echec(f'Véhicule {transport.type_vehicule} non trouvé')
+
+            if not vehicule.consommation:
+                return _echec('Consommation du véhicule manquante')
+
+            # Calcul avec consommation du véhicule
+            consommation_totale = (transport.distance_km / 100) * vehicule.consommation
+
+            energie = referentiel.energie(transport.energie) if transport.energie else None
+            if energie and energie.facteur:
+                # Calcul avec facteur d'émission de l'énergie
+                emis_kg = consommation_totale * energie.facteur
+            elif vehicule.emissions:
+                # Fallback sur les émissions du véhicule
+                emis_kg = (consommation_totale * vehicule.emissions) / 1000
+            else:
+                return _echec('Aucun facteur d\'émission disponible')
+
+            # kg CO₂e/t.km imposé par le véhicule
+            if vehicule.emissions:
+                emis_tkm = vehicule.emissions / 1000
+            else:
+                emis_tkm = 0
+
+        else:
+            # Niveaux 2, 3, 4 : Calcul basé sur la consommation et l'énergie
+            if not transport.conso_vehicule:
+                return _echec('Consommation véhicule manquante pour niveaux 2-4')
+
+            if not transport.energie:
+                return _echec('Énergie manquante pour niveaux 2-4')
+
+            energie = referentiel.energie(transport.energie)
+            if not energie or not energie.facteur:
+                return _echec('Facteur d\'émission de l\'énergie manquant')
+
+            # Calcul avec consommation et facteur d'émission
+            consommation_totale = (transport.distance_km / 100) * transport.conso_vehicule
+            emis_kg = consommation_totale * energie.facteur
+
+            # kg CO₂e/t.km calculé
+            masse_distance = transport.poids_tonnes * transport.distance_km
+            if masse_distance > 0:
+                emis_tkm = emis_kg / masse_distance
+            else:
+                emis_tkm = 0
+
+        # Arrondir les résultats
+        emis_kg = round(emis_kg, 2)
+        emis_tkm = round(emis_tkm, 3)
+
+        return {
+            'success': True,
+            'emis_kg': emis_kg,
+            'emis_tkm': emis_tkm
+        }
+
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul des émissions pour le transport {transport.ref}: {str(e)}")
+        return _echec(f'Erreur de calcul: {str(e)}')
+
+
+def calculer_emissions_phase(phase, referentiel, poids_tonnes=None):
+    """Calcule les émissions d'une phase (collecte, traction, distribution)
+
+    La consommation et l'énergie de la phase priment ; à défaut, la
+    consommation et les émissions du véhicule de la phase sont utilisées.
+    `poids_tonnes` (celui du transport) sert si la phase n'a pas de poids.
+    """
+    if not phase.distance_km:
+        return _echec('Distance de la phase manquante')
+
+    vehicule = referentiel.vehicule(phase.vehicule_id) if phase.vehicule_id else None
+    consommation = phase.consommation or (vehicule.consommation if vehicule else None)
+    if not consommation:
+        return _echec('Consommation de la phase manquante')
+
+    consommation_totale = (phase.distance_km / 100) * consommation
+    energie = referentiel.energie_par_code(phase.energie) if phase.energie else None
+    if energie and energie.facteur:
+        emis_kg = consommation_totale * energie.facteur
+    elif vehicule and vehicule.emissions:
+        emis_kg = (consommation_totale * vehicule.emissions) / 1000
+    else:
+        return _echec('Aucun facteur d\'émission disponible')
+
+    poids = phase.poids_tonnes or poids_tonnes
+    masse_distance = poids * phase.distance_km if poids else 0
+    emis_tkm = emis_kg / masse_distance if masse_distance > 0 else 0
+
+    return {
+        'success': True,
+        'emis_kg': round(emis_kg, 2),
+        'emis_tkm': round(emis_tkm, 3)
+    }
+
+
+def calculer_emissions_phases(phases, referentiel, poids_tonnes=None):
+    """Calcule toutes les phases d'un transport et leur total
+
+    Retourne `(resultats, total)` : un résultat par phase (dans l'ordre reçu)
+    et le total du transport, somme des phases calculées, avec des kg CO₂e/t.km
+    pondérés par les tonnes.km de ces phases.
+    """
+    resultats = []
+    emis_kg = 0.0
+    tonnes_km = 0.0
+    for phase in phases:
+        resultat = calculer_emissions_phase(phase, referentiel, poids_tonnes)
+        resultats.append(resultat)
+        if resultat['success']:
+            emis_kg += resultat['emis_kg']
+            poids = phase.poids_tonnes or poids_tonnes
+            if poids:
+                tonnes_km += poids * phase.distance_km
+
+    erreurs = sum(1 for resultat in resultats if not resultat['success'])
+    total = {
+        'success': erreurs < len(resultats),
+        'emis_kg': round(emis_kg, 2),
+        'emis_tkm': round(emis_kg / tonnes_km, 3) if tonnes_km > 0 else 0,
+        'phases_en_erreur': erreurs
+    }
+    if not total['success']:
+        total['error'] = 'Aucune phase calculable'
+    return resultats, total
+
+
+def calculer_lot(transports, referentiel):
+    """Calcule les émissions d'un lot de transports entièrement en mémoire
+
+    Retourne `(resultats, mises_a_jour)` : les résultats par transport au format
+    de l'API de recalcul, et les valeurs à écrire pour les seules lignes dont
+    les émissions ont changé (clé `id` incluse pour un UPDATE groupé). Les
+    erreurs ne sont pas journalisées ici : l'appelant en écrit la synthèse.
+    """
+    resultats = []
+    mises_a_jour = []
+
+    for transport in transports:
+        resultat = calculer_emissions(transport, referentiel)
+
+        if resultat['success']:
+            resultats.append({
+                'ref': transport.ref,
+                'emis_kg': resultat['emis_kg'],
+                'emis_tkm': resultat['emis_tkm'],
+                'success': True
+            })
+            if transport.emis_kg != resultat['emis_kg'] or transport.emis_tkm != resultat['emis_tkm']:
+                mises_a_jour.append({
+                    'id': transport.id,
+                    'emis_kg': resultat['emis_kg'],
+                    'emis_tkm': resultat['emis_tkm']
+                })
+        else:
+            resultats.append({
+                'ref': transport.ref,
+                'error': resultat['error'],
+                'success': False
+            })
+
+    return resultats, mises_a_jour
+
+
+# Codes de résultat du calcul vectorisé (0 = succès)
+CODE_SUCCES = 0
+CODE_POIDS_DISTANCE = 1
+CODE_TYPE_VEHICULE = 2
+CODE_VEHICULE_INCONNU = 3
+CODE_CONSO_VEHICULE = 4
+CODE_AUCUN_FACTEUR = 5
+CODE_CONSO_TRANSPORT = 6
+CODE_ENERGIE_MANQUANTE = 7
+CODE_FACTEUR_ENERGIE = 8
+
+MESSAGES_ERREUR = {
+    CODE_POIDS_DISTANCE: 'Poids ou distance manquant',
+    CODE_TYPE_VEHICULE: 'Type de véhicule manquant pour niveau 1',
+    CODE_CONSO_VEHICULE: 'Consommation du véhicule manquante',
+    CODE_AUCUN_FACTEUR: 'Aucun facteur d\'émission disponible',
+    CODE_CONSO_TRANSPORT: 'Consommation véhicule manquante pour niveaux 2-4',
+    CODE_ENERGIE_MANQUANTE: 'Énergie manquante pour niveaux 2-4',
+    CODE_FACTEUR_ENERGIE: 'Facteur d\'émission de l\'énergie manquant'
+}
+
+
+def numpy_disponible():
+    """Indique si le mode de calcul vectorisé peut être utilisé"""
+    return importlib.util.find_spec('numpy') is not None
+
+
+def _numpy():
+    # NumPy n'est chargé qu'au premier calcul vectorisé : la plupart des
+    # workers n'en ont jamais besoin (plus de 100 ms et ~15 Mo à l'import)
+    return importlib.import_module('numpy')
+
+
+def _index_reference(index, identifiant):
+    if identifiant is None:
+        return -1
+    return index.get(str(identifiant).strip(), -1)
+
+
+def preparer_colonnes(transports, referentiel):
+    """Convertit une liste de transports en colonnes NumPy
+
+    `distance`, `poids` et `conso` valent 0.0 quand la donnée est absente ;
+    `idx_vehicule` / `idx_energie` sont des positions dans `referentiel.tableaux()`
+    (-1 si la référence est inconnue).
+    """
+    np = _numpy()
+    tableaux = referentiel.tableaux()
+    index_vehicules = tableaux['index_vehicules']
+    index_energies = tableaux['index_energies']
+    n = len(transports)
+
+    return {
+        'distance': np.fromiter((t.distance_km or 0.0 for t in transports), dtype=np.float64, count=n),
+        'poids': np.fromiter((t.poids_tonnes or 0.0 for t in transports), dtype=np.float64, count=n),
+        'conso': np.fromiter((t.conso_vehicule or 0.0 for t in transports), dtype=np.float64, count=n),
+        'niveau_1': np.fromiter((bool(t.niveau_calcul) and 'niveau_1' in t.niveau_calcul for t in transports), dtype=bool, count=n),
+        'a_vehicule': np.fromiter((bool(t.type_vehicule) for t in transports), dtype=bool, count=n),
+        'a_energie': np.fromiter((bool(t.energie) for t in transports), dtype=bool, count=n),
+        'idx_vehicule': np.fromiter((_index_reference(index_vehicules, t.type_vehicule) for t in transports), dtype=np.int64, count=n),
+        'idx_energie': np.fromiter((_index_reference(index_energies, t.energie) for t in transports), dtype=np.int64, count=n)
+    }
+
+
+def _arrondir(valeurs, decimales):
+    """Arrondi identique à `round()` de Python sur un tableau
+
+    `np.round` multiplie avant d'arrondir et peut diverger de `round()` sur les
+    valeurs très proches d'une demi-unité : celles-ci sont recalculées une à une.
+    """
+    np = _numpy()
+    echelle = 10.0 ** decimales
+    mise_a_echelle = valeurs * echelle
+    arrondi = np.rint(mise_a_echelle) / echelle
+    ecart = np.abs(np.abs(mise_a_echelle - np.floor(mise_a_echelle)) - 0.5)
+    douteux = np.flatnonzero(ecart <= 1e-6 * np.maximum(1.0, np.abs(mise_a_echelle)))
+    for i in douteux:
+        arrondi[i] = round(float(valeurs[i]), decimales)
+    return arrondi
+
+
+def calculer_emissions_vectorise(colonnes, referentiel):
+    """Calcule les émissions de toutes les lignes en une passe
+
+    Reproduit exactement `calculer_emissions` (branche niveau_1 et niveaux 2-4,
+    ordre des opérations flottantes et arrondis). Retourne
+    `(emis_kg, emis_tkm, codes)` où `codes` contient CODE_SUCCES ou le code
+    de la première vérification en échec.
+    """
+    np = _numpy()
+    tableaux = referentiel.tableaux()
+    distance = colonnes['distance']
+    poids = colonnes['poids']
+    conso = colonnes['conso']
+    niveau_1 = colonnes['niveau_1']
+    idx_vehicule = colonnes['idx_vehicule']
+    idx_energie = colonnes['idx_energie']
+    n = len(distance)
+
+    vehicule_connu = idx_vehicule >= 0
+    # Les références inconnues (-1) lisent la sentinelle 0.0
+    v_conso = tableaux['vehicules_consommation'][idx_vehicule]
+    v_emissions = tableaux['vehicules_emissions'][idx_vehicule]
+    facteur = tableaux['energies_facteur'][idx_energie]
+
+    codes = np.zeros(n, dtype=np.int8)
+
+    def marquer(masque, code):
+        # Seule la première vérification en échec est retenue, comme dans le calcul unitaire
+        codes[masque & (codes == CODE_SUCCES)] = code
+
+    marquer((poids == 0) | (distance == 0), CODE_POIDS_DISTANCE)
+
+    # Niveau 1 : véhicule et énergie
+    marquer(niveau_1 & ~colonnes['a_vehicule'], CODE_TYPE_VEHICULE)
+    marquer(niveau_1 & ~vehicule_connu, CODE_VEHICULE_INCONNU)
+    marquer(niveau_1 & (v_conso == 0), CODE_CONSO_VEHICULE)
+    avec_facteur = colonnes['a_energie'] & (facteur != 0)
+    marquer(niveau_1 & ~avec_facteur & (v_emissions == 0), CODE_AUCUN_FACTEUR)
+
+    consommation_n1 = (distance / 100) * v_conso
+    emis_n1 = np.where(avec_facteur, consommation_n1 * facteur, (consommation_n1 * v_emissions) / 1000)
+    tkm_n1 = v_emissions / 1000
+
+    # Niveaux 2, 3, 4 : consommation du transport et facteur de l'énergie
+    niveaux_2_4 = ~niveau_1
+    marquer(niveaux_2_4 & (conso == 0), CODE_CONSO_TRANSPORT)
+    marquer(niveaux_2_4 & ~colonnes['a_energie'], CODE_ENERGIE_MANQUANTE)
+    marquer(niveaux_2_4 & (facteur == 0), CODE_FACTEUR_ENERGIE)
+
+    emis_n24 = ((distance / 100) * conso) * facteur
+    masse_distance = poids * distance
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tkm_n24 = np.where(masse_distance > 0, emis_n24 / np.where(masse_distance > 0, masse_distance, 1.0), 0.0)
+
+    succes = codes == CODE_SUCCES
+    emis_kg = np.where(succes, np.where(niveau_1, emis_n1, emis_n24), 0.0)
+    emis_tkm = np.where(succes, np.where(niveau_1, tkm_n1, tkm_n24), 0.0)
+
+    return _arrondir(emis_kg, 2), _arrondir(emis_tkm, 3), codes
+
+
+def calculer_lot_vectorise(transports, referentiel):
+    """Variante vectorisée de `calculer_lot`, avec les mêmes valeurs de retour"""
+    np = _numpy()
+    colonnes = preparer_colonnes(transports, referentiel)
+    emis_kg, emis_tkm, codes = calculer_emissions_vectorise(colonnes, referentiel)
+
+    anciens_kg = np.fromiter((np.nan if t.emis_kg is None else t.emis_kg for t in transports), dtype=np.float64, count=len(transports))
+    anciens_tkm = np.fromiter((np.nan if t.emis_tkm is None else t.emis_tkm for t in transports), dtype=np.float64, count=len(transports))
+    modifies = (codes == CODE_SUCCES) & ((anciens_kg != emis_kg) | (anciens_tkm != emis_tkm))
+
+    resultats = []
+    for transport, kg, tkm, code in zip(transports, emis_kg.tolist(), emis_tkm.tolist(), codes.tolist()):
+        if code == CODE_SUCCES:
+            resultats.append({'ref': transport.ref, 'emis_kg': kg, 'emis_tkm': tkm, 'success': True})
+        else:
+            if code == CODE_VEHICULE_INCONNU:
+                message = f'Véhicule {transport.type_vehicule} non trouvé'
+            else:
+                message = MESSAGES_ERREUR[code]
+            resultats.append({'ref': transport.ref, 'error': message, 'success': False})
+
+    mises_a_jour = [
+        {'id': transports[i].id, 'emis_kg': float(emis_kg[i]), 'emis_tkm': float(emis_tkm[i])}
+        for i in np.flatnonzero(modifies).tolist()
+    ]
+
+    return resultats, mises_a_jour
@@ -0,0 +1,187 @@
+"""
+Export en continu des transports et de leurs émissions (CSV, JSON Lines, Parquet, Arrow)
+
+Les lignes sont lues par lots avec un curseur côté serveur (`yield_per` :
+curseur nommé sous PostgreSQL) et encodées au fil de l'eau : la mémoire
+utilisée ne dépend que de la taille d'un lot, pas du nombre de transports.
+Parquet et Arrow reposent sur `pyarrow` (requirements.txt) : sur une
+installation qui ne l'a pas, ces deux formats sont refusés.
+"""
+
+import csv
+import importlib.util
+import io
+import json
+
+from sqlalchemy import func, select
+
+from models import Transport
+
+# Colonnes exportées, dans l'ordre de serialiser_transport (listes de transports)
+COLONNES_EXPORT = [
+    'id', 'ref', 'emis_kg', 'emis_tkm', 'type_transport', 'niveau_calcul',
+    'type_vehicule', 'energie', 'conso_vehicule', 'poids_tonnes', 'distance_km',
+    'client_id', 'transporteur_id', 'energie_id', 'vehicule_id', 'created_at', 'updated_at'
+]
+
+COLONNES_DATES = ('created_at', 'updated_at')
+
+# Nombre de lignes lues, encodées et envoyées ensemble (un groupe de lignes Parquet)
+TAILLE_LOT_EXPORT = 10000
+
+# Format -> (type MIME, extension)
+FORMATS_EXPORT = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+FORMATS_ARROW = ('parquet', 'arrow')
+
+
+def requete_export(conditions):
+    """Transports filtrés, triés par id (parcours de la clé primaire)"""
+    colonnes = []
+    for nom in COLONNES_EXPORT:
+        colonne = getattr(Transport, nom)
+        # Émissions non calculées à 0, comme dans les listes
+        if nom in ('emis_kg', 'emis_tkm'):
+            colonne = func.coalesce(colonne, 0.0).label(nom)
+        colonnes.append(colonne)
+    return select(*colonnes).where(*conditions).order_by(Transport.id)
+
+
+def verifier_format(format_export):
+    """Lève ValueError si le format est inconnu ou si pyarrow manque pour Parquet/Arrow"""
+    if format_export not in FORMATS_EXPORT:
+        raise ValueError(f"Format invalide: {format_export} (valeurs possibles: {', '.join(FORMATS_EXPORT)})")
+    if format_export in FORMATS_ARROW and importlib.util.find_spec('pyarrow') is None:
+        raise ValueError(f"Format {format_export} indisponible : installez le paquet pyarrow")
+
+
+def lots_transports(moteur, conditions, taille_lot=TAILLE_LOT_EXPORT):
+    """Itère sur les transports filtrés par lots de tuples (ordre de COLONNES_EXPORT)
+
+    La connexion est dédiée à l'export et libérée à la fin de l'itération, y
+    compris si elle est interrompue (client déconnecté).
+    """
+    with moteur.connect() as connexion:
+        resultat = connexion.execution_options(yield_per=taille_lot).execute(requete_export(conditions))
+        for lot in resultat.partitions():
+            yield lot
+
+
+def _date_iso(valeur):
+    return valeur.isoformat() if valeur is not None else None
+
+
+def _indices_dates():
+    return [COLONNES_EXPORT.index(nom) for nom in COLONNES_DATES]
+
+
+def encoder_csv(lots):
+    """Morceaux UTF-8 d'un CSV avec en-tête (une valeur absente est une cellule vide)"""
+    tampon = io.StringIO()
+    ecrivain = csv.writer(tampon, lineterminator='\n')
+    ecrivain.writerow(COLONNES_EXPORT)
+    dates = _indices_dates()
+    for lot in lots:
+        for ligne in lot:
+            ligne = list(ligne)
+            for indice in dates:
+                ligne[indice] = _date_iso(ligne[indice])
+            ecrivain.writerow(ligne)
+        yield tampon.getvalue().encode('utf-8')
+        tampon.seek(0)
+        tampon.truncate()
+    if tampon.tell():
+        yield tampon.getvalue().encode('utf-8')
+
+
+def encoder_ndjson(lots):
+    """Morceaux UTF-8 JSON Lines : un objet par transport, champs de serialiser_transport"""
+    dates = _indices_dates()
+    for lot in lots:
+        morceaux = []
+        for ligne in lot:
+            ligne = list(ligne)
+            for indice in dates:
+                ligne[indice] = _date_iso(ligne[indice])
+            morceaux.append(json.dumps(dict(zip(COLONNES_EXPORT, ligne)), ensure_ascii=False))
+        morceaux.append('')
+        yield '\n'.join(morceaux).encode('utf-8')
+
+
+class _Tampon(io.RawIOBase):
+    """Flux d'écriture pyarrow vidé après chaque lot"""
+
+    def __init__(self):
+        super().__init__()
+        self._morceaux = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, donnees):
+        self._morceaux.append(bytes(donnees))
+        self._position += len(donnees)
+        return len(donnees)
+
+    def tell(self):
+        return self._position
+
+    def vider(self):
+        donnees = b''.join(self._morceaux)
+        self._morceaux = []
+        return donnees
+
+
+def schema_arrow():
+    import pyarrow as pa
+
+    types = {
+        'id': pa.int64(), 'client_id': pa.int64(), 'transporteur_id': pa.int64(),
+        'energie_id': pa.int64(), 'vehicule_id': pa.int64(),
+        'emis_kg': pa.float64(), 'emis_tkm': pa.float64(), 'conso_vehicule': pa.float64(),
+        'poids_tonnes': pa.float64(), 'distance_km': pa.float64(),
+        'created_at': pa.timestamp('us'), 'updated_at': pa.timestamp('us'),
+    }
+    return pa.schema([(nom, types.get(nom, pa.string())) for nom in COLONNES_EXPORT])
+
+
+def encoder_arrow(lots, format_export='parquet'):
+    """Morceaux d'un fichier Parquet (un groupe de lignes par lot) ou d'un flux Arrow IPC"""
+    import pyarrow as pa
+
+    schema = schema_arrow()
+    tampon = _Tampon()
+    if format_export == 'parquet':
+        import pyarrow.parquet as pq
+        ecrivain = pq.ParquetWriter(tampon, schema, compression='snappy')
+    else:
+        ecrivain = pa.ipc.new_stream(tampon, schema)
+    try:
+        for lot in lots:
+            colonnes = list(zip(*lot))
+            lot_arrow = pa.RecordBatch.from_arrays(
+                [pa.array(valeurs, type=champ.type) for valeurs, champ in zip(colonnes, schema)],
+                schema=schema
+            )
+            ecrivain.write_batch(lot_arrow)
+            yield tampon.vider()
+    finally:
+        ecrivain.close()
+    yield tampon.vider()
+
+
+def exporter_transports(moteur, conditions, format_export='csv', taille_lot=TAILLE_LOT_EXPORT):
+    """Itère sur les morceaux (bytes) de l'export des transports filtrés"""
+    verifier_format(format_export)
+    lots = lots_transports(moteur, conditions, taille_lot)
+    if format_export == 'csv':
+        return encoder_csv(lots)
+    if format_export == 'ndjson':
+        return encoder_ndjson(lots)
+    return encoder_arrow(lots, format_export)
@@ -0,0 +1,21 @@
+"""
+Extensions Flask partagées par les modules de l'application
+
+Créées sans application : `create_app` (app.py) les initialise, ce qui permet
+aux modèles et aux blueprints de les importer sans dépendre d'une instance.
+"""
+
+from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from flask_login import LoginManager
+
+from file_courriels import FileCourriels
+from jobs import GestionnaireJobs
+from metriques import Metriques
+
+db = SQLAlchemy()
+migrate = Migrate()
+login_manager = LoginManager()
+gestionnaire_jobs = GestionnaireJobs()
+file_courriels = FileCourriels()
+metriques = Metriques()
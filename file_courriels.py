@@ -0,0 +1,417 @@
+"""
+File d'envoi des emails
+
+Les invitations à envoyer sont enregistrées en base (`statut_envoi` à
+`en_attente`) : c'est la base qui sert de boîte d'envoi. Le thread d'envoi de
+chaque worker y réserve des lots d'invitations (`source`, réservation expirant
+après COURRIELS_BAIL secondes), les envoie et enregistre leur statut (`rappel`).
+Un échec temporaire reporte la tentative suivante en base, avec un délai doublé
+à chaque tentative. Une invitation n'est donc jamais perdue : si son worker est
+recyclé, redéployé ou tué, un autre la reprend à l'expiration de sa
+réservation, et une campagne se poursuit jusqu'au bout.
+
+Les autres messages (confirmations) sont déposés dans une file en mémoire : les
+routes répondent sans attendre le serveur SMTP, mais ces messages sont perdus si
+le worker s'arrête avant de les envoyer.
+
+La connexion SMTP est conservée d'un lot à l'autre, fermée après
+COURRIELS_INACTIVITE secondes sans message. Les envois SMTP sont espacés pour ne
+pas dépasser COURRIELS_DEBIT_MAX messages par seconde (campagnes d'invitations).
+
+Les messages sont construits avec email.message.EmailMessage
+(`composer_message`, import différé au premier envoi) ; une valeur d'en-tête
+contenant un retour à la ligne est refusée (injection d'en-têtes).
+"""
+
+import atexit
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+STATUT_EN_ATTENTE = 'en_attente'
+STATUT_ENVOYE = 'envoye'
+STATUT_SIMULE = 'simule'
+STATUT_ECHEC = 'echec'
+
+# Issue d'une tentative d'envoi, transmise au rappel ; `delai` : secondes avant
+# la tentative suivante (statut en_attente), sinon None
+ResultatEnvoi = namedtuple('ResultatEnvoi', ['courriel', 'statut', 'erreur', 'delai'])
+
+
+class Courriel:
+    """Message à envoyer et nombre de tentatives déjà faites
+
+    Un message d'invitation (`invitation_id`) vient de la base : ses nouvelles
+    tentatives y sont enregistrées par le rappel, pas conservées en mémoire.
+    """
+
+    __slots__ = ('destinataire', 'sujet', 'contenu_html', 'contenu_texte', 'invitation_id', 'tentatives')
+
+    def __init__(self, destinataire, sujet, contenu_html, contenu_texte=None, invitation_id=None):
+        self.destinataire = destinataire
+        self.sujet = sujet
+        self.contenu_html = contenu_html
+        self.contenu_texte = contenu_texte
+        self.invitation_id = invitation_id
+        self.tentatives = 0
+
+
+class EnTeteInvalide(ValueError):
+    """Valeur d'en-tête refusée (retour à la ligne : injection d'en-têtes)"""
+
+
+def erreur_definitive(erreur):
+    """Erreur qu'une nouvelle tentative ne corrigerait pas (code SMTP 5xx, destinataire refusé, en-tête invalide)"""
+    import smtplib
+    if isinstance(erreur, (smtplib.SMTPRecipientsRefused, EnTeteInvalide)):
+        return True
+    code = getattr(erreur, 'smtp_code', None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+def valeur_en_tete(valeur):
+    """Valeur d'en-tête vérifiée : EnTeteInvalide si elle contient CR ou LF"""
+    valeur = str(valeur)
+    if '\r' in valeur or '\n' in valeur:
+        raise EnTeteInvalide(f"Retour à la ligne interdit dans un en-tête d'email: {valeur!r}")
+    return valeur
+
+
+def composer_message(emetteur, destinataire, sujet, contenu_html, contenu_texte=None):
+    """Message multipart/alternative (texte puis HTML) en octets, lignes CRLF
+
+    Chaque en-tête (From, To, Subject) est vérifié par `valeur_en_tete`. Le
+    domaine du Message-ID est celui de l'émetteur : make_msgid n'interroge pas
+    le DNS (socket.getfqdn) à chaque message.
+    """
+    from email.message import EmailMessage
+    from email.policy import SMTP
+    from email.utils import formatdate, make_msgid
+
+    emetteur = valeur_en_tete(emetteur)
+    message = EmailMessage(policy=SMTP)
+    message['Subject'] = valeur_en_tete(sujet)
+    message['From'] = emetteur
+    message['To'] = valeur_en_tete(destinataire)
+    message['Date'] = formatdate(usegmt=True)
+    message['Message-ID'] = make_msgid(domain=emetteur.rpartition('@')[2] or 'myxploit.com')
+    # Corps en base64 comme avec email.mime : aucun besoin de 8BITMIME côté serveur
+    if contenu_texte:
+        message.set_content(contenu_texte, cte='base64')
+        message.add_alternative(contenu_html, subtype='html', cte='base64')
+    else:
+        message.set_content(contenu_html, subtype='html', cte='base64')
+    return message.as_bytes()
+
+
+class FileCourriels:
+    """File des emails sortants et thread qui les expédie"""
+
+    def __init__(self, app=None, rappel=None, source=None):
+        # Messages en mémoire ; None : réveil demandé par `signaler`
+        self._file = queue.Queue()
+        # Tas des messages à retenter : (échéance, ordre, courriel)
+        self._reprises = []
+        self._ordre = itertools.count()
+        self._verrou = threading.Lock()
+        # Messages en mémoire dont le sort n'est pas encore fixé (envoyé ou échec)
+        self._en_cours = 0
+        self._termine = threading.Condition(self._verrou)
+        self._thread = None
+        self._smtp = None
+        # Instant (monotonic) avant lequel le prochain envoi SMTP doit attendre
+        self._prochain_envoi = 0.0
+        # Instants (monotonic) de la prochaine lecture de la source et du dernier envoi
+        self._prochaine_scrutation = 0.0
+        self._dernier_envoi = 0.0
+        self.app = None
+        self.rappel = rappel
+        self.source = source
+        if app is not None:
+            self.init_app(app, rappel, source)
+
+    def init_app(self, app, rappel=None, source=None):
+        """`rappel(resultats)` enregistre le résultat des envois ; `source(limite)`
+        réserve en base au plus `limite` messages à envoyer (liste de `Courriel`)
+
+        Tous deux sont appelés dans un contexte d'application.
+        """
+        self.app = app
+        if rappel is not None:
+            self.rappel = rappel
+        if source is not None:
+            self.source = source
+        self.serveur = app.config.get('SMTP_SERVER', 'localhost')
+        self.port = int(app.config.get('SMTP_PORT', 25))
+        self.starttls = bool(app.config.get('SMTP_STARTTLS', True))
+        self.emetteur = app.config.get('EMAIL_EMETTEUR', 'noreply@myxploit.com')
+        self.mot_de_passe = app.config.get('EMAIL_PASSWORD', '')
+        self.simulation = bool(app.config.get('EMAIL_SIMULATION', not self.mot_de_passe))
+        self.synchrone = bool(app.config.get('COURRIELS_SYNCHRONES', False))
+        self.taille_lot = int(app.config.get('COURRIELS_TAILLE_LOT', 50))
+        self.tentatives_max = int(app.config.get('COURRIELS_TENTATIVES_MAX', 5))
+        self.delai_reprise = float(app.config.get('COURRIELS_DELAI_REPRISE', 2.0))
+        self.inactivite = float(app.config.get('COURRIELS_INACTIVITE', 30.0))
+        self.timeout_smtp = float(app.config.get('COURRIELS_TIMEOUT_SMTP', 30.0))
+        self.debit_max = float(app.config.get('COURRIELS_DEBIT_MAX', 10))
+        self.scrutation = float(app.config.get('COURRIELS_SCRUTATION', 10.0))
+        app.extensions['courriels'] = self
+
+    def envoyer(self, destinataire, sujet, contenu_html, contenu_texte=None):
+        """Dépose un message dans la file en mémoire et rend la main immédiatement
+
+        En mode synchrone (tests), le message est envoyé dans le thread appelant,
+        tentatives comprises mais sans délai entre elles.
+        """
+        courriel = Courriel(destinataire, sujet, contenu_html, contenu_texte)
+        with self._verrou:
+            self._en_cours += 1
+
+        if self.synchrone:
+            self._envoyer_maintenant([courriel])
+            return
+
+        self._file.put(courriel)
+        self._demarrer()
+
+    def signaler(self):
+        """De nouveaux messages attendent en base : le thread d'envoi relit la source sans attendre
+
+        En mode synchrone, la source est vidée dans le thread appelant.
+        """
+        if self.synchrone:
+            while True:
+                lot = self._reserver(self.taille_lot)
+                if not lot:
+                    return
+                self._envoyer_maintenant(lot)
+
+        self._file.put(None)
+        self._demarrer()
+
+    def demarrer(self):
+        """Démarre le thread d'envoi (démarrage d'un worker) : les messages restés
+        en base sont repris sans attendre une nouvelle requête"""
+        if self.app is not None and not self.synchrone:
+            self._demarrer()
+
+    def _envoyer_maintenant(self, lot):
+        while lot:
+            lot = [r.courriel for r in self._traiter(lot, reprendre=False) if r.statut == STATUT_EN_ATTENTE]
+        self._fermer()
+
+    def _demarrer(self):
+        # Thread créé au premier message ou au démarrage du worker (post_fork) :
+        # jamais dans le processus maître avant le fork
+        with self._verrou:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._boucle, name='myxploit-courriels', daemon=True)
+            self._thread.start()
+        atexit.register(self.arreter)
+
+    def _boucle(self):
+        while True:
+            try:
+                lot = self._prochain_lot()
+                if lot:
+                    self._traiter(lot)
+                elif time.monotonic() - self._dernier_envoi >= self.inactivite:
+                    # Aucun message depuis COURRIELS_INACTIVITE secondes
+                    self._fermer()
+            except Exception as e:
+                # Le thread d'envoi ne doit jamais s'arrêter
+                logger.error(f"❌ Erreur dans le thread d'envoi des emails: {str(e)}")
+                self._fermer()
+
+    def _prochain_lot(self):
+        """Messages à envoyer maintenant : reprises échues, file en mémoire, puis source
+
+        Attend au plus jusqu'à la prochaine reprise, la prochaine lecture de la
+        source ou COURRIELS_INACTIVITE secondes ; retourne une liste vide si rien
+        n'est arrivé entre-temps.
+        """
+        # Débit limité : lots d'au plus une seconde d'envoi, pour que les statuts
+        # (progression des campagnes) soient enregistrés au fil de l'eau
+        taille_lot = self.taille_lot if self.debit_max <= 0 else max(1, min(self.taille_lot, int(self.debit_max)))
+        maintenant = time.monotonic()
+        lot = []
+        with self._verrou:
+            while self._reprises and self._reprises[0][0] <= maintenant and len(lot) < taille_lot:
+                lot.append(heapq.heappop(self._reprises)[2])
+            attente = self.inactivite
+            if self._reprises:
+                attente = min(attente, max(0.0, self._reprises[0][0] - maintenant))
+        if self.source is not None:
+            attente = min(attente, max(0.0, self._prochaine_scrutation - maintenant))
+
+        reveil = self._lire_file(lot, taille_lot, None if lot else attente)
+        if len(lot) < taille_lot and (reveil or time.monotonic() >= self._prochaine_scrutation):
+            lot.extend(self._reserver(taille_lot - len(lot)))
+        return lot
+
+    def _lire_file(self, lot, taille_lot, attente=None):
+        """Complète `lot` depuis la file en mémoire ; True si un réveil (`signaler`) y était
+
+        Avec `attente`, attend au plus `attente` secondes le premier élément.
+        """
+        reveil = False
+        while len(lot) < taille_lot:
+            try:
+                if attente is not None:
+                    element = self._file.get(timeout=attente)
+                    attente = None
+                else:
+                    element = self._file.get_nowait()
+            except queue.Empty:
+                break
+            if element is None:
+                reveil = True
+            else:
+                lot.append(element)
+        return reveil
+
+    def _reserver(self, limite):
+        """Messages réservés en base par la source (liste vide sans source ou en cas d'erreur)"""
+        if self.source is None:
+            return []
+        self._prochaine_scrutation = time.monotonic() + self.scrutation
+        try:
+            with self.app.app_context():
+                lot = self.source(limite)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de la lecture des emails à envoyer: {str(e)}")
+            return []
+        if len(lot) >= limite:
+            # Source probablement pas vide (campagne) : relue dès le lot suivant
+            self._prochaine_scrutation = 0.0
+        return lot
+
+    def _traiter(self, lot, reprendre=True):
+        """Envoie un lot sur la connexion courante ; retourne les `ResultatEnvoi`"""
+        resultats = []
+        for courriel in lot:
+            courriel.tentatives += 1
+            try:
+                self._expedier(courriel)
+                resultats.append(ResultatEnvoi(courriel, STATUT_SIMULE if self.simulation else STATUT_ENVOYE, None, None))
+            except Exception as e:
+                # Connexion dans un état inconnu : rouverte au message suivant
+                self._fermer()
+                if erreur_definitive(e) or courriel.tentatives >= self.tentatives_max:
+                    resultats.append(ResultatEnvoi(courriel, STATUT_ECHEC, str(e), None))
+                else:
+                    delai = self.delai_reprise * 2 ** (courriel.tentatives - 1)
+                    # Message venu de la base : tentative suivante reportée en base par le rappel
+                    if reprendre and courriel.invitation_id is None:
+                        self._reprogrammer(courriel, delai)
+                    resultats.append(ResultatEnvoi(courriel, STATUT_EN_ATTENTE, str(e), delai))
+        self._dernier_envoi = time.monotonic()
+
+        envoyes = sum(1 for r in resultats if r.statut in (STATUT_ENVOYE, STATUT_SIMULE))
+        echecs = [r for r in resultats if r.statut == STATUT_ECHEC]
+        reprises = len(resultats) - envoyes - len(echecs)
+        if echecs or reprises:
+            logger.warning(
+                f"⚠️ Lot de {len(lot)} email(s): {envoyes} envoyé(s), {reprises} à retenter, "
+                f"{len(echecs)} en échec ({echecs[0].erreur if echecs else resultats[-1].erreur})"
+            )
+        else:
+            logger.info(f"📧 Lot de {len(lot)} email(s) {'simulé' if self.simulation else 'envoyé'}(s)")
+
+        self._rapporter(resultats)
+        with self._verrou:
+            self._en_cours -= sum(
+                1 for r in resultats if r.courriel.invitation_id is None and r.statut != STATUT_EN_ATTENTE
+            )
+            self._termine.notify_all()
+        return resultats
+
+    def _reprogrammer(self, courriel, delai):
+        with self._verrou:
+            heapq.heappush(self._reprises, (time.monotonic() + delai, next(self._ordre), courriel))
+
+    def _expedier(self, courriel):
+        if self.simulation:
+            logger.info(f"📧 SIMULATION - Email à {courriel.destinataire}: {courriel.sujet}")
+            return
+
+        message = composer_message(
+            self.emetteur, courriel.destinataire, courriel.sujet, courriel.contenu_html, courriel.contenu_texte
+        )
+        self._limiter_debit()
+        self._connexion().sendmail(self.emetteur, [courriel.destinataire], message)
+
+    def _limiter_debit(self):
+        # Au plus COURRIELS_DEBIT_MAX envois par seconde (0 : sans limite)
+        if self.debit_max <= 0:
+            return
+        attente = self._prochain_envoi - time.monotonic()
+        if attente > 0:
+            time.sleep(attente)
+        self._prochain_envoi = max(self._prochain_envoi, time.monotonic() - 1 / self.debit_max) + 1 / self.debit_max
+
+    def _connexion(self):
+        if self._smtp is None:
+            import smtplib
+            smtp = smtplib.SMTP(self.serveur, self.port, timeout=self.timeout_smtp)
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                if self.mot_de_passe:
+                    smtp.login(self.emetteur, self.mot_de_passe)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+        return self._smtp
+
+    def _fermer(self):
+        if self._smtp is None:
+            return
+        smtp, self._smtp = self._smtp, None
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _rapporter(self, resultats):
+        if self.rappel is None or not resultats:
+            return
+        try:
+            with self.app.app_context():
+                self.rappel(resultats)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de l'enregistrement du statut des emails: {str(e)}")
+
+    def attendre(self, delai=None):
+        """Attend que chaque message accepté soit envoyé ou en échec ; False si le délai expire"""
+        with self._termine:
+            return self._termine.wait_for(lambda: self._en_cours == 0, timeout=delai)
+
+    def arreter(self, delai=10):
+        """Laisse au thread d'envoi `delai` secondes pour vider la file en mémoire (arrêt du worker)
+
+        Les invitations réservées et non envoyées restent en base, reprises par
+        un autre worker à l'expiration de leur réservation.
+        """
+        if self._thread is not None and self._thread.is_alive() and not self.attendre(delai):
+            logger.warning(f"⚠️ Arrêt avec {self._en_cours} email(s) non envoyé(s)")
+
+    def etat(self):
+        """Taille de la file et des reprises, pour /health"""
+        with self._verrou:
+            return {
+                'en_file': self._file.qsize(),
+                'a_retenter': len(self._reprises),
+                'en_cours': self._en_cours,
+                'connexion_ouverte': self._smtp is not None,
+                'source': self.source is not None,
+                'simulation': self.simulation
+            }
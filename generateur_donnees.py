@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Génération de données synthétiques pour les tests de charge
+
+Les transports sont produits un à un par un générateur (mémoire constante quel
+que soit leur nombre) puis écrits :
+
+- en base (--base, ou base configurée par défaut) par INSERT groupés, un lot
+  validé à la fois, avec leurs phases et la mise à jour des agrégats ;
+- ou en CSV (--csv, `-` pour la sortie standard) au format de
+  /import_transports_csv : colonnes `COLONNES_CSV`, énergie et véhicule
+  désignés par leur id (celui de la base --base si elle est donnée, sinon celui
+  du référentiel par défaut créé dans une base vide). Le format d'import n'a
+  pas de colonnes de phases : --phases est refusé avec --csv (sauf `0:100`).
+
+Échelle, graine et répartitions sont paramétrables ; une répartition s'écrit
+`valeur:poids,valeur:poids` (ex. `--energies gazole:70,gnv:20,electricite:10`).
+Avec la même graine et le même référentiel, les données générées sont identiques.
+
+    python generateur_donnees.py --transports 1000000 --base sqlite:////tmp/charge.db
+    python generateur_donnees.py --transports 200000 --phases 0:60,3:40 --clients 50 --calculer
+    python generateur_donnees.py --transports 5000000 --csv - | gzip > transports.csv.gz
+"""
+
+import argparse
+import bisect
+import contextlib
+import csv
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import delete, func, insert, select
+
+from agregats import cles_transport, DeltasAgregats
+from agregats_sql import appliquer_deltas_agregats
+from emissions_engine import calculer_emissions, calculer_emissions_phases
+from extensions import db
+from import_transports import COLONNES_CSV
+from models import Client, EmissionsAgregat, Energie, PhaseTransport, Transport, Transporteur, Vehicule
+from referentiel import charger_referentiel_emissions
+
+# Référentiel créé dans une base qui n'a encore ni énergie ni véhicule
+ENERGIES_DEFAUT = (
+    ('Gazole', 'gazole', 3.17), ('Essence', 'essence', 2.8), ('GNV', 'gnv', 2.2),
+    ('Électricité', 'electricite', 0.06), ('HVO', 'hvo', 0.5)
+)
+VEHICULES_DEFAUT = (
+    ('Porteur 19t', 28.0, 110.0), ('Semi-remorque 40t', 33.0, 85.0), ('VUL 3.5t', 11.0, 250.0),
+    ('Porteur 12t', 22.0, 140.0), ('Tracteur GNV', 35.0, 80.0), ('Fourgon électrique', 25.0, None)
+)
+
+REPARTITION_NIVEAUX = 'niveau_1:2,niveau_2:1,niveau_3:1,niveau_4:1'
+REPARTITION_TYPES = 'routier:2,messagerie:1'
+REPARTITION_PHASES = '0:1'
+TAILLE_LOT_DEFAUT = 10_000
+
+# Phases créées selon leur nombre, et part de la distance du transport parcourue par chacune
+TYPES_PHASES = {
+    1: ('traction',),
+    2: ('collecte', 'traction'),
+    3: ('collecte', 'traction', 'distribution'),
+}
+PART_DISTANCE_APPROCHE = (0.05, 0.15)
+
+VILLES = (
+    'Paris', 'Lyon', 'Marseille', 'Lille', 'Bordeaux', 'Toulouse', 'Nantes', 'Strasbourg',
+    'Rennes', 'Rouen', 'Montpellier', 'Dijon', 'Grenoble', 'Clermont-Ferrand', 'Metz'
+)
+
+
+class Repartition:
+    """Tirage pondéré d'une valeur parmi quelques-unes (poids cumulés, recherche dichotomique)"""
+
+    def __init__(self, ponderations):
+        ponderations = [(valeur, float(poids)) for valeur, poids in ponderations if float(poids) > 0]
+        if not ponderations:
+            raise ValueError('Répartition vide')
+        self.valeurs = [valeur for valeur, _ in ponderations]
+        self.cumuls = list(itertools.accumulate(poids for _, poids in ponderations))
+        self.total = self.cumuls[-1]
+
+    def tirer(self, aleatoire):
+        return self.valeurs[bisect.bisect_right(self.cumuls, aleatoire.random() * self.total)]
+
+
+def lire_repartition(texte):
+    """`'a:3,b:1'` -> `[('a', 3.0), ('b', 1.0)]` ; poids 1 si absent. ValueError si mal formée."""
+    ponderations = []
+    for element in texte.split(','):
+        element = element.strip()
+        if not element:
+            continue
+        valeur, _, poids = element.rpartition(':') if ':' in element else (element, '', '1')
+        try:
+            poids = float(poids)
+        except ValueError:
+            raise ValueError(f"Poids invalide dans la répartition: {element!r}")
+        if poids < 0:
+            raise ValueError(f"Poids négatif dans la répartition: {element!r}")
+        ponderations.append((valeur.strip(), poids))
+    if not ponderations:
+        raise ValueError(f"Répartition vide: {texte!r}")
+    return ponderations
+
+
+def lire_intervalle(texte):
+    """`'0.5-25'` -> `(0.5, 25.0)`"""
+    minimum, separateur, maximum = texte.partition('-')
+    try:
+        minimum, maximum = float(minimum), float(maximum if separateur else minimum)
+    except ValueError:
+        raise ValueError(f"Intervalle invalide: {texte!r} (attendu: min-max)")
+    if minimum < 0 or maximum < minimum:
+        raise ValueError(f"Intervalle invalide: {texte!r}")
+    return minimum, maximum
+
+
+def resoudre(ponderations, correspondances, nom):
+    """Remplace les valeurs d'une répartition (code, nom ou id) par l'id correspondant"""
+    resolues = []
+    for valeur, poids in ponderations:
+        if valeur not in correspondances:
+            raise ValueError(f"{nom} inconnu(e) dans le référentiel: {valeur!r}")
+        resolues.append((correspondances[valeur], poids))
+    return resolues
+
+
+class GenerateurTransports:
+    """Transports synthétiques reproductibles, produits un à un
+
+    `energies` et `vehicules` : répartitions d'ids du référentiel ; `clients` et
+    `transporteurs` : ids rattachés au hasard (aucun si liste vide).
+    """
+
+    def __init__(self, energies, vehicules, clients=(), transporteurs=(), graine=42, prefixe='GEN',
+                 premier_numero=1, niveaux=REPARTITION_NIVEAUX, types=REPARTITION_TYPES,
+                 phases=REPARTITION_PHASES, debut=date(2024, 1, 1), jours=730,
+                 poids=(0.5, 25.0), distance=(10.0, 1200.0), conso=(8.0, 40.0)):
+        self.energies = Repartition(energies)
+        self.vehicules = Repartition(vehicules)
+        self.clients = list(clients)
+        self.transporteurs = list(transporteurs)
+        self.graine = graine
+        self.prefixe = prefixe
+        self.premier_numero = premier_numero
+        self.niveaux = Repartition(lire_repartition(niveaux))
+        self.types = Repartition(lire_repartition(types))
+        self.phases = Repartition([(int(nombre), poids) for nombre, poids in lire_repartition(phases)])
+        inconnus = [nombre for nombre in self.phases.valeurs if nombre and nombre not in TYPES_PHASES]
+        if inconnus:
+            raise ValueError(f"Nombre de phases non pris en charge: {inconnus} (0 à {max(TYPES_PHASES)})")
+        self.origine = datetime.combine(debut, datetime.min.time())
+        self.minutes = max(int(jours), 1) * 24 * 60
+        self.poids = poids
+        self.distance = distance
+        self.conso = conso
+
+    def transports(self, nombre):
+        """`(valeurs, phases)` pour `nombre` transports : colonnes de `transports` et liste de phases"""
+        aleatoire = random.Random(self.graine)
+        for numero in range(self.premier_numero, self.premier_numero + nombre):
+            energie = self.energies.tirer(aleatoire)
+            vehicule = self.vehicules.tirer(aleatoire)
+            distance = round(aleatoire.uniform(*self.distance), 1)
+            created_at = self.origine + timedelta(minutes=aleatoire.randrange(self.minutes))
+            ref = f'{self.prefixe}-{numero:08d}'
+            valeurs = {
+                'ref': ref,
+                'type_transport': self.types.tirer(aleatoire),
+                'niveau_calcul': self.niveaux.tirer(aleatoire),
+                'type_vehicule': str(vehicule),
+                'energie': str(energie),
+                'energie_id': energie,
+                'vehicule_id': vehicule,
+                'conso_vehicule': round(aleatoire.uniform(*self.conso), 1),
+                'poids_tonnes': round(aleatoire.uniform(*self.poids), 2),
+                'distance_km': distance,
+                'emis_kg': 0.0,
+                'emis_tkm': 0.0,
+                'client_id': aleatoire.choice(self.clients) if self.clients else None,
+                'transporteur_id': aleatoire.choice(self.transporteurs) if self.transporteurs else None,
+                'created_at': created_at,
+            }
+            yield valeurs, self._phases(aleatoire, valeurs)
+
+    def _phases(self, aleatoire, transport):
+        nombre = self.phases.tirer(aleatoire)
+        if not nombre:
+            return []
+        types = TYPES_PHASES[nombre]
+        approches = {
+            type_phase: round(transport['distance_km'] * aleatoire.uniform(*PART_DISTANCE_APPROCHE), 1)
+            for type_phase in types if type_phase != 'traction'
+        }
+        villes = aleatoire.sample(VILLES, len(types) + 1)
+        phases = []
+        for ordre, type_phase in enumerate(types, start=1):
+            if type_phase == 'traction':
+                distance = round(max(transport['distance_km'] - sum(approches.values()), 1.0), 1)
+                vehicule = transport['vehicule_id']
+                energie = transport['energie']
+            else:
+                # Approche en véhicule plus léger, énergie éventuellement différente
+                distance = approches[type_phase]
+                vehicule = self.vehicules.tirer(aleatoire)
+                energie = str(self.energies.tirer(aleatoire))
+            phases.append({
+                'transport_ref': transport['ref'],
+                'ordre': ordre,
+                'type': type_phase,
+                'energie': energie,
+                'vehicule_id': vehicule,
+                'ville_depart': villes[ordre - 1],
+                'ville_arrivee': villes[ordre],
+                'consommation': None,
+                'distance_km': max(distance, 1.0),
+                'poids_tonnes': None,
+                'date': transport['created_at'].date(),
+                'emis_kg': 0.0,
+                'emis_tkm': 0.0,
+            })
+        return phases
+
+
+def lots(iterable, taille):
+    """Découpe un itérable en listes d'au plus `taille` éléments, sans le matérialiser"""
+    iterateur = iter(iterable)
+    while True:
+        lot = list(itertools.islice(iterateur, taille))
+        if not lot:
+            return
+        yield lot
+
+
+def ecrire_csv(generateur, nombre, sortie):
+    """Écrit `nombre` transports au format d'import CSV ; retourne le nombre de lignes"""
+    ecrivain = csv.writer(sortie, lineterminator='\n')
+    ecrivain.writerow(COLONNES_CSV)
+    lignes = 0
+    for valeurs, _ in generateur.transports(nombre):
+        ecrivain.writerow([valeurs[colonne] for colonne in COLONNES_CSV])
+        lignes += 1
+    return lignes
+
+
+def calculer(valeurs, phases, referentiel):
+    """Renseigne les émissions d'un transport généré (total des phases s'il en a)"""
+    if phases:
+        resultats, total = calculer_emissions_phases(
+            [SimpleNamespace(**phase) for phase in phases], referentiel, valeurs['poids_tonnes']
+        )
+        for phase, resultat in zip(phases, resultats):
+            if resultat['success']:
+                phase['emis_kg'], phase['emis_tkm'] = resultat['emis_kg'], resultat['emis_tkm']
+    else:
+        total = calculer_emissions(SimpleNamespace(**valeurs), referentiel)
+    if total['success']:
+        valeurs['emis_kg'], valeurs['emis_tkm'] = total['emis_kg'], total['emis_tkm']
+
+
+def inserer_en_base(generateur, nombre, taille_lot=TAILLE_LOT_DEFAUT, avec_calcul=False, progression=None):
+    """Insère `nombre` transports, leurs phases et leurs agrégats, un lot validé à la fois
+
+    Retourne `(transports, phases)` insérés. Une interruption laisse en base les
+    lots déjà validés : la génération suivante numérote après la dernière référence.
+    """
+    referentiel = charger_referentiel_emissions() if avec_calcul else None
+    transports = 0
+    phases_inserees = 0
+    for lot in lots(generateur.transports(nombre), taille_lot):
+        deltas = DeltasAgregats()
+        lignes_phases = []
+        for valeurs, phases in lot:
+            if avec_calcul:
+                calculer(valeurs, phases, referentiel)
+            deltas.ajouter(cles_transport(SimpleNamespace(**valeurs)), valeurs['emis_kg'])
+            lignes_phases.extend(phases)
+        db.session.execute(insert(Transport.__table__), [valeurs for valeurs, _ in lot])
+        if lignes_phases:
+            db.session.execute(insert(PhaseTransport.__table__), lignes_phases)
+        # INSERT groupé hors ORM : les agrégats sont mis à jour explicitement
+        appliquer_deltas_agregats(deltas)
+        db.session.commit()
+
+        transports += len(lot)
+        phases_inserees += len(lignes_phases)
+        if progression is not None:
+            progression(transports, nombre)
+    return transports, phases_inserees
+
+
+def vider_donnees(referentiel=False):
+    """Supprime transports, phases et agrégats (et le référentiel si demandé) ; ne valide pas"""
+    modeles = [PhaseTransport, EmissionsAgregat, Transport]
+    if referentiel:
+        modeles += [Energie, Vehicule]
+    for modele in modeles:
+        db.session.execute(delete(modele))
+
+
+def preparer_referentiel(creer=True):
+    """Énergies et véhicules de la base, créés depuis le référentiel par défaut si elle n'en a pas
+
+    Retourne `(energies, vehicules)` : dictionnaires code, nom ou id (texte) -> id,
+    vides si la base n'en a pas et que `creer` est faux.
+    """
+    energies = db.session.scalars(select(Energie).order_by(Energie.id)).all()
+    if not energies and creer:
+        energies = [Energie(nom=nom, identifiant=code, unite='L', facteur=facteur) for nom, code, facteur in ENERGIES_DEFAUT]
+        db.session.add_all(energies)
+    vehicules = db.session.scalars(select(Vehicule).order_by(Vehicule.id)).all()
+    if not vehicules and creer:
+        vehicules = [Vehicule(nom=nom, consommation=conso, emissions=emissions) for nom, conso, emissions in VEHICULES_DEFAUT]
+        db.session.add_all(vehicules)
+    db.session.commit()
+
+    codes_energies = {str(e.id): e.id for e in energies}
+    codes_energies.update({e.identifiant: e.id for e in energies if e.identifiant})
+    codes_vehicules = {str(v.id): v.id for v in vehicules}
+    codes_vehicules.update({v.nom: v.id for v in vehicules})
+    return codes_energies, codes_vehicules
+
+
+def referentiel_hors_base():
+    """Codes du référentiel par défaut, avec les ids qu'il reçoit dans une base vide"""
+    energies = {}
+    for identifiant, (_, code, _) in enumerate(ENERGIES_DEFAUT, start=1):
+        energies[str(identifiant)] = energies[code] = identifiant
+    vehicules = {}
+    for identifiant, (nom, _, _) in enumerate(VEHICULES_DEFAUT, start=1):
+        vehicules[str(identifiant)] = vehicules[nom] = identifiant
+    return energies, vehicules
+
+
+def preparer_partenaires(modele, nombre, prefixe, libelle):
+    """Ids de `nombre` clients ou transporteurs synthétiques, créés s'ils n'existent pas"""
+    if nombre <= 0:
+        return []
+    emails = [f'{prefixe.lower()}-{libelle}-{i:05d}@exemple.test' for i in range(1, nombre + 1)]
+    existants = set(db.session.scalars(select(modele.email).where(modele.email.in_(emails))))
+    manquants = [
+        {'nom': f'{libelle.capitalize()} {prefixe} {i}', 'email': email, 'statut': 'actif'}
+        for i, email in enumerate(emails, start=1) if email not in existants
+    ]
+    if manquants:
+        db.session.execute(insert(modele.__table__), manquants)
+        db.session.commit()
+    return list(db.session.scalars(select(modele.id).where(modele.email.in_(emails)).order_by(modele.id)))
+
+
+def dernier_numero(prefixe):
+    """Plus grand numéro des références `<prefixe>-NNNNNNNN` déjà en base (0 si aucune)"""
+    derniere = db.session.scalar(select(func.max(Transport.ref)).where(Transport.ref.like(f'{prefixe}-%')))
+    if not derniere:
+        return 0
+    try:
+        return int(derniere.rsplit('-', 1)[1])
+    except ValueError:
+        return 0
+
+
+def creer_application(url=None):
+    """Application sur la base `url` (par défaut, celle de la configuration)"""
+    if url:
+        # DATABASE_URL l'emporte sur la configuration : la base demandée aussi
+        os.environ['DATABASE_URL'] = url
+    from app import create_app
+    return create_app()
+
+
+def _arguments(arguments=None):
+    parseur = argparse.ArgumentParser(description="Génération de transports synthétiques pour les tests de charge")
+    parseur.add_argument('--transports', type=int, default=1000, help="nombre de transports (défaut: 1000)")
+    parseur.add_argument('--base', help="URL SQLAlchemy de la base à remplir (défaut: base configurée)")
+    parseur.add_argument('--csv', metavar='FICHIER', help="écrit un CSV d'import au lieu de remplir la base ('-' : sortie standard)")
+    parseur.add_argument('--graine', type=int, default=42)
+    parseur.add_argument('--prefixe', default='GEN', help="préfixe des références (défaut: GEN)")
+    parseur.add_argument('--clients', type=int, default=0, help="clients synthétiques rattachés aux transports")
+    parseur.add_argument('--transporteurs', type=int, default=0, help="transporteurs synthétiques rattachés aux transports")
+    parseur.add_argument('--energies', help="répartition des énergies par code ou id (défaut: uniforme)")
+    parseur.add_argument('--vehicules', help="répartition des véhicules par nom ou id (défaut: uniforme)")
+    parseur.add_argument('--niveaux', default=REPARTITION_NIVEAUX, help=f"répartition des niveaux de calcul (défaut: {REPARTITION_NIVEAUX})")
+    parseur.add_argument('--types', default=REPARTITION_TYPES, help=f"répartition des types de transport (défaut: {REPARTITION_TYPES})")
+    parseur.add_argument('--phases', default=REPARTITION_PHASES, help="répartition du nombre de phases, 0 à 3 (ex. 0:70,3:30 ; défaut: aucune)")
+    parseur.add_argument('--debut', type=date.fromisoformat, default=date(2024, 1, 1), help="première date de création (défaut: 2024-01-01)")
+    parseur.add_argument('--jours', type=int, default=730, help="étendue des dates de création en jours (défaut: 730)")
+    parseur.add_argument('--poids', type=lire_intervalle, default=(0.5, 25.0), help="poids en tonnes, min-max (défaut: 0.5-25)")
+    parseur.add_argument('--distance', type=lire_intervalle, default=(10.0, 1200.0), help="distance en km, min-max (défaut: 10-1200)")
+    parseur.add_argument('--taille-lot', type=int, default=TAILLE_LOT_DEFAUT, help=f"transports par INSERT groupé (défaut: {TAILLE_LOT_DEFAUT})")
+    parseur.add_argument('--calculer', action='store_true', help="calcule les émissions avant insertion (sinon 0, à recalculer)")
+    parseur.add_argument('--vider', action='store_true', help="supprime d'abord transports, phases et agrégats de la base")
+    args = parseur.parse_args(arguments)
+    if args.csv and _avec_phases(args.phases):
+        parseur.error("--phases ne s'applique pas à --csv : le CSV d'import ne contient pas de phases (seul 0:100 est accepté)")
+    return args
+
+
+def _avec_phases(repartition):
+    """Vrai si la répartition tire des transports avec phases (répartition mal formée : signalée plus tard)"""
+    try:
+        return any(poids > 0 and int(nombre) != 0 for nombre, poids in lire_repartition(repartition))
+    except ValueError:
+        return False
+
+
+def _uniforme(codes):
+    return [(identifiant, 1) for identifiant in sorted(set(codes.values()))]
+
+
+def _generateur(args, vers_csv, avec_base):
+    """Générateur configuré par les arguments ; prépare la base en mode insertion"""
+    energies = vehicules = None
+    if avec_base:
+        if args.vider and not vers_csv:
+            vider_donnees()
+            db.session.commit()
+        # Un CSV ne modifie pas la base : référentiel lu tel quel
+        energies, vehicules = preparer_referentiel(creer=not vers_csv)
+    if not energies or not vehicules:
+        energies, vehicules = referentiel_hors_base()
+
+    premier_numero = 1
+    clients = transporteurs = []
+    if not vers_csv:
+        premier_numero = dernier_numero(args.prefixe) + 1
+        clients = preparer_partenaires(Client, args.clients, args.prefixe, 'client')
+        transporteurs = preparer_partenaires(Transporteur, args.transporteurs, args.prefixe, 'transporteur')
+
+    return GenerateurTransports(
+        resoudre(lire_repartition(args.energies), energies, 'Énergie') if args.energies else _uniforme(energies),
+        resoudre(lire_repartition(args.vehicules), vehicules, 'Véhicule') if args.vehicules else _uniforme(vehicules),
+        clients=clients, transporteurs=transporteurs, graine=args.graine, prefixe=args.prefixe,
+        premier_numero=premier_numero, niveaux=args.niveaux, types=args.types, phases=args.phases,
+        debut=args.debut, jours=args.jours, poids=args.poids, distance=args.distance
+    )
+
+
+def main(arguments=None):
+    args = _arguments(arguments)
+    vers_csv = args.csv is not None
+    # Sur la sortie standard, les messages ne doivent pas se mêler au CSV
+    messages = sys.stderr if args.csv == '-' else sys.stdout
+
+    application = None
+    if args.base or not vers_csv:
+        # Messages affichés au chargement de l'application : hors du CSV
+        with contextlib.redirect_stdout(messages):
+            application = creer_application(args.base)
+    contexte = application.app_context() if application else None
+    if contexte:
+        contexte.push()
+    try:
+        try:
+            generateur = _generateur(args, vers_csv, application is not None)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 2
+
+        debut = time.perf_counter()
+        if vers_csv:
+            if args.csv == '-':
+                lignes = ecrire_csv(generateur, args.transports, sys.stdout)
+            else:
+                with open(args.csv, 'w', encoding='utf-8', newline='') as fichier:
+                    lignes = ecrire_csv(generateur, args.transports, fichier)
+            print(f"✅ {lignes} transports écrits en {time.perf_counter() - debut:.1f}s", file=messages)
+            return 0
+
+        def progression(faits, total):
+            if faits == total or faits % (args.taille_lot * 10) == 0:
+                duree = time.perf_counter() - debut
+                print(f"   {faits}/{total} transports ({faits / duree:.0f}/s)", file=messages)
+
+        print(f"🌱 Génération de {args.transports} transports ({args.prefixe}-{generateur.premier_numero:08d}...)", file=messages)
+        transports, phases = inserer_en_base(
+            generateur, args.transports, args.taille_lot, avec_calcul=args.calculer, progression=progression
+        )
+        print(f"✅ {transports} transports et {phases} phases insérés en {time.perf_counter() - debut:.1f}s", file=messages)
+        return 0
+    finally:
+        if contexte:
+            contexte.pop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Configuration gunicorn, chargée automatiquement depuis le répertoire de lancement
+
+`gunicorn --bind 0.0.0.0:$PORT wsgi:app` (Procfile, render.yaml) la prend en
+compte sans option supplémentaire. Chaque réglage peut être surchargé par une
+variable d'environnement (voir DEPLOIEMENT.md).
+"""
+
+import os
+
+
+def _entier(nom, defaut):
+    return int(os.environ.get(nom) or defaut)
+
+
+def _processeurs_disponibles():
+    # Processeurs réellement attribués au conteneur quand le système le permet
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Workers : 2 x processeurs + 1, plafonnés (mémoire des petites instances).
+# WEB_CONCURRENCY, fixé par l'hébergeur ou à la main, l'emporte
+workers = _entier('WEB_CONCURRENCY', min(2 * _processeurs_disponibles() + 1, _entier('GUNICORN_WORKERS_MAX', 4)))
+# Lu par config.options_moteur pour répartir DB_CONNEXIONS_MAX entre les workers
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+# Threads par worker : les requêtes attendent surtout la base et le SMTP,
+# un envoi d'email lent n'immobilise plus qu'un thread
+worker_class = 'gthread'
+threads = _entier('GUNICORN_THREADS', 4)
+
+# Délais (secondes) : les traitements longs passent par la file de tâches
+timeout = _entier('GUNICORN_TIMEOUT', 120)
+graceful_timeout = _entier('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _entier('GUNICORN_KEEPALIVE', 5)
+
+# Recyclage des workers pour borner la croissance mémoire, décalé d'un worker à l'autre
+max_requests = _entier('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _entier('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# Application chargée une fois dans le maître puis partagée par fork.
+# create_app ne garde aucune connexion ouverte (moteur libéré après la
+# vérification du schéma) : chaque worker ouvre son propre pool
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Par précaution : un moteur éventuellement utilisé dans le maître après
+    # create_app ne doit pas partager ses sockets avec les workers
+    from wsgi import app
+    from extensions import db, file_courriels, gestionnaire_jobs
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+        # Tâches du worker précédent (recyclé ou tué) : passées en échec, les
+        # clients qui interrogent /api/jobs/<id> cessent d'attendre
+        try:
+            gestionnaire_jobs.recuperer_taches_abandonnees()
+        except Exception as e:
+            server.log.warning(f"Tâches abandonnées non vérifiées: {e}")
+
+    # Invitations en attente en base (worker précédent recyclé ou tué) :
+    # reprises dès le démarrage du worker
+    file_courriels.demarrer()
+
+
+def worker_exit(server, worker):
+    # Emails encore en file mémoire (recyclage ou arrêt du worker) : quelques
+    # secondes pour les expédier. Les invitations non envoyées restent en base
+    from extensions import file_courriels, metriques
+
+    # Dernières mesures du worker, lues par /metrics jusqu'à METRIQUES_RETENTION
+    metriques.publier()
+
+    file_courriels.arreter(delai=min(10, graceful_timeout))
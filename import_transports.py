@@ -0,0 +1,96 @@
+"""
+Lecture en continu des fichiers CSV d'import de transports
+
+Le fichier est décodé au fil de l'eau et découpé en lots : la mémoire utilisée
+ne dépend que de la taille d'un lot, pas de celle du fichier.
+"""
+
+import csv
+import io
+
+# Colonnes attendues par /import_transports_csv
+COLONNES_CSV = [
+    'ref', 'type_transport', 'niveau_calcul', 'type_vehicule', 'energie',
+    'conso_vehicule', 'poids_tonnes', 'distance_km'
+]
+COLONNES_OBLIGATOIRES = ['ref', 'type_transport', 'niveau_calcul']
+
+# Nombre de lignes validées, dédoublonnées et insérées ensemble
+TAILLE_LOT_IMPORT = 5000
+# Nombre maximal de résultats détaillés conservés (les compteurs restent exacts)
+MAX_RESULTATS_DETAILLES = 1000
+
+
+def lire_lots(flux_binaire, taille_lot=TAILLE_LOT_IMPORT, encodage='utf-8'):
+    """Itère sur le CSV par lots de lignes
+
+    Produit des couples `(lignes, octets_lus)` où `lignes` est une liste de
+    dictionnaires `csv.DictReader` et `octets_lus` la position atteinte dans le
+    flux binaire (pour le suivi de progression).
+    """
+    texte = io.TextIOWrapper(flux_binaire, encoding=encodage, newline='')
+    lecteur = csv.DictReader(texte)
+    lot = []
+    for ligne in lecteur:
+        lot.append(ligne)
+        if len(lot) >= taille_lot:
+            yield lot, flux_binaire.tell()
+            lot = []
+    if lot:
+        yield lot, flux_binaire.tell()
+    # Ne pas fermer le flux de l'appelant avec le wrapper
+    texte.detach()
+
+
+def ligne_complete(ligne):
+    """Vérifie la présence des données obligatoires"""
+    return all(ligne.get(colonne) for colonne in COLONNES_OBLIGATOIRES)
+
+
+def _nombre(valeur):
+    return float(valeur) if valeur else None
+
+
+def convertir_ligne(ligne):
+    """Convertit une ligne CSV en valeurs d'insertion (ValueError si invalide)"""
+    return {
+        'ref': ligne['ref'],
+        'type_transport': ligne['type_transport'],
+        'niveau_calcul': ligne['niveau_calcul'],
+        'type_vehicule': ligne.get('type_vehicule'),
+        'energie': ligne.get('energie'),
+        'conso_vehicule': _nombre(ligne.get('conso_vehicule')),
+        'poids_tonnes': _nombre(ligne.get('poids_tonnes')),
+        'distance_km': _nombre(ligne.get('distance_km'))
+    }
+
+
+class ResultatsImport:
+    """Compteurs d'un import et détail des premières lignes traitées
+
+    Au plus `max_details` succès et `max_details` erreurs sont détaillés.
+    """
+
+    def __init__(self, max_details=MAX_RESULTATS_DETAILLES):
+        self.max_details = max_details
+        self.transports_crees = 0
+        self.erreurs = 0
+        self.details = []
+        self.tronques = False
+        self._erreurs_detaillees = 0
+
+    def succes(self, ref):
+        self.transports_crees += 1
+        if len(self.details) < self.max_details:
+            self.details.append({'ref': ref, 'success': True})
+        else:
+            self.tronques = True
+
+    def erreur(self, ref, message):
+        # Les erreurs sont conservées en priorité : ce sont elles qu'il faut corriger
+        self.erreurs += 1
+        if self._erreurs_detaillees < self.max_details:
+            self._erreurs_detaillees += 1
+            self.details.append({'ref': ref, 'error': message})
+        else:
+            self.tronques = True
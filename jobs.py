@@ -0,0 +1,311 @@
+"""
+File de tâches en arrière-plan
+
+Les traitements longs (recalcul des émissions, imports CSV) sont exécutés par
+un pool de threads local au processus. Chaque tâche est persistée dans la
+table `jobs` : n'importe quel worker peut donc répondre à `/api/jobs/<id>`.
+
+Une tâche enregistre le processus qui l'exécute (`proprietaire`, `hôte:pid`) ;
+ce processus renouvelle `updated_at` toutes les JOBS_BATTEMENT secondes. Au
+démarrage d'un worker, les tâches dont le processus a disparu (worker recyclé
+ou tué pendant la tâche) ou dont le dernier battement date de plus de
+JOBS_DELAI_ABANDON secondes passent en échec : les clients cessent d'attendre.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+logger = logging.getLogger(__name__)
+
+STATUT_EN_ATTENTE = 'en_attente'
+STATUT_EN_COURS = 'en_cours'
+STATUT_TERMINE = 'termine'
+STATUT_ECHEC = 'echec'
+STATUTS_ACTIFS = (STATUT_EN_ATTENTE, STATUT_EN_COURS)
+
+# Intervalle minimal (secondes) entre deux écritures de progression en base
+INTERVALLE_PROGRESSION = 1.0
+
+
+class GestionnaireJobs:
+    """Soumission, exécution et suivi des tâches en arrière-plan"""
+
+    def __init__(self, app=None, db=None, modele=None):
+        self._taches = {}
+        self._progressions = {}
+        self._verrou = threading.Lock()
+        self._executor = None
+        # Tâches soumises par ce processus et pas encore terminées
+        self._actives = set()
+        if app is not None:
+            self.init_app(app, db, modele)
+
+    def init_app(self, app, db, modele):
+        self.app = app
+        self.db = db
+        self.modele = modele
+        self.nombre_workers = int(app.config.get('JOBS_WORKERS', 2))
+        self.synchrone = bool(app.config.get('JOBS_SYNCHRONES', False))
+        self.battement = float(app.config.get('JOBS_BATTEMENT', 30.0))
+        self.delai_abandon = float(app.config.get('JOBS_DELAI_ABANDON', 600.0))
+        app.extensions['jobs'] = self
+
+    def tache(self, type_job):
+        """Décorateur enregistrant la fonction qui exécute un type de tâche
+
+        La fonction reçoit `(parametres, progression)` et retourne un
+        dictionnaire JSON stocké comme résultat de la tâche.
+        """
+        def decorateur(fonction):
+            self._taches[type_job] = fonction
+            return fonction
+        return decorateur
+
+    def _pool(self):
+        # Création paresseuse : le pool ne doit pas exister avant le fork des workers
+        with self._verrou:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.nombre_workers,
+                    thread_name_prefix='myxploit-job'
+                )
+                threading.Thread(target=self._battre, name='myxploit-job-battement', daemon=True).start()
+            return self._executor
+
+    def _battre(self):
+        """Renouvelle `updated_at` des tâches du processus (battement lu par `recuperer_taches_abandonnees`)"""
+        table = self.modele.__table__
+        while True:
+            time.sleep(self.battement)
+            with self._verrou:
+                actives = list(self._actives)
+            # SQLite n'accepte qu'un écrivain à la fois : le processus propriétaire
+            # (même hôte) suffit à reconnaître une tâche abandonnée
+            if not actives or self.db.engine.dialect.name == 'sqlite':
+                continue
+            try:
+                with self.db.engine.begin() as conn:
+                    conn.execute(
+                        table.update()
+                        .where(table.c.id.in_(actives), table.c.statut.in_(STATUTS_ACTIFS))
+                        .values(updated_at=datetime.utcnow())
+                    )
+            except Exception as e:
+                logger.warning(f"⚠️ Battement des tâches non enregistré: {str(e)}")
+
+    def recuperer_taches_abandonnees(self):
+        """Passe en échec les tâches en attente ou en cours dont le processus a disparu
+
+        Processus sur le même hôte : tâche abandonnée si le pid n'existe plus.
+        Autre hôte (conteneur remplacé) ou propriétaire inconnu : si le dernier
+        battement date de plus de JOBS_DELAI_ABANDON secondes. Retourne le
+        nombre de tâches passées en échec.
+        """
+        table = self.modele.__table__
+        maintenant = datetime.utcnow()
+        limite = maintenant - timedelta(seconds=self.delai_abandon)
+        hote = socket.gethostname()
+        with self.db.engine.begin() as conn:
+            taches = conn.execute(
+                select(table.c.id, table.c.type, table.c.proprietaire, table.c.updated_at)
+                .where(table.c.statut.in_(STATUTS_ACTIFS))
+            ).all()
+            abandonnees = [tache for tache in taches if _abandonnee(tache, hote, limite)]
+            for tache in abandonnees:
+                conn.execute(
+                    table.update()
+                    .where(table.c.id == tache.id, table.c.statut.in_(STATUTS_ACTIFS))
+                    .values(
+                        statut=STATUT_ECHEC,
+                        erreur=f"Tâche interrompue : le processus {tache.proprietaire or 'inconnu'} "
+                               f"s'est arrêté avant la fin (worker recyclé ou redémarré), relancer la tâche",
+                        finished_at=maintenant,
+                        updated_at=maintenant
+                    )
+                )
+        for tache in abandonnees:
+            logger.warning(f"⚠️ Tâche {tache.type} ({tache.id}) abandonnée par {tache.proprietaire or 'un processus inconnu'} - passée en échec")
+        return len(abandonnees)
+
+    def soumettre(self, type_job, parametres=None):
+        """Enregistre une tâche et la confie au pool ; retourne son identifiant"""
+        if type_job not in self._taches:
+            raise ValueError(f'Type de tâche inconnu: {type_job}')
+
+        job = self.modele(
+            id=uuid.uuid4().hex,
+            type=type_job,
+            statut=STATUT_EN_ATTENTE,
+            parametres=parametres or {},
+            proprietaire=proprietaire_courant()
+        )
+        self.db.session.add(job)
+        self.db.session.commit()
+        job_id = job.id
+        with self._verrou:
+            self._actives.add(job_id)
+
+        logger.info(f"📋 Tâche {type_job} soumise: {job_id}")
+
+        if self.synchrone:
+            self._executer(job_id)
+        else:
+            self._pool().submit(self._executer, job_id)
+        return job_id
+
+    def _executer(self, job_id):
+        with self.app.app_context():
+            session = self.db.session
+            job = session.get(self.modele, job_id)
+            if job is None:
+                logger.error(f"❌ Tâche introuvable: {job_id}")
+                with self._verrou:
+                    self._actives.discard(job_id)
+                return
+
+            job.statut = STATUT_EN_COURS
+            job.proprietaire = proprietaire_courant()
+            job.started_at = job.updated_at = datetime.utcnow()
+            parametres = dict(job.parametres or {})
+            type_job = job.type
+            session.commit()
+
+            progression = Progression(self, job_id)
+            debut = time.perf_counter()
+            try:
+                resultat = self._taches[type_job](parametres, progression)
+                logger.info(f"✅ Tâche {type_job} ({job_id}) terminée en {time.perf_counter() - debut:.1f}s")
+                self._terminer(job_id, STATUT_TERMINE, resultat=resultat)
+            except Exception as e:
+                session.rollback()
+                logger.error(f"❌ Tâche {type_job} ({job_id}) en échec: {str(e)}")
+                try:
+                    self._terminer(job_id, STATUT_ECHEC, erreur=str(e))
+                except Exception as statut_error:
+                    session.rollback()
+                    logger.error(f"❌ Impossible d'enregistrer l'échec de la tâche {job_id}: {str(statut_error)}")
+            finally:
+                with self._verrou:
+                    self._progressions.pop(job_id, None)
+                    self._actives.discard(job_id)
+
+    def _terminer(self, job_id, statut, resultat=None, erreur=None):
+        session = self.db.session
+        job = session.get(self.modele, job_id)
+        job.statut = statut
+        job.resultat = resultat
+        job.erreur = erreur
+        job.finished_at = datetime.utcnow()
+        with self._verrou:
+            en_memoire = self._progressions.get(job_id)
+        if en_memoire:
+            job.traites = en_memoire['traites']
+            job.total = en_memoire['total']
+        if statut == STATUT_TERMINE:
+            job.progression = 100
+            if job.total is not None:
+                job.traites = job.total
+        session.commit()
+
+    def _enregistrer_progression(self, job_id, traites, total, persister):
+        pourcentage = int(traites * 100 / total) if total else 0
+        with self._verrou:
+            self._progressions[job_id] = {
+                'traites': traites,
+                'total': total,
+                'progression': min(pourcentage, 99)
+            }
+        if not persister:
+            return
+        # Connexion séparée : la transaction de travail de la tâche n'est pas validée.
+        # SQLite n'accepte qu'un écrivain à la fois, la progression y reste en mémoire.
+        if self.db.engine.dialect.name == 'sqlite':
+            return
+        try:
+            table = self.modele.__table__
+            with self.db.engine.begin() as conn:
+                conn.execute(
+                    table.update()
+                    .where(table.c.id == job_id)
+                    .values(traites=traites, total=total, progression=min(pourcentage, 99), updated_at=datetime.utcnow())
+                )
+        except Exception as e:
+            logger.warning(f"⚠️ Progression de la tâche {job_id} non enregistrée: {str(e)}")
+
+    def etat(self, job_id):
+        """Retourne l'état sérialisable d'une tâche, ou None si elle n'existe pas"""
+        job = self.db.session.get(self.modele, job_id)
+        if job is None:
+            return None
+
+        etat = {
+            'id': job.id,
+            'type': job.type,
+            'statut': job.statut,
+            'progression': job.progression or 0,
+            'traites': job.traites or 0,
+            'total': job.total,
+            'parametres': job.parametres,
+            'resultat': job.resultat,
+            'erreur': job.erreur,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None
+        }
+
+        # Progression plus récente si la tâche tourne dans ce processus
+        if job.statut == STATUT_EN_COURS:
+            with self._verrou:
+                en_memoire = self._progressions.get(job_id)
+            if en_memoire:
+                etat.update(en_memoire)
+        return etat
+
+
+def proprietaire_courant():
+    """Identifiant `hôte:pid` du processus courant (différent dans chaque worker forké)"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _processus_actif(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _abandonnee(tache, hote, limite):
+    hote_tache, _, pid = (tache.proprietaire or '').rpartition(':')
+    if hote_tache == hote and pid.isdigit():
+        return int(pid) != os.getpid() and not _processus_actif(int(pid))
+    return tache.updated_at is None or tache.updated_at < limite
+
+
+class Progression:
+    """Rappel de progression transmis aux tâches : `progression(traites, total)`"""
+
+    def __init__(self, gestionnaire, job_id):
+        self.gestionnaire = gestionnaire
+        self.job_id = job_id
+        self.total = None
+        self._derniere_ecriture = 0.0
+
+    def __call__(self, traites, total=None):
+        if total is not None:
+            self.total = total
+        maintenant = time.monotonic()
+        persister = maintenant - self._derniere_ecriture >= INTERVALLE_PROGRESSION
+        if persister:
+            self._derniere_ecriture = maintenant
+        self.gestionnaire._enregistrer_progression(self.job_id, traites, self.total, persister)
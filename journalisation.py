@@ -0,0 +1,180 @@
+"""
+Journalisation asynchrone et structurée
+
+Les loggers de l'application déposent leurs enregistrements dans une file en
+mémoire (QueueHandler) ; un thread (QueueListener) les écrit sur la console et
+dans LOG_FILE. Une requête ou un recalcul n'attend donc jamais l'écriture
+disque. Format `json` : un objet par ligne, champs passés par `extra=` inclus.
+
+La rotation par taille n'est faite que par un processus seul : quand plusieurs
+workers écrivent dans le même fichier, chacun ferait sa propre rotation et
+écraserait les fichiers des autres. Le fichier est alors rouvert après une
+rotation externe (logrotate).
+
+Les boucles de traitement (un événement par transport) ne journalisent pas
+chaque élément : elles agrègent leurs événements dans un `ResumeJournal` et
+écrivent une ligne de synthèse à la fin.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from collections import Counter
+from datetime import datetime, timezone
+
+FORMAT_TEXTE = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributs présents sur tout LogRecord : les autres viennent de `extra=`
+ATTRIBUTS_STANDARD = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+# Gestionnaire posé sur le logger racine et thread d'écriture du processus
+_gestionnaire = None
+_ecouteur = None
+
+
+class FormateurJSON(logging.Formatter):
+    """Un objet JSON par enregistrement : horodatage UTC, niveau, logger, message, champs `extra`"""
+
+    def format(self, record):
+        donnees = {
+            'horodatage': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'niveau': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'processus': record.process,
+        }
+        for cle, valeur in record.__dict__.items():
+            if cle not in ATTRIBUTS_STANDARD:
+                donnees[cle] = valeur
+        if record.exc_text:
+            donnees['exception'] = record.exc_text
+        return json.dumps(donnees, ensure_ascii=False, default=str)
+
+
+class GestionnaireFile(logging.handlers.QueueHandler):
+    """QueueHandler qui conserve la trace d'exception à part du message (champ `exception` en JSON)"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        # Message déjà formaté : arguments et traceback ne traversent pas la file
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def _destinations(niveau, fichier, format_journal, taille_max, sauvegardes, processus_multiples):
+    formateur = FormateurJSON() if format_journal == 'json' else logging.Formatter(FORMAT_TEXTE)
+    destinations = [logging.StreamHandler()]
+    if fichier:
+        if taille_max > 0 and not processus_multiples:
+            destinations.append(logging.handlers.RotatingFileHandler(
+                fichier, maxBytes=taille_max, backupCount=sauvegardes, encoding='utf-8'
+            ))
+        else:
+            # Rotation externe (logrotate) : fichier rouvert quand il est déplacé
+            destinations.append(logging.handlers.WatchedFileHandler(fichier, encoding='utf-8'))
+    for destination in destinations:
+        destination.setFormatter(formateur)
+        destination.setLevel(niveau)
+    return destinations
+
+
+def configurer_journalisation(niveau='INFO', fichier='emissions.log', format_journal='json', taille_max=10_000_000, sauvegardes=5,
+                              processus_multiples=False):
+    """Remplace les gestionnaires du logger racine par la file et démarre le thread d'écriture
+
+    `fichier` vide : console seulement. `taille_max` (octets) > 0 : rotation
+    avec `sauvegardes` fichiers conservés ; 0 ou `processus_multiples`
+    (plusieurs workers écrivent dans `fichier`) : rotation externe. Un nouvel
+    appel remplace la configuration précédente.
+    """
+    global _gestionnaire, _ecouteur
+    arreter_journalisation()
+
+    racine = logging.getLogger()
+    for ancien in list(racine.handlers):
+        racine.removeHandler(ancien)
+        ancien.close()
+
+    niveau = logging.getLevelName(str(niveau).upper()) if isinstance(niveau, str) else niveau
+    _gestionnaire = GestionnaireFile(queue.SimpleQueue())
+    racine.addHandler(_gestionnaire)
+    racine.setLevel(niveau)
+    _ecouteur = logging.handlers.QueueListener(
+        _gestionnaire.queue, *_destinations(niveau, fichier, format_journal, taille_max, sauvegardes, processus_multiples),
+        respect_handler_level=True
+    )
+    _ecouteur.start()
+
+
+def arreter_journalisation():
+    """Écrit les enregistrements encore en file puis arrête le thread d'écriture"""
+    global _ecouteur
+    if _ecouteur is not None:
+        ecouteur, _ecouteur = _ecouteur, None
+        ecouteur.stop()
+
+
+def _apres_fork():
+    # Le thread d'écriture n'existe pas dans un worker forké (gunicorn
+    # preload_app) : nouvelle file et nouveau thread sur les mêmes destinations
+    global _ecouteur
+    if _ecouteur is None:
+        return
+    _gestionnaire.queue = queue.SimpleQueue()
+    _ecouteur = logging.handlers.QueueListener(_gestionnaire.queue, *_ecouteur.handlers, respect_handler_level=True)
+    _ecouteur.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_apres_fork)
+atexit.register(arreter_journalisation)
+
+
+class ResumeJournal:
+    """Compte les événements répétés d'une boucle, avec quelques exemples par événement
+
+    Remplace une ligne de journal par élément traité par une synthèse écrite
+    en fin de boucle (`texte()` pour le message, `detail()` pour `extra=`).
+    """
+
+    def __init__(self, exemples=3):
+        self.compteurs = Counter()
+        self.exemples = {}
+        self.max_exemples = exemples
+
+    def compter(self, evenement, exemple=None):
+        self.compteurs[evenement] += 1
+        if exemple is not None:
+            liste = self.exemples.setdefault(evenement, [])
+            if len(liste) < self.max_exemples:
+                liste.append(exemple)
+
+    def __bool__(self):
+        return bool(self.compteurs)
+
+    def detail(self):
+        """`{événement: {'nombre': n, 'exemples': [...]}}`, du plus fréquent au plus rare"""
+        return {
+            evenement: {'nombre': nombre, 'exemples': self.exemples.get(evenement, [])}
+            for evenement, nombre in self.compteurs.most_common()
+        }
+
+    def texte(self, limite=5):
+        """Synthèse lisible des `limite` événements les plus fréquents"""
+        parties = []
+        for evenement, nombre in self.compteurs.most_common(limite):
+            exemples = self.exemples.get(evenement)
+            parties.append(f"{evenement} x{nombre}" + (f" ({', '.join(map(str, exemples))})" if exemples else ''))
+        autres = len(self.compteurs) - limite
+        if autres > 0:
+            parties.append(f"{autres} autre(s) type(s)")
+        return '; '.join(parties)
@@ -0,0 +1,302 @@
+"""
+Mesures des requêtes HTTP et SQL, exposées au format texte Prometheus
+
+Activées par METRIQUES_ACTIVES, sans modifier les routes : des hooks
+before/after_request chronomètrent chaque requête, des événements du moteur
+SQLAlchemy comptent les requêtes SQL exécutées pendant la requête HTTP et leur
+durée. Une même instruction SQL répétée au moins METRIQUES_SEUIL_N_PLUS_1 fois
+dans une requête est signalée dans les logs (chargement N+1).
+
+Chaque worker compte ses propres mesures et en publie un instantané dans
+METRIQUES_DOSSIER (au plus toutes les METRIQUES_INTERVALLE secondes, et à
+l'arrêt du worker). `/metrics` expose les instantanés de tous les workers,
+distingués par l'étiquette `pid` : quel que soit le worker qui répond,
+Prometheus voit toutes les séries et les additionne (`sum without (pid)`).
+L'instantané d'un worker arrêté est supprimé METRIQUES_RETENTION secondes après
+sa dernière publication.
+"""
+
+import contextvars
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PREFIXE = 'myxploit'
+
+# Bornes des histogrammes : durée des requêtes (secondes), requêtes SQL par requête HTTP
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BORNES_SQL = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Mesures SQL de la requête HTTP en cours (None hors requête : tâches, emails)
+_requete_courante = contextvars.ContextVar('metriques_requete', default=None)
+
+
+class MesuresRequete:
+    """Requêtes SQL exécutées pendant une requête HTTP"""
+
+    __slots__ = ('debut', 'sql_nombre', 'sql_duree', 'instructions')
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.sql_nombre = 0
+        self.sql_duree = 0.0
+        self.instructions = Counter()
+
+
+class Histogramme:
+    """Histogramme cumulatif au sens Prometheus : effectifs par borne, somme et nombre"""
+
+    __slots__ = ('bornes', 'effectifs', 'somme', 'nombre')
+
+    def __init__(self, bornes):
+        self.bornes = bornes
+        self.effectifs = [0] * len(bornes)
+        self.somme = 0.0
+        self.nombre = 0
+
+    def observer(self, valeur):
+        for i, borne in enumerate(self.bornes):
+            if valeur <= borne:
+                self.effectifs[i] += 1
+                break
+        self.somme += valeur
+        self.nombre += 1
+
+    @classmethod
+    def depuis(cls, bornes, effectifs, somme, nombre):
+        histogramme = cls(bornes)
+        histogramme.effectifs = list(effectifs)
+        histogramme.somme = somme
+        histogramme.nombre = nombre
+        return histogramme
+
+    def lignes(self, nom, etiquettes):
+        cumul = 0
+        for borne, effectif in zip(self.bornes, self.effectifs):
+            cumul += effectif
+            yield f'{nom}_bucket{_etiquettes({**etiquettes, "le": _nombre(borne)})} {cumul}'
+        yield f'{nom}_bucket{_etiquettes({**etiquettes, "le": "+Inf"})} {self.nombre}'
+        yield f'{nom}_sum{_etiquettes(etiquettes)} {_nombre(self.somme)}'
+        yield f'{nom}_count{_etiquettes(etiquettes)} {self.nombre}'
+
+
+def _nombre(valeur):
+    return repr(float(valeur)) if isinstance(valeur, float) else str(valeur)
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquettes(etiquettes):
+    if not etiquettes:
+        return ''
+    return '{' + ','.join(f'{cle}="{_echapper(valeur)}"' for cle, valeur in etiquettes.items()) + '}'
+
+
+def _avant_execution(connexion, curseur, instruction, parametres, contexte, executemany):
+    mesures = _requete_courante.get()
+    if mesures is not None:
+        connexion.info.setdefault('metriques_debuts', []).append(time.perf_counter())
+
+
+def _apres_execution(connexion, curseur, instruction, parametres, contexte, executemany):
+    mesures = _requete_courante.get()
+    debuts = connexion.info.get('metriques_debuts')
+    if mesures is None or not debuts:
+        return
+    mesures.sql_duree += time.perf_counter() - debuts.pop()
+    mesures.sql_nombre += 1
+    mesures.instructions[instruction] += 1
+
+
+class Metriques:
+    """Collecte des mesures par endpoint et exposition `/metrics`"""
+
+    _moteur_ecoute = False
+
+    def __init__(self, app=None):
+        self._verrou = threading.Lock()
+        self._durees = {}
+        self._requetes = Counter()
+        self._sql_par_requete = {}
+        self._sql_nombre = Counter()
+        self._sql_duree = Counter()
+        self._n_plus_1 = Counter()
+        self.actives = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['metriques'] = self
+        self.actives = bool(app.config.get('METRIQUES_ACTIVES', False))
+        self.seuil_n_plus_1 = int(app.config.get('METRIQUES_SEUIL_N_PLUS_1', 10))
+        # Dossier des instantanés partagé par les workers (vide : worker seul)
+        self.dossier = app.config.get('METRIQUES_DOSSIER', '')
+        self.intervalle = float(app.config.get('METRIQUES_INTERVALLE', 5.0))
+        self.retention = float(app.config.get('METRIQUES_RETENTION', 600.0))
+        self._derniere_publication = 0.0
+        if not self.actives:
+            return
+
+        app.before_request(self._debut_requete)
+        app.after_request(self._fin_requete)
+        app.teardown_request(self._liberer)
+        # Tous les moteurs, une seule fois par processus ; sans effet hors requête HTTP
+        if not Metriques._moteur_ecoute:
+            event.listen(Engine, 'before_cursor_execute', _avant_execution)
+            event.listen(Engine, 'after_cursor_execute', _apres_execution)
+            Metriques._moteur_ecoute = True
+
+    def _debut_requete(self):
+        _requete_courante.set(MesuresRequete())
+
+    def _fin_requete(self, reponse):
+        from flask import request
+
+        mesures = _requete_courante.get()
+        if mesures is None:
+            return reponse
+        duree = time.perf_counter() - mesures.debut
+        endpoint = request.endpoint or 'inconnu'
+        cle = (endpoint, request.method)
+
+        repetitions = 0
+        instruction_repetee = None
+        if mesures.instructions:
+            instruction_repetee, repetitions = mesures.instructions.most_common(1)[0]
+
+        with self._verrou:
+            self._durees.setdefault(cle, Histogramme(BORNES_DUREE)).observer(duree)
+            self._requetes[cle + (str(reponse.status_code),)] += 1
+            self._sql_par_requete.setdefault(cle, Histogramme(BORNES_SQL)).observer(mesures.sql_nombre)
+            self._sql_nombre[cle] += mesures.sql_nombre
+            self._sql_duree[cle] += mesures.sql_duree
+            if repetitions >= self.seuil_n_plus_1:
+                self._n_plus_1[cle] += 1
+
+        if time.monotonic() - self._derniere_publication >= self.intervalle:
+            self.publier()
+
+        if repetitions >= self.seuil_n_plus_1:
+            logger.warning(
+                f"⚠️ N+1 probable sur {endpoint}: même requête SQL exécutée {repetitions} fois "
+                f"({mesures.sql_nombre} requêtes au total) - {' '.join(instruction_repetee.split())[:200]}",
+                extra={
+                    'endpoint': endpoint, 'methode': request.method, 'repetitions': repetitions,
+                    'sql_nombre': mesures.sql_nombre, 'duree_s': round(duree, 4)
+                }
+            )
+        _requete_courante.set(None)
+        return reponse
+
+    def _liberer(self, erreur=None):
+        _requete_courante.set(None)
+
+    def instantane(self):
+        """Mesures du worker, sérialisables en JSON"""
+        with self._verrou:
+            return {
+                'pid': os.getpid(),
+                'durees': [[*cle, h.effectifs, h.somme, h.nombre] for cle, h in self._durees.items()],
+                'requetes': [[*cle, valeur] for cle, valeur in self._requetes.items()],
+                'sql_par_requete': [[*cle, h.effectifs, h.somme, h.nombre] for cle, h in self._sql_par_requete.items()],
+                'sql_nombre': [[*cle, valeur] for cle, valeur in self._sql_nombre.items()],
+                'sql_duree': [[*cle, valeur] for cle, valeur in self._sql_duree.items()],
+                'n_plus_1': [[*cle, valeur] for cle, valeur in self._n_plus_1.items()],
+            }
+
+    def publier(self):
+        """Écrit l'instantané du worker dans METRIQUES_DOSSIER (remplacement atomique) et le retourne"""
+        instantane = self.instantane()
+        self._derniere_publication = time.monotonic()
+        if not self.actives or not self.dossier:
+            return instantane
+        try:
+            os.makedirs(self.dossier, exist_ok=True)
+            chemin = os.path.join(self.dossier, f"{instantane['pid']}.json")
+            with open(chemin + '.tmp', 'w', encoding='utf-8') as fichier:
+                json.dump(instantane, fichier)
+            os.replace(chemin + '.tmp', chemin)
+        except OSError as e:
+            logger.error(f"❌ Erreur lors de la publication des métriques: {str(e)}")
+        return instantane
+
+    def _instantanes(self):
+        """Instantanés de tous les workers, celui du worker courant à jour"""
+        propre = self.publier()
+        instantanes = [propre]
+        if not self.dossier:
+            return instantanes
+        for chemin in glob.glob(os.path.join(self.dossier, '*.json')):
+            try:
+                pid = int(os.path.basename(chemin)[:-len('.json')])
+                if pid == propre['pid']:
+                    continue
+                if not _processus_actif(pid) and time.time() - os.path.getmtime(chemin) > self.retention:
+                    os.remove(chemin)
+                    continue
+                with open(chemin, encoding='utf-8') as fichier:
+                    instantanes.append(json.load(fichier))
+            except (OSError, ValueError):
+                # Fichier étranger, supprimé ou en cours de remplacement
+                continue
+        return instantanes
+
+    def exposition(self):
+        """Mesures de tous les workers au format texte Prometheus (version 0.0.4), étiquette `pid`"""
+        instantanes = sorted(self._instantanes(), key=lambda instantane: instantane['pid'])
+        lignes = []
+
+        def famille(nom, type_mesure, aide):
+            lignes.append(f'# HELP {PREFIXE}_{nom} {aide}')
+            lignes.append(f'# TYPE {PREFIXE}_{nom} {type_mesure}')
+            return f'{PREFIXE}_{nom}'
+
+        nom = famille('requetes_http_total', 'counter', 'Requêtes HTTP traitées')
+        for instantane in instantanes:
+            for endpoint, methode, statut, valeur in sorted(instantane['requetes']):
+                etiquettes = {'endpoint': endpoint, 'methode': methode, 'statut': statut, 'pid': instantane['pid']}
+                lignes.append(f'{nom}{_etiquettes(etiquettes)} {valeur}')
+
+        for cle, bornes, nom_famille, aide in (
+            ('durees', BORNES_DUREE, 'requete_http_duree_secondes', 'Durée des requêtes HTTP'),
+            ('sql_par_requete', BORNES_SQL, 'requete_http_sql', 'Requêtes SQL exécutées par requête HTTP'),
+        ):
+            nom = famille(nom_famille, 'histogram', aide)
+            for instantane in instantanes:
+                for endpoint, methode, effectifs, somme, nombre in sorted(instantane[cle]):
+                    histogramme = Histogramme.depuis(bornes, effectifs, somme, nombre)
+                    lignes.extend(histogramme.lignes(nom, {'endpoint': endpoint, 'methode': methode, 'pid': instantane['pid']}))
+
+        for cle, nom_famille, aide in (
+            ('sql_nombre', 'sql_requetes_total', 'Requêtes SQL exécutées pendant les requêtes HTTP'),
+            ('sql_duree', 'sql_duree_secondes_total', 'Durée cumulée des requêtes SQL pendant les requêtes HTTP'),
+            ('n_plus_1', 'n_plus_1_total', 'Requêtes HTTP ayant répété une même requête SQL au-delà du seuil'),
+        ):
+            nom = famille(nom_famille, 'counter', aide)
+            for instantane in instantanes:
+                for endpoint, methode, valeur in sorted(instantane[cle]):
+                    etiquettes = {'endpoint': endpoint, 'methode': methode, 'pid': instantane['pid']}
+                    lignes.append(f'{nom}{_etiquettes(etiquettes)} {_nombre(valeur)}')
+
+        return '\n'.join(lignes) + '\n'
+
+
+def _processus_actif(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,205 @@
+"""Schéma initial
+
+Tables des modèles de app.py. Sur une base antérieure aux migrations, seules
+les tables absentes sont créées.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17 20:28:25.061704
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Les bases créées avant les migrations (db.create_all) ont déjà ces tables
+    existantes = set(sa.inspect(op.get_bind()).get_table_names())
+    
+    if 'clients' not in existantes:
+        op.create_table('clients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nom', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('telephone', sa.String(length=20), nullable=True),
+        sa.Column('adresse', sa.Text(), nullable=True),
+        sa.Column('siret', sa.String(length=14), nullable=True),
+        sa.Column('site_web', sa.String(length=200), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('statut', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+        )
+
+    if 'emissions_agregats' not in existantes:
+        op.create_table('emissions_agregats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dimension', sa.String(length=20), nullable=False),
+        sa.Column('cle', sa.String(length=50), nullable=False),
+        sa.Column('nb_transports', sa.Integer(), nullable=False),
+        sa.Column('emis_kg', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dimension', 'cle', name='uq_emissions_agregats_dimension_cle')
+        )
+
+    if 'energies' not in existantes:
+        op.create_table('energies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nom', sa.String(length=100), nullable=False),
+        sa.Column('identifiant', sa.String(length=50), nullable=True),
+        sa.Column('unite', sa.String(length=20), nullable=True),
+        sa.Column('facteur', sa.Float(), nullable=True),
+        sa.Column('phase_amont', sa.Float(), nullable=True),
+        sa.Column('phase_fonctionnement', sa.Float(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('donnees_supplementaires', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('identifiant')
+        )
+
+    if 'invitations' not in existantes:
+        op.create_table('invitations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('token', sa.String(length=100), nullable=False),
+        sa.Column('statut', sa.String(length=20), nullable=True),
+        sa.Column('nom_entreprise', sa.String(length=100), nullable=True),
+        sa.Column('nom_utilisateur', sa.String(length=100), nullable=True),
+        sa.Column('date_invitation', sa.DateTime(), nullable=True),
+        sa.Column('date_reponse', sa.DateTime(), nullable=True),
+        sa.Column('message_personnalise', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token')
+        )
+
+    if 'jobs' not in existantes:
+        op.create_table('jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('statut', sa.String(length=20), nullable=True),
+        sa.Column('progression', sa.Integer(), nullable=True),
+        sa.Column('traites', sa.Integer(), nullable=True),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('parametres', sa.JSON(), nullable=True),
+        sa.Column('resultat', sa.JSON(), nullable=True),
+        sa.Column('erreur', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'transporteurs' not in existantes:
+        op.create_table('transporteurs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nom', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('telephone', sa.String(length=20), nullable=True),
+        sa.Column('adresse', sa.Text(), nullable=True),
+        sa.Column('siret', sa.String(length=14), nullable=True),
+        sa.Column('site_web', sa.String(length=200), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('statut', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+        )
+
+    if 'versions_referentiel' not in existantes:
+        op.create_table('versions_referentiel',
+        sa.Column('nom', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('nom')
+        )
+
+    if 'transports' not in existantes:
+        op.create_table('transports',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ref', sa.String(length=50), nullable=False),
+        sa.Column('type_transport', sa.String(length=50), nullable=True),
+        sa.Column('niveau_calcul', sa.String(length=50), nullable=True),
+        sa.Column('type_vehicule', sa.String(length=50), nullable=True),
+        sa.Column('energie', sa.String(length=50), nullable=True),
+        sa.Column('conso_vehicule', sa.Float(), nullable=True),
+        sa.Column('poids_tonnes', sa.Float(), nullable=True),
+        sa.Column('distance_km', sa.Float(), nullable=True),
+        sa.Column('emis_kg', sa.Float(), nullable=True),
+        sa.Column('emis_tkm', sa.Float(), nullable=True),
+        sa.Column('client_id', sa.Integer(), nullable=True),
+        sa.Column('transporteur_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+        sa.ForeignKeyConstraint(['transporteur_id'], ['transporteurs.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('ref')
+        )
+
+    if 'vehicules' not in existantes:
+        op.create_table('vehicules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nom', sa.String(length=100), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=True),
+        sa.Column('energie_id', sa.Integer(), nullable=True),
+        sa.Column('consommation', sa.Float(), nullable=True),
+        sa.Column('emissions', sa.Float(), nullable=True),
+        sa.Column('charge_utile', sa.Float(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['energie_id'], ['energies.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'transport_phases' not in existantes:
+        op.create_table('transport_phases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('transport_ref', sa.String(length=50), nullable=False),
+        sa.Column('ordre', sa.Integer(), nullable=True),
+        sa.Column('type', sa.String(length=20), nullable=False),
+        sa.Column('energie', sa.String(length=50), nullable=True),
+        sa.Column('vehicule_id', sa.Integer(), nullable=True),
+        sa.Column('ville_depart', sa.String(length=100), nullable=True),
+        sa.Column('ville_arrivee', sa.String(length=100), nullable=True),
+        sa.Column('consommation', sa.Float(), nullable=True),
+        sa.Column('distance_km', sa.Float(), nullable=True),
+        sa.Column('poids_tonnes', sa.Float(), nullable=True),
+        sa.Column('date', sa.Date(), nullable=True),
+        sa.Column('emis_kg', sa.Float(), nullable=True),
+        sa.Column('emis_tkm', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['transport_ref'], ['transports.ref'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('transport_phases', schema=None) as batch_op:
+            batch_op.create_index('ix_transport_phases_transport_ref', ['transport_ref', 'ordre'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transport_phases', schema=None) as batch_op:
+        batch_op.drop_index('ix_transport_phases_transport_ref')
+
+    op.drop_table('transport_phases')
+    op.drop_table('vehicules')
+    op.drop_table('transports')
+    op.drop_table('versions_referentiel')
+    op.drop_table('transporteurs')
+    op.drop_table('jobs')
+    op.drop_table('invitations')
+    op.drop_table('energies')
+    op.drop_table('emissions_agregats')
+    op.drop_table('clients')
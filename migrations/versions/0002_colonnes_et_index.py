@@ -0,0 +1,75 @@
+"""Colonnes et index ajoutés aux tables existantes
+
+Reprend les ALTER TABLE exécutés auparavant à chaque démarrage (énergies,
+véhicules) et l'ajout des colonnes client/transporteur et des index des
+transports. Chaque élément n'est ajouté que s'il manque.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 20:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+# table -> colonnes (nom, type, clé étrangère)
+COLONNES = {
+    'energies': [
+        ('phase_amont', sa.Float(), None),
+        ('phase_fonctionnement', sa.Float(), None),
+        ('donnees_supplementaires', sa.JSON(), None),
+    ],
+    'vehicules': [
+        ('energie_id', sa.Integer(), 'energies.id'),
+        ('description', sa.Text(), None),
+    ],
+    'transports': [
+        ('client_id', sa.Integer(), 'clients.id'),
+        ('transporteur_id', sa.Integer(), 'transporteurs.id'),
+    ],
+}
+
+INDEX_TRANSPORTS = [
+    ('ix_transports_energie', ['energie']),
+    ('ix_transports_type_vehicule', ['type_vehicule']),
+    ('ix_transports_niveau_calcul', ['niveau_calcul']),
+    # Pagination par clé (tri, id) de la liste des transports
+    ('ix_transports_created_at_id', ['created_at', 'id']),
+    ('ix_transports_emis_kg_id', ['emis_kg', 'id']),
+]
+
+
+def upgrade():
+    connexion = op.get_bind()
+    inspecteur = sa.inspect(connexion)
+    # SQLite n'ajoute pas de contrainte par ALTER TABLE (et ne les vérifie pas par défaut)
+    contraintes = connexion.dialect.name != 'sqlite'
+
+    for table, colonnes in COLONNES.items():
+        existantes = {colonne['name'] for colonne in inspecteur.get_columns(table)}
+        # ADD COLUMN simple, sans recopie de la table : les colonnes sont nullables
+        for nom, type_colonne, reference in colonnes:
+            if nom not in existantes:
+                arguments = [sa.ForeignKey(reference)] if reference and contraintes else []
+                op.add_column(table, sa.Column(nom, type_colonne, *arguments, nullable=True))
+
+    index_existants = {index['name'] for index in inspecteur.get_indexes('transports')}
+    for nom, colonnes in INDEX_TRANSPORTS:
+        if nom not in index_existants:
+            op.create_index(nom, 'transports', colonnes)
+
+
+def downgrade():
+    for nom, _ in reversed(INDEX_TRANSPORTS):
+        op.drop_index(nom, table_name='transports')
+    with op.batch_alter_table('transports', schema=None) as batch_op:
+        batch_op.drop_column('transporteur_id')
+        batch_op.drop_column('client_id')
@@ -0,0 +1,91 @@
+"""Données initiales : version du référentiel et agrégats du dashboard
+
+Crée le compteur de version du cache des énergies et véhicules, et calcule
+les agrégats d'émissions d'une base qui contient déjà des transports.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 20:45:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from agregats import (
+    DIMENSION_CLIENT, DIMENSION_ENERGIE, DIMENSION_MOIS, DIMENSION_TOTAL,
+    DIMENSION_TRANSPORTEUR, DIMENSION_TYPE_VEHICULE, DeltasAgregats
+)
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+NOM_VERSION_REFERENTIEL = 'referentiel'
+
+# Tables décrites localement : la migration ne dépend pas des modèles de app.py
+versions_referentiel = sa.table('versions_referentiel', sa.column('nom', sa.String), sa.column('version', sa.Integer))
+emissions_agregats = sa.table(
+    'emissions_agregats',
+    sa.column('dimension', sa.String), sa.column('cle', sa.String),
+    sa.column('nb_transports', sa.Integer), sa.column('emis_kg', sa.Float)
+)
+transports = sa.table(
+    'transports',
+    sa.column('id', sa.Integer), sa.column('created_at', sa.DateTime), sa.column('energie', sa.String),
+    sa.column('type_vehicule', sa.String), sa.column('client_id', sa.Integer),
+    sa.column('transporteur_id', sa.Integer), sa.column('emis_kg', sa.Float)
+)
+
+
+def _calculer_agregats(connexion):
+    """Agrégats de tous les transports par GROUP BY (même calcul que `flask reconstruire-agregats`)"""
+    emissions = sa.func.coalesce(sa.func.sum(transports.c.emis_kg), 0.0)
+    deltas = DeltasAgregats()
+
+    total, emis = connexion.execute(sa.select(sa.func.count(transports.c.id), emissions)).one()
+    deltas.ajouter_groupe(DIMENSION_TOTAL, None, total, emis)
+
+    annee = sa.func.extract('year', transports.c.created_at)
+    mois = sa.func.extract('month', transports.c.created_at)
+    for valeur_annee, valeur_mois, nombre, emis in connexion.execute(
+        sa.select(annee, mois, sa.func.count(transports.c.id), emissions).group_by(annee, mois)
+    ):
+        date = datetime(int(valeur_annee), int(valeur_mois), 1) if valeur_annee is not None else None
+        deltas.ajouter_groupe(DIMENSION_MOIS, date, nombre, emis)
+
+    for dimension, colonne in (
+        (DIMENSION_ENERGIE, transports.c.energie),
+        (DIMENSION_TYPE_VEHICULE, transports.c.type_vehicule),
+        (DIMENSION_CLIENT, transports.c.client_id),
+        (DIMENSION_TRANSPORTEUR, transports.c.transporteur_id),
+    ):
+        for valeur, nombre, emis in connexion.execute(
+            sa.select(colonne, sa.func.count(transports.c.id), emissions).group_by(colonne)
+        ):
+            deltas.ajouter_groupe(dimension, valeur, nombre, emis)
+    return deltas.lignes()
+
+
+def upgrade():
+    connexion = op.get_bind()
+
+    if connexion.execute(
+        sa.select(versions_referentiel.c.version).where(versions_referentiel.c.nom == NOM_VERSION_REFERENTIEL)
+    ).first() is None:
+        op.bulk_insert(versions_referentiel, [{'nom': NOM_VERSION_REFERENTIEL, 'version': 0}])
+
+    agregats_vides = connexion.execute(sa.select(emissions_agregats.c.cle).limit(1)).first() is None
+    transports_presents = connexion.execute(sa.select(transports.c.id).limit(1)).first() is not None
+    if agregats_vides and transports_presents:
+        op.bulk_insert(emissions_agregats, _calculer_agregats(connexion))
+
+
+def downgrade():
+    op.execute(emissions_agregats.delete())
+    op.execute(versions_referentiel.delete().where(versions_referentiel.c.nom == NOM_VERSION_REFERENTIEL))
@@ -0,0 +1,66 @@
+"""Clés étrangères energie_id / vehicule_id des transports
+
+Ajoute les références typées aux énergies et véhicules, leurs index composites
+(clé, date de création, id) et les renseigne depuis les colonnes texte
+`energie` et `type_vehicule` (id de l'énergie / du véhicule).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+# colonne -> (table référencée, colonne texte d'origine, index)
+REFERENCES = {
+    'energie_id': ('energies', 'energie', 'ix_transports_energie_id_created_at'),
+    'vehicule_id': ('vehicules', 'type_vehicule', 'ix_transports_vehicule_id_created_at'),
+}
+
+
+def upgrade():
+    connexion = op.get_bind()
+    inspecteur = sa.inspect(connexion)
+    # SQLite n'ajoute pas de contrainte par ALTER TABLE (et ne les vérifie pas par défaut)
+    contraintes = connexion.dialect.name != 'sqlite'
+
+    colonnes = {colonne['name'] for colonne in inspecteur.get_columns('transports')}
+    index_existants = {index['name'] for index in inspecteur.get_indexes('transports')}
+    for nom, (table_cible, _, index) in REFERENCES.items():
+        if nom not in colonnes:
+            arguments = [sa.ForeignKey(f'{table_cible}.id')] if contraintes else []
+            op.add_column('transports', sa.Column(nom, sa.Integer(), *arguments, nullable=True))
+        if index not in index_existants:
+            op.create_index(index, 'transports', [nom, 'created_at', 'id'])
+
+    # Reprise : l'id référencé est celui dont la valeur texte est l'écriture
+    # (mêmes règles que le calcul des émissions)
+    transports = sa.table(
+        'transports', sa.column('energie', sa.String), sa.column('type_vehicule', sa.String),
+        sa.column('energie_id', sa.Integer), sa.column('vehicule_id', sa.Integer)
+    )
+    for nom, (table_cible, colonne_texte, _) in REFERENCES.items():
+        cible = sa.table(table_cible, sa.column('id', sa.Integer))
+        texte = transports.c[colonne_texte]
+        identifiant = (
+            sa.select(cible.c.id)
+            .where(sa.cast(cible.c.id, sa.String(50)) == sa.func.trim(texte))
+            .scalar_subquery()
+        )
+        op.execute(transports.update().where(texte.isnot(None)).values({nom: identifiant}))
+
+
+def downgrade():
+    with op.batch_alter_table('transports', schema=None) as batch_op:
+        for nom, (_, _, index) in REFERENCES.items():
+            batch_op.drop_index(index)
+            batch_op.drop_column(nom)
@@ -0,0 +1,40 @@
+"""Statut d'envoi des emails d'invitation
+
+Colonnes renseignées par la file d'envoi des emails : statut, nombre de
+tentatives, dernière erreur et date d'envoi.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+COLONNES = (
+    ('statut_envoi', sa.String(length=20)),
+    ('tentatives_envoi', sa.Integer()),
+    ('erreur_envoi', sa.Text()),
+    ('date_envoi', sa.DateTime()),
+)
+
+
+def upgrade():
+    existantes = {colonne['name'] for colonne in sa.inspect(op.get_bind()).get_columns('invitations')}
+    for nom, type_colonne in COLONNES:
+        if nom not in existantes:
+            op.add_column('invitations', sa.Column(nom, type_colonne, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('invitations', schema=None) as batch_op:
+        for nom, _ in reversed(COLONNES):
+            batch_op.drop_column(nom)
@@ -0,0 +1,33 @@
+"""Campagnes d'invitations groupées
+
+Identifiant de campagne sur les invitations, indexé pour le suivi de
+progression d'une campagne.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspecteur = sa.inspect(op.get_bind())
+    if 'campagne_id' not in {colonne['name'] for colonne in inspecteur.get_columns('invitations')}:
+        op.add_column('invitations', sa.Column('campagne_id', sa.String(length=32), nullable=True))
+    if 'ix_invitations_campagne_id' not in {index['name'] for index in inspecteur.get_indexes('invitations')}:
+        op.create_index('ix_invitations_campagne_id', 'invitations', ['campagne_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_invitations_campagne_id', table_name='invitations')
+    with op.batch_alter_table('invitations', schema=None) as batch_op:
+        batch_op.drop_column('campagne_id')
@@ -0,0 +1,30 @@
+"""Processus propriétaire des tâches
+
+Identifiant `hôte:pid` du processus qui exécute une tâche : une tâche dont le
+processus a disparu (worker recyclé ou tué) est passée en échec au démarrage
+des workers suivants.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'proprietaire' not in {colonne['name'] for colonne in sa.inspect(op.get_bind()).get_columns('jobs')}:
+        op.add_column('jobs', sa.Column('proprietaire', sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_column('proprietaire')
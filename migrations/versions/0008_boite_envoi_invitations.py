@@ -0,0 +1,44 @@
+"""Boîte d'envoi des invitations
+
+Date de la prochaine tentative d'envoi, réservation de l'invitation par le
+worker qui l'envoie et URL du site pour le lien d'acceptation : l'envoi des
+invitations reprend depuis la base après l'arrêt d'un worker.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+COLONNES = (
+    ('prochain_envoi', sa.DateTime()),
+    ('envoi_reserve_jusqu_a', sa.DateTime()),
+    ('url_application', sa.String(length=200)),
+)
+
+
+def upgrade():
+    inspecteur = sa.inspect(op.get_bind())
+    existantes = {colonne['name'] for colonne in inspecteur.get_columns('invitations')}
+    for nom, type_colonne in COLONNES:
+        if nom not in existantes:
+            op.add_column('invitations', sa.Column(nom, type_colonne, nullable=True))
+    if 'ix_invitations_envoi' not in {index['name'] for index in inspecteur.get_indexes('invitations')}:
+        op.create_index('ix_invitations_envoi', 'invitations', ['statut_envoi', 'prochain_envoi'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_invitations_envoi', table_name='invitations')
+    with op.batch_alter_table('invitations', schema=None) as batch_op:
+        for nom, _ in reversed(COLONNES):
+            batch_op.drop_column(nom)
@@ -0,0 +1,38 @@
+"""Une seule invitation par adresse email
+
+Index unique sur lower(email) : deux requêtes simultanées (invitation seule ou
+campagne) ne peuvent plus créer deux invitations pour la même adresse. La
+migration échoue, en listant des adresses concernées, si la base contient
+déjà des doublons à supprimer au préalable.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    doublons = op.get_bind().execute(sa.text(
+        'SELECT lower(email) FROM invitations GROUP BY lower(email) HAVING count(*) > 1 LIMIT 10'
+    )).scalars().all()
+    if doublons:
+        raise RuntimeError(
+            f"Invitations en double (casse ignorée) : {', '.join(doublons)} - "
+            f"supprimer les doublons avant d'appliquer la migration"
+        )
+    # if_not_exists : les index sur expression ne sont pas lus par l'inspecteur SQLite
+    op.create_index('uq_invitations_email', 'invitations', [sa.text('lower(email)')], unique=True, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('uq_invitations_email', table_name='invitations', if_exists=True)
@@ -1,6 +1,11 @@
+"""
+Modèles SQLAlchemy de l'application
+"""
+
 from datetime import datetime
 
-# db sera importé depuis app.py pour éviter les conflits SQLAlchemy
+from extensions import db
+
 
 class Transport(db.Model):
     """Modèle pour les transports"""
@@ -11,14 +16,63 @@ class Transport(db.Model):
     type_transport = db.Column(db.String(50))
     niveau_calcul = db.Column(db.String(50))
     type_vehicule = db.Column(db.String(50))
-    energie = db.Column(db.String(50))
+    energie = db.Column(db.String(50)) # Changed from energie to energie
     conso_vehicule = db.Column(db.Float)
     poids_tonnes = db.Column(db.Float)
     distance_km = db.Column(db.Float)
     emis_kg = db.Column(db.Float, default=0.0)
     emis_tkm = db.Column(db.Float, default=0.0)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'))
+    transporteur_id = db.Column(db.Integer, db.ForeignKey('transporteurs.id'))
+    # Références typées tenues à jour depuis `energie` et `type_vehicule`
+    # (NULL si la valeur saisie ne désigne aucune énergie / aucun véhicule)
+    energie_id = db.Column(db.Integer, db.ForeignKey('energies.id'))
+    vehicule_id = db.Column(db.Integer, db.ForeignKey('vehicules.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Index des filtres et des tris de la liste paginée (tri + id pour le curseur).
+    # Les index des clés étrangères servent aussi la liste filtrée triée par date
+    __table_args__ = (
+        db.Index('ix_transports_energie', 'energie'),
+        db.Index('ix_transports_type_vehicule', 'type_vehicule'),
+        db.Index('ix_transports_niveau_calcul', 'niveau_calcul'),
+        db.Index('ix_transports_created_at_id', 'created_at', 'id'),
+        db.Index('ix_transports_emis_kg_id', 'emis_kg', 'id'),
+        db.Index('ix_transports_energie_id_created_at', 'energie_id', 'created_at', 'id'),
+        db.Index('ix_transports_vehicule_id_created_at', 'vehicule_id', 'created_at', 'id'),
+    )
+
+
+class PhaseTransport(db.Model):
+    """Phases d'un transport (collecte, traction, distribution) et leurs émissions"""
+    __tablename__ = 'transport_phases'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    transport_ref = db.Column(
+        db.String(50),
+        db.ForeignKey('transports.ref', onupdate='CASCADE', ondelete='CASCADE'),
+        nullable=False
+    )
+    ordre = db.Column(db.Integer)
+    type = db.Column(db.String(20), nullable=False)  # collecte, traction, distribution
+    energie = db.Column(db.String(50))  # id ou identifiant de l'énergie
+    vehicule_id = db.Column(db.Integer)
+    ville_depart = db.Column(db.String(100))
+    ville_arrivee = db.Column(db.String(100))
+    consommation = db.Column(db.Float)  # L/100km
+    distance_km = db.Column(db.Float)
+    poids_tonnes = db.Column(db.Float)
+    date = db.Column(db.Date)
+    emis_kg = db.Column(db.Float, default=0.0)
+    emis_tkm = db.Column(db.Float, default=0.0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_transport_phases_transport_ref', 'transport_ref', 'ordre'),
+    )
+
 
 class Vehicule(db.Model):
     """Modèle pour les véhicules"""
@@ -27,10 +81,16 @@ class Vehicule(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(100), nullable=False)
     type = db.Column(db.String(50))
+    energie_id = db.Column(db.Integer, db.ForeignKey('energies.id'))
     consommation = db.Column(db.Float)  # L/100km
     emissions = db.Column(db.Float)     # g CO2e/km
     charge_utile = db.Column(db.Float)  # tonnes
+    description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relation avec l'énergie
+    energie = db.relationship('Energie', backref='vehicules')
+
 
 class Energie(db.Model):
     """Modèle pour les énergies"""
@@ -39,8 +99,128 @@ class Energie(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(100), nullable=False)
     identifiant = db.Column(db.String(50), unique=True)
-    facteur = db.Column(db.Float)       # kg CO2e/L
+    unite = db.Column(db.String(20), default='L')  # Unité de mesure (L, kg, kWh)
+    facteur = db.Column(db.Float)       # kg CO2e/L (total)
+    phase_amont = db.Column(db.Float, default=0.0)      # kg CO2e/L (phase amont)
+    phase_fonctionnement = db.Column(db.Float, default=0.0)  # kg CO2e/L (phase fonctionnement)
+    description = db.Column(db.Text)
+    donnees_supplementaires = db.Column(db.JSON, default={})  # Données supplémentaires en JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Invitation(db.Model):
+    """Modèle pour les invitations de clients"""
+    __tablename__ = 'invitations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), nullable=False)
+    token = db.Column(db.String(100), unique=True, nullable=False)
+    statut = db.Column(db.String(20), default='en_attente')  # en_attente, acceptee, refusee, expiree
+    nom_entreprise = db.Column(db.String(100))
+    nom_utilisateur = db.Column(db.String(100))
+    date_invitation = db.Column(db.DateTime, default=datetime.utcnow)
+    date_reponse = db.Column(db.DateTime)
+    message_personnalise = db.Column(db.Text)
+    # Envoi de l'email d'invitation par la file d'envoi (file_courriels.py) :
+    # en_attente, envoye, simule (pas de SMTP configuré) ou echec
+    statut_envoi = db.Column(db.String(20))
+    tentatives_envoi = db.Column(db.Integer, default=0)
+    erreur_envoi = db.Column(db.Text)
+    date_envoi = db.Column(db.DateTime)
+    # Boîte d'envoi : tentative suivante d'un envoi en attente, réservation par
+    # le worker qui l'envoie et URL du site pour le lien d'acceptation
+    prochain_envoi = db.Column(db.DateTime)
+    envoi_reserve_jusqu_a = db.Column(db.DateTime)
+    url_application = db.Column(db.String(200))
+    # Campagne d'invitations groupées (POST /api/invitations/campagne)
+    campagne_id = db.Column(db.String(32))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_invitations_campagne_id', 'campagne_id'),
+        db.Index('ix_invitations_envoi', 'statut_envoi', 'prochain_envoi'),
+        # Une invitation par adresse, casse ignorée
+        db.Index('uq_invitations_email', db.text('lower(email)'), unique=True),
+    )
+
+
+class Client(db.Model):
+    """Modèle pour les clients"""
+    __tablename__ = 'clients'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    nom = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    telephone = db.Column(db.String(20))
+    adresse = db.Column(db.Text)
+    siret = db.Column(db.String(14))
+    site_web = db.Column(db.String(200))
+    description = db.Column(db.Text)
+    statut = db.Column(db.String(20), default='actif')  # actif, inactif
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Transporteur(db.Model):
+    """Modèle pour les transporteurs"""
+    __tablename__ = 'transporteurs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    nom = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    telephone = db.Column(db.String(20))
+    adresse = db.Column(db.Text)
+    siret = db.Column(db.String(14))
+    site_web = db.Column(db.String(200))
     description = db.Column(db.Text)
+    statut = db.Column(db.String(20), default='actif')  # actif, inactif
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Job(db.Model):
+    """Modèle pour les tâches exécutées en arrière-plan (recalculs, imports)"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    statut = db.Column(db.String(20), default='en_attente')  # en_attente, en_cours, termine, echec
+    progression = db.Column(db.Integer, default=0)  # pourcentage
+    traites = db.Column(db.Integer, default=0)
+    total = db.Column(db.Integer)
+    parametres = db.Column(db.JSON, default={})
+    resultat = db.Column(db.JSON)
+    erreur = db.Column(db.Text)
+    # Processus qui exécute la tâche (`hôte:pid`) ; updated_at sert de battement
+    proprietaire = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class EmissionsAgregat(db.Model):
+    """Agrégats d'émissions par dimension (mois, énergie, véhicule, client, transporteur)"""
+    __tablename__ = 'emissions_agregats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(20), nullable=False)
+    cle = db.Column(db.String(50), nullable=False)
+    nb_transports = db.Column(db.Integer, nullable=False, default=0)
+    emis_kg = db.Column(db.Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('dimension', 'cle', name='uq_emissions_agregats_dimension_cle'),
+    )
+
+
+class VersionReferentiel(db.Model):
+    """Numéro de version des énergies et véhicules, incrémenté à chaque écriture"""
+    __tablename__ = 'versions_referentiel'
+    
+    nom = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 
-#
+NOM_VERSION_REFERENTIEL = 'referentiel'
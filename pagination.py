@@ -0,0 +1,85 @@
+"""
+Pagination par clé (keyset) pour les listes volumineuses
+
+Au lieu d'un OFFSET qui relit toutes les lignes précédentes, chaque page
+reprend après la dernière ligne de la page précédente, identifiée par un
+curseur opaque `(valeur de tri, id)`. Le coût d'une page reste constant quelle
+que soit sa position, à condition qu'un index couvre `(colonne de tri, id)`.
+
+Les NULL sont considérés comme les plus grandes valeurs (ordre natif de
+PostgreSQL) : en fin de liste en tri croissant, en tête en tri décroissant.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+class CurseurInvalide(ValueError):
+    """Curseur de pagination illisible ou falsifié"""
+
+
+def encoder_curseur(valeur, identifiant, report=None):
+    """Encode la position `(valeur, id)` de la dernière ligne d'une page
+
+    `report` (données JSON) est transmis tel quel aux pages suivantes : les
+    totaux de la liste y sont calculés une fois par filtre, pas à chaque page.
+    """
+    if isinstance(valeur, datetime):
+        contenu = ['dt', valeur.isoformat(), identifiant]
+    else:
+        contenu = ['v', valeur, identifiant]
+    if report is not None:
+        contenu.append(report)
+    return base64.urlsafe_b64encode(json.dumps(contenu).encode('utf-8')).decode('ascii')
+
+
+def decoder_curseur(curseur):
+    """Décode un curseur produit par `encoder_curseur` ; retourne `(valeur, id, report)`"""
+    try:
+        type_valeur, valeur, identifiant, *report = json.loads(base64.urlsafe_b64decode(curseur.encode('ascii')))
+        if type_valeur == 'dt' and valeur is not None:
+            valeur = datetime.fromisoformat(valeur)
+        return valeur, int(identifiant), report[0] if report else None
+    except Exception as e:
+        raise CurseurInvalide(f'Curseur de pagination invalide: {str(e)}')
+
+
+def _accepte_null(colonne):
+    return getattr(colonne, 'nullable', True) is not False
+
+
+def segments_page(requete, colonne, colonne_id, curseur=None, descendant=False):
+    """Requêtes successives qui composent une page, dans l'ordre de la liste
+
+    Chaque requête est une plage simple de l'index `(colonne, id)` : comparaison
+    de valeurs de ligne `(colonne, id) > (valeur, id)` pour les valeurs non
+    NULL, `id > id` pour les NULL. L'appelant exécute les segments dans l'ordre
+    jusqu'à remplir la page : les NULL ne sont lus qu'une fois les valeurs non
+    NULL épuisées. Une condition `OR ... IS NULL` empêcherait l'usage de l'index
+    et ferait relire au SGBD toutes les lignes précédentes.
+    """
+    valeur = identifiant = None
+    if curseur:
+        valeur, identifiant, _ = decoder_curseur(curseur)
+    avec_null = _accepte_null(colonne)
+
+    if descendant:
+        non_null = requete.where(colonne.isnot(None)).order_by(colonne.desc(), colonne_id.desc())
+        nulls = requete.where(colonne.is_(None)).order_by(colonne_id.desc())
+        if not curseur:
+            return [nulls, non_null] if avec_null else [non_null]
+        if valeur is None:
+            return [nulls.where(colonne_id < identifiant), non_null]
+        return [non_null.where(tuple_(colonne, colonne_id) < (valeur, identifiant))]
+
+    non_null = requete.where(colonne.isnot(None)).order_by(colonne.asc(), colonne_id.asc())
+    nulls = requete.where(colonne.is_(None)).order_by(colonne_id.asc())
+    if not curseur:
+        return [non_null, nulls] if avec_null else [non_null]
+    if valeur is None:
+        return [nulls.where(colonne_id > identifiant)]
+    suite = [nulls] if avec_null else []
+    return [non_null.where(tuple_(colonne, colonne_id) > (valeur, identifiant))] + suite
@@ -0,0 +1,98 @@
+"""
+Phases d'un transport (collecte, traction, distribution)
+
+Conversion des phases reçues des écrans (phases.js, phases_modal.js,
+phases_simple.js, liste des transports) en valeurs d'enregistrement. Les
+écrans n'emploient pas tous les mêmes noms de champs : les variantes connues
+sont acceptées ici, une fois pour toutes.
+"""
+
+from datetime import datetime
+
+TYPES_PHASES = ('collecte', 'traction', 'distribution')
+
+# Nom du champ enregistré -> noms acceptés dans les requêtes
+ALIAS_CHAMPS = {
+    'consommation': ('consommation', 'conso'),
+    'distance_km': ('distance_km', 'distance'),
+    'poids_tonnes': ('poids_tonnes', 'poids'),
+}
+
+
+def _premiere_valeur(donnees, noms):
+    for nom in noms:
+        if nom in donnees:
+            return True, donnees[nom]
+    return False, None
+
+
+def _nombre(valeur, champ):
+    if valeur in (None, ''):
+        return None
+    try:
+        return float(valeur)
+    except (TypeError, ValueError):
+        raise ValueError(f"Champ '{champ}': nombre attendu")
+
+
+def _texte(valeur):
+    if valeur is None:
+        return None
+    return str(valeur).strip() or None
+
+
+def valeurs_phase(donnees):
+    """Valide et convertit une phase reçue en JSON (ValueError si invalide)"""
+    if not isinstance(donnees, dict):
+        raise ValueError('Objet phase attendu')
+
+    type_phase = (_texte(donnees.get('type')) or '').lower()
+    if type_phase not in TYPES_PHASES:
+        raise ValueError(f"Type de phase invalide: {donnees.get('type')} (valeurs possibles: {', '.join(TYPES_PHASES)})")
+
+    valeurs = {
+        'type': type_phase,
+        'energie': _texte(donnees.get('energie')),
+        'ville_depart': _texte(donnees.get('ville_depart')),
+        'ville_arrivee': _texte(donnees.get('ville_arrivee')),
+    }
+
+    for champ, noms in ALIAS_CHAMPS.items():
+        _, valeur = _premiere_valeur(donnees, noms)
+        valeurs[champ] = _nombre(valeur, champ)
+
+    vehicule_id = donnees.get('vehicule_id')
+    try:
+        valeurs['vehicule_id'] = int(vehicule_id) if vehicule_id not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError("Champ 'vehicule_id': entier attendu")
+
+    date = _texte(donnees.get('date'))
+    try:
+        valeurs['date'] = datetime.strptime(date[:10], '%Y-%m-%d').date() if date else None
+    except ValueError:
+        raise ValueError("Champ 'date': format AAAA-MM-JJ attendu")
+
+    ordre = donnees.get('ordre')
+    try:
+        valeurs['ordre'] = int(ordre) if ordre not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError("Champ 'ordre': entier attendu")
+
+    return valeurs
+
+
+def valeurs_phases(liste):
+    """Valide une liste de phases ; l'ordre manquant suit la position dans la liste"""
+    if not isinstance(liste, list):
+        raise ValueError("Liste 'phases' attendue")
+    phases = []
+    for position, donnees in enumerate(liste, start=1):
+        try:
+            valeurs = valeurs_phase(donnees)
+        except ValueError as e:
+            raise ValueError(f'Phase {position}: {str(e)}')
+        if valeurs['ordre'] is None:
+            valeurs['ordre'] = position
+        phases.append(valeurs)
+    return phases
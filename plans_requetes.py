@@ -0,0 +1,56 @@
+"""
+Contrôle des plans d'exécution des requêtes critiques
+
+Chaque requête est soumise à EXPLAIN (EXPLAIN QUERY PLAN sous SQLite) et son
+plan est examiné : un parcours séquentiel de la table signifie qu'aucun index
+ne sert la requête. Sous PostgreSQL, les parcours séquentiels sont découragés
+le temps du contrôle (`enable_seqscan = off`) : sur une petite base, le
+planificateur les préfère même quand un index convient, ce qui masquerait
+l'information recherchée.
+"""
+
+from collections import namedtuple
+
+# Résultat du contrôle d'une requête : plan complet et lignes en parcours séquentiel
+PlanRequete = namedtuple('PlanRequete', ['nom', 'lignes', 'parcours_sequentiels'])
+
+
+def expliquer(connexion, instruction):
+    """Lignes du plan d'exécution d'une instruction SQLAlchemy"""
+    dialecte = connexion.dialect
+    compilee = instruction.compile(dialect=dialecte)
+    if dialecte.positional:
+        parametres = tuple(compilee.params[nom] for nom in compilee.positiontup)
+    else:
+        parametres = compilee.params
+
+    if dialecte.name == 'sqlite':
+        # Colonnes : id, parent, notused, detail
+        return [ligne[3] for ligne in connexion.exec_driver_sql(f'EXPLAIN QUERY PLAN {compilee}', parametres)]
+    return [ligne[0] for ligne in connexion.exec_driver_sql(f'EXPLAIN {compilee}', parametres)]
+
+
+def parcours_sequentiels(lignes, dialecte, table):
+    """Lignes du plan qui parcourent `table` sans index"""
+    if dialecte == 'sqlite':
+        # 'SCAN transports' seul (ou 'SCAN TABLE transports' selon la version) ;
+        # 'SCAN transports USING INDEX ...' parcourt un index
+        return [ligne for ligne in lignes if ligne.strip() in (f'SCAN {table}', f'SCAN TABLE {table}')]
+    return [ligne for ligne in lignes if f'Seq Scan on {table}' in ligne]
+
+
+def controler_plans(connexion, requetes, table):
+    """Contrôle `{nom: instruction}` ; retourne une liste de `PlanRequete`
+
+    Rien n'est écrit : la transaction ouverte pour le contrôle est annulée.
+    """
+    resultats = []
+    try:
+        if connexion.dialect.name == 'postgresql':
+            connexion.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        for nom, instruction in requetes.items():
+            lignes = expliquer(connexion, instruction)
+            resultats.append(PlanRequete(nom, lignes, parcours_sequentiels(lignes, connexion.dialect.name, table)))
+    finally:
+        connexion.rollback()
+    return resultats
@@ -0,0 +1,153 @@
+"""
+Données de référence (énergies, véhicules) servies par le cache versionné
+
+Le numéro de version est incrémenté dans la transaction qui modifie une énergie
+ou un véhicule ; les clés typées des transports (energie_id, vehicule_id) sont
+résolues depuis le référentiel à chaque écriture.
+"""
+
+import logging
+from itertools import chain
+
+from flask import current_app, request
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from cache_referentiel import CacheReferentiel, serialiser
+from emissions_engine import ReferentielEmissions
+from extensions import db
+from models import Energie, NOM_VERSION_REFERENTIEL, Transport, Vehicule, VersionReferentiel
+
+logger = logging.getLogger(__name__)
+
+def serialiser_energie(e):
+    """Représentation JSON d'une énergie"""
+    return {
+        'id': e.id,
+        'nom': e.nom,
+        'identifiant': e.identifiant,
+        'unite': e.unite,
+        'facteur': e.facteur,
+        'description': e.description,
+        'phase_amont': getattr(e, 'phase_amont', 0.0),
+        'phase_fonctionnement': getattr(e, 'phase_fonctionnement', 0.0),
+        'donnees_supplementaires': getattr(e, 'donnees_supplementaires', {})
+    }
+
+
+def serialiser_vehicule(v, energies_noms):
+    """Représentation JSON d'un véhicule (`energies_noms` : id -> nom)"""
+    return {
+        'id': v.id,
+        'nom': v.nom,
+        'type': v.type,
+        'energie_id': v.energie_id,
+        'energie_nom': energies_noms.get(v.energie_id) if v.energie_id else None,
+        'consommation': v.consommation,
+        'emissions': v.emissions,
+        'charge_utile': v.charge_utile,
+        'description': v.description
+    }
+
+
+def _charger_energies(session):
+    energies = session.scalars(select(Energie).order_by(Energie.id)).all()
+    return serialiser({'success': True, 'energies': [serialiser_energie(e) for e in energies]})
+
+
+def _charger_vehicules(session):
+    energies_noms = dict(session.execute(select(Energie.id, Energie.nom)).all())
+    vehicules = session.scalars(select(Vehicule).order_by(Vehicule.id)).all()
+    return serialiser({'success': True, 'vehicules': [serialiser_vehicule(v, energies_noms) for v in vehicules]})
+
+
+def _charger_referentiel_emissions(session):
+    return ReferentielEmissions.depuis_modeles(session.scalars(select(Vehicule)).all(), session.scalars(select(Energie)).all())
+
+
+def version_referentiel(session=None):
+    """Version des énergies et véhicules vue par `session` (None si le compteur n'existe pas)"""
+    return (session or db.session).scalar(
+        select(VersionReferentiel.version).where(VersionReferentiel.nom == NOM_VERSION_REFERENTIEL)
+    )
+
+
+def _session_validee():
+    # Connexion distincte de celle de db.session : ne voit que les données validées
+    return Session(db.engine)
+
+
+# Cache des données de référence, invalidé par le compteur de version en base
+cache_referentiel = CacheReferentiel(version_referentiel)
+cache_referentiel.enregistrer('energies', _charger_energies)
+cache_referentiel.enregistrer('vehicules', _charger_vehicules)
+cache_referentiel.enregistrer('emissions', _charger_referentiel_emissions)
+
+
+@event.listens_for(Session, 'after_flush')
+def _versionner_referentiel(session, contexte):
+    """Incrémente la version du référentiel dans la transaction qui modifie une énergie ou un véhicule"""
+    modifies = chain(session.new, session.deleted, (objet for objet in session.dirty if session.is_modified(objet)))
+    if not any(isinstance(objet, (Energie, Vehicule)) for objet in modifies):
+        return
+    
+    table = VersionReferentiel.__table__
+    connexion = session.connection()
+    resultat = connexion.execute(
+        table.update()
+        .where(table.c.nom == NOM_VERSION_REFERENTIEL)
+        .values(version=table.c.version + 1)
+    )
+    if resultat.rowcount == 0:
+        connexion.execute(table.insert().values(nom=NOM_VERSION_REFERENTIEL, version=1))
+
+
+@event.listens_for(Session, 'after_flush')
+def _rattacher_references_apres_flush(session, contexte):
+    """Rattache à une énergie ou un véhicule créé les transports qui désignaient déjà son id"""
+    table = Transport.__table__
+    for objet in session.new:
+        if isinstance(objet, Energie):
+            colonne_texte, colonne_id = table.c.energie, table.c.energie_id
+        elif isinstance(objet, Vehicule):
+            colonne_texte, colonne_id = table.c.type_vehicule, table.c.vehicule_id
+        else:
+            continue
+        session.connection().execute(
+            table.update()
+            .where(colonne_texte == str(objet.id), colonne_id.is_(None))
+            .values({colonne_id: objet.id})
+        )
+
+
+@event.listens_for(Session, 'before_flush')
+def _references_typees_avant_flush(session, contexte, instances):
+    """Résout energie_id / vehicule_id des transports créés ou dont l'énergie ou le véhicule change"""
+    transports = [
+        objet for objet in chain(session.new, session.dirty)
+        if isinstance(objet, Transport) and (
+            objet in session.new
+            or inspect(objet).attrs.energie.history.has_changes()
+            or inspect(objet).attrs.type_vehicule.history.has_changes()
+        )
+    ]
+    if not transports:
+        return
+    
+    referentiel = charger_referentiel_emissions()
+    for transport in transports:
+        transport.energie_id, transport.vehicule_id = referentiel.references(transport.energie, transport.type_vehicule)
+
+
+def reponse_referentiel(nom):
+    """Réponse JSON servie depuis le cache, avec ETag et 304 si le client est à jour"""
+    entree = cache_referentiel.obtenir(nom, db.session, _session_validee)
+    reponse = current_app.response_class(entree.corps, mimetype='application/json')
+    reponse.set_etag(entree.etag)
+    reponse.headers['Cache-Control'] = 'no-cache'
+    return reponse.make_conditional(request)
+
+
+def charger_referentiel_emissions():
+    """Référentiel véhicules/énergies des calculs, servi par le cache du référentiel"""
+    return cache_referentiel.obtenir('emissions', db.session, _session_validee)
@@ -3,7 +3,7 @@
 Script de démarrage pour l'application MyXploit
 """
 
-from app import app
+from wsgi import app
 
 if __name__ == "__main__":
     print("🚀 Démarrage de MyXploit...")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Parité du calcul vectorisé (NumPy) avec le calcul unitaire des émissions
+
+Des transports aléatoires (graine fixe), valeurs absentes, nulles, négatives
+ou entourées d'espaces comprises, sont calculés par `calculer_lot` et par
+`calculer_lot_vectorise` : résultats et mises à jour doivent être identiques.
+
+    python -m pytest -q test_emissions_vectorise.py
+"""
+
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from emissions_engine import (
+    calculer_lot, calculer_lot_vectorise, EnergieRef, numpy_disponible, ReferentielEmissions, VehiculeRef
+)
+
+pytestmark = pytest.mark.skipif(not numpy_disponible(), reason="NumPy non installé")
+
+NOMBRE_TRANSPORTS = 50000
+GRAINES = (1, 2, 3, 4)
+
+
+def referentiel_aleatoire(alea):
+    """Véhicules et énergies dont certains facteurs sont absents ou nuls"""
+    valeurs = (None, 0, 0.0, 12.5, 31.7, 0.004, 250, 1e-9)
+    vehicules = [VehiculeRef(i, alea.choice(valeurs), alea.choice(valeurs)) for i in range(1, 9)]
+    energies = [EnergieRef(i, alea.choice((None, 0, 3.16, 2.7, 0.052, 1e-7))) for i in range(1, 7)]
+    return ReferentielEmissions(vehicules, energies)
+
+
+def _nombre(alea):
+    return alea.choice((
+        None, 0, 0.0, -1.5, -250,
+        round(alea.uniform(0.01, 40), 2),
+        round(alea.uniform(1, 2000), 1),
+        alea.uniform(0, 1e6),
+        0.5, 0.125, 0.005,
+    ))
+
+
+def _reference(alea):
+    identifiant = alea.randint(0, 10)
+    return alea.choice((None, '', ' ', str(identifiant), f' {identifiant} ', f'{identifiant}\t', 'inconnu'))
+
+
+def transports_aleatoires(alea, nombre):
+    niveaux = (None, '', 'niveau_1', 'niveau_2', 'niveau_3', 'niveau_4', 'niveau_1_bis', 'autre')
+    return [
+        SimpleNamespace(
+            id=i,
+            ref=f'T{i}',
+            niveau_calcul=alea.choice(niveaux),
+            type_vehicule=_reference(alea),
+            energie=_reference(alea),
+            poids_tonnes=_nombre(alea),
+            distance_km=_nombre(alea),
+            conso_vehicule=_nombre(alea),
+            emis_kg=alea.choice((None, 0.0, 1.23)),
+            emis_tkm=alea.choice((None, 0.0, 0.045)),
+        )
+        for i in range(nombre)
+    ]
+
+
+@pytest.mark.parametrize('graine', GRAINES)
+def test_parite_calcul_vectorise(graine):
+    """Mêmes résultats (valeurs, erreurs) et mêmes lignes à mettre à jour"""
+    alea = random.Random(graine)
+    referentiel = referentiel_aleatoire(alea)
+    transports = transports_aleatoires(alea, NOMBRE_TRANSPORTS)
+
+    resultats, mises_a_jour = calculer_lot(transports, referentiel)
+    resultats_vectorises, mises_a_jour_vectorisees = calculer_lot_vectorise(transports, referentiel)
+
+    differences = [
+        (transport, attendu, obtenu)
+        for transport, attendu, obtenu in zip(transports, resultats, resultats_vectorises)
+        if attendu != obtenu
+    ]
+    assert not differences, f"{len(differences)} écart(s), premier : {differences[0]}"
+    assert mises_a_jour == mises_a_jour_vectorisees
+    # Le jeu couvre bien les succès et les échecs des deux branches
+    assert any(resultat['success'] for resultat in resultats)
+    assert any(not resultat['success'] for resultat in resultats)
+
+
+def test_parite_arrondis_demi_unite():
+    """Valeurs au voisinage d'une demi-unité d'arrondi (np.round diverge de round())"""
+    referentiel = ReferentielEmissions([VehiculeRef(1, 10.0, 1.0)], [EnergieRef(1, 1.0)])
+    transports = [
+        SimpleNamespace(
+            id=i, ref=f'T{i}', niveau_calcul='niveau_2', type_vehicule='1', energie='1',
+            poids_tonnes=1.0, distance_km=100.0, conso_vehicule=base + ecart,
+            emis_kg=None, emis_tkm=None
+        )
+        for i, (base, ecart) in enumerate(
+            (base, ecart)
+            for base in (0.005, 0.015, 0.125, 1.005, 2.675, 1234.565)
+            for ecart in (-1e-12, 0.0, 1e-12)
+        )
+    ]
+    assert calculer_lot(transports, referentiel) == calculer_lot_vectorise(transports, referentiel)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Export en continu des transports : mêmes lignes que la liste filtrée
+
+Chaque format est produit par petits lots (plusieurs morceaux, plusieurs
+groupes de lignes Parquet) puis relu ; les lignes doivent être celles que
+`paginer_transports` renvoie pour les mêmes filtres, page après page, triées
+par id. Les tests Parquet et Arrow ne sont ignorés que si pyarrow est absent.
+
+    python -m pytest -q test_export_transports.py
+"""
+
+import csv
+import io
+import json
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from blueprints.transports import conditions_filtres_transports, paginer_transports, serialiser_transport
+from config import TestingConfig
+from export_transports import COLONNES_EXPORT, exporter_transports
+from extensions import db
+from models import Transport
+
+NOMBRE_TRANSPORTS = 23
+TAILLE_LOT = 4
+
+FILTRES = [
+    {},
+    {'energie': 'gnv'},
+    {'type_transport': 'routier', 'date_debut': '2024-01-05', 'date_fin': '2024-01-12'},
+    {'energie': 'inconnue'},
+]
+
+COLONNES_ENTIERES = {'id', 'client_id', 'transporteur_id', 'energie_id', 'vehicule_id'}
+COLONNES_REELLES = {'emis_kg', 'emis_tkm', 'conso_vehicule', 'poids_tonnes', 'distance_km'}
+
+
+@pytest.fixture(scope='module')
+def application(tmp_path_factory):
+    class ConfigEssai(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path_factory.mktemp('export') / 'essai.db'}"
+        LOG_FILE = ''
+        TRANSPORTS_PAGE_TAILLE = 5
+
+    application = create_app(ConfigEssai)
+    with application.app_context():
+        debut = datetime(2024, 1, 1, 8, 30, 15, 250000)
+        db.session.add_all([Transport(
+            ref=f'EXP-{numero:03d}',
+            type_transport='routier' if numero % 3 else 'ferroviaire',
+            niveau_calcul='niveau_1',
+            type_vehicule='porteur',
+            energie=('gazole', 'gnv', 'electricite')[numero % 3],
+            poids_tonnes=1.5 + numero,
+            distance_km=120.25 * numero,
+            # Émissions non calculées : exportées à 0 comme dans la liste
+            emis_kg=None if numero % 5 == 0 else 10.5 * numero,
+            emis_tkm=None if numero % 5 == 0 else 0.1 * numero,
+            client_id=numero % 4 or None,
+            created_at=debut + timedelta(days=numero, minutes=numero),
+            updated_at=debut + timedelta(days=numero + 1)
+        ) for numero in range(NOMBRE_TRANSPORTS)])
+        db.session.commit()
+    return application
+
+
+def lignes_liste(application, filtres):
+    """Transports de la liste paginée (toutes les pages), triés par id"""
+    lignes = []
+    args = dict(filtres, tri='id', ordre='asc')
+    with application.app_context():
+        while True:
+            page = paginer_transports(args)
+            lignes.extend(serialiser_transport(transport) for transport in page['transports'])
+            if not page['suivant']:
+                return lignes
+            args['apres'] = page['suivant']
+
+
+def morceaux_export(application, filtres, format_export):
+    with application.app_context():
+        conditions = conditions_filtres_transports(filtres)
+        return list(exporter_transports(db.engine, conditions, format_export, taille_lot=TAILLE_LOT))
+
+
+def lire_cellule(nom, texte):
+    if texte == '':
+        return None
+    if nom in COLONNES_ENTIERES:
+        return int(texte)
+    if nom in COLONNES_REELLES:
+        return float(texte)
+    return texte
+
+
+def test_donnees_sur_plusieurs_pages(application):
+    assert len(lignes_liste(application, {})) == NOMBRE_TRANSPORTS
+    assert len(lignes_liste(application, FILTRES[2])) > 0
+
+
+@pytest.mark.parametrize('filtres', FILTRES)
+def test_csv_identique_a_la_liste(application, filtres):
+    morceaux = morceaux_export(application, filtres, 'csv')
+    attendues = lignes_liste(application, filtres)
+
+    # En-tête puis un morceau par lot
+    assert len(morceaux) == max(1, math.ceil(len(attendues) / TAILLE_LOT))
+    lecteur = csv.DictReader(io.StringIO(b''.join(morceaux).decode('utf-8')))
+    assert lecteur.fieldnames == COLONNES_EXPORT
+    assert [{nom: lire_cellule(nom, valeur) for nom, valeur in ligne.items()} for ligne in lecteur] == attendues
+
+
+@pytest.mark.parametrize('filtres', FILTRES)
+def test_ndjson_identique_a_la_liste(application, filtres):
+    morceaux = morceaux_export(application, filtres, 'ndjson')
+    attendues = lignes_liste(application, filtres)
+
+    assert len(morceaux) == math.ceil(len(attendues) / TAILLE_LOT)
+    assert [json.loads(ligne) for ligne in b''.join(morceaux).decode('utf-8').splitlines()] == attendues
+
+
+@pytest.mark.parametrize('format_export', ['parquet', 'arrow'])
+@pytest.mark.parametrize('filtres', FILTRES)
+def test_arrow_identique_a_la_liste(application, filtres, format_export):
+    pa = pytest.importorskip('pyarrow')
+    contenu = b''.join(morceaux_export(application, filtres, format_export))
+    attendues = lignes_liste(application, filtres)
+
+    if format_export == 'parquet':
+        import pyarrow.parquet as pq
+        fichier = pq.ParquetFile(io.BytesIO(contenu))
+        # Un groupe de lignes par lot lu en base
+        assert fichier.metadata.num_row_groups == math.ceil(len(attendues) / TAILLE_LOT)
+        table = fichier.read()
+    else:
+        table = pa.ipc.open_stream(contenu).read_all()
+    assert table.column_names == COLONNES_EXPORT
+    lignes = [
+        {nom: valeur.isoformat() if isinstance(valeur, datetime) else valeur for nom, valeur in ligne.items()}
+        for ligne in table.to_pylist()
+    ]
+    assert lignes == attendues
+
+
+def test_route_export_filtree(application):
+    client = application.test_client()
+    reponse = client.get('/api/transports/export?format=ndjson&energie=gnv')
+
+    assert reponse.status_code == 200
+    assert reponse.headers['Content-Type'] == 'application/x-ndjson'
+    assert 'attachment' in reponse.headers['Content-Disposition']
+    lignes = [json.loads(ligne) for ligne in reponse.get_data(as_text=True).splitlines()]
+    assert lignes == lignes_liste(application, {'energie': 'gnv'})
+
+
+def test_route_export_format_invalide(application):
+    reponse = application.test_client().get('/api/transports/export?format=xlsx')
+
+    assert reponse.status_code == 400
+    assert reponse.get_json()['success'] is False
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Envoi des invitations vers un serveur SMTP local
+
+Un serveur SMTP minimal (thread du test) reçoit les messages ; il peut refuser
+temporairement (451) les premiers messages ou définitivement (550) certains
+destinataires. On vérifie la remise du message, la nouvelle tentative après un
+échec et le statut enregistré sur l'invitation (`statut_envoi`).
+
+    python -m pytest -q test_file_courriels.py
+"""
+
+import email
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from config import TestingConfig
+from courriels import reserver_invitations
+from extensions import db, file_courriels
+from file_courriels import STATUT_ECHEC, STATUT_EN_ATTENTE, STATUT_ENVOYE
+from models import Invitation
+
+
+class _SessionSMTP(socketserver.StreamRequestHandler):
+    """Dialogue SMTP sans authentification ni TLS"""
+
+    def repondre(self, ligne):
+        self.wfile.write(f'{ligne}\r\n'.encode('ascii'))
+
+    def handle(self):
+        puits = self.server
+        self.repondre('220 puits ESMTP')
+        expediteur, destinataires = None, []
+        while True:
+            ligne = self.rfile.readline()
+            if not ligne:
+                return
+            commande = ligne.decode('ascii', 'replace').strip()
+            verbe = commande[:4].upper()
+            if verbe in ('EHLO', 'HELO', 'NOOP', 'RSET'):
+                self.repondre('250 OK')
+            elif verbe == 'MAIL':
+                expediteur, destinataires = commande[10:].strip('<> '), []
+                self.repondre('250 OK')
+            elif verbe == 'RCPT':
+                adresse = commande[8:].strip('<> ')
+                if adresse in puits.refuses:
+                    self.repondre('550 Destinataire inconnu')
+                else:
+                    destinataires.append(adresse)
+                    self.repondre('250 OK')
+            elif verbe == 'DATA':
+                self.repondre('354 Fin par <CRLF>.<CRLF>')
+                lignes = []
+                while True:
+                    ligne = self.rfile.readline()
+                    if ligne in (b'.\r\n', b''):
+                        break
+                    lignes.append(ligne[1:] if ligne.startswith(b'..') else ligne)
+                with puits.verrou:
+                    refuse = puits.echecs_temporaires > 0
+                    if refuse:
+                        puits.echecs_temporaires -= 1
+                    else:
+                        puits.messages.append((expediteur, destinataires, email.message_from_bytes(b''.join(lignes))))
+                self.repondre('451 Erreur temporaire' if refuse else '250 OK')
+            elif verbe == 'QUIT':
+                self.repondre('221 Au revoir')
+                return
+            else:
+                self.repondre('502 Commande non prise en charge')
+
+
+class PuitsSMTP(socketserver.ThreadingTCPServer):
+    """Serveur SMTP local qui conserve les messages reçus"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SessionSMTP)
+        self.verrou = threading.Lock()
+        # (expéditeur, destinataires, message) des messages acceptés
+        self.messages = []
+        # Nombre de prochains messages refusés en 451, destinataires refusés en 550
+        self.echecs_temporaires = 0
+        self.refuses = set()
+
+    def recus(self, destinataire):
+        with self.verrou:
+            return [message for _, destinataires, message in self.messages if destinataire in destinataires]
+
+
+@pytest.fixture(scope='module')
+def puits():
+    serveur = PuitsSMTP()
+    thread = threading.Thread(target=serveur.serve_forever, daemon=True)
+    thread.start()
+    yield serveur
+    serveur.shutdown()
+    serveur.server_close()
+
+
+@pytest.fixture(scope='module')
+def application(puits, tmp_path_factory):
+    class ConfigEssai(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path_factory.mktemp('courriels') / 'essai.db'}"
+        LOG_FILE = ''
+        SMTP_SERVER = '127.0.0.1'
+        SMTP_PORT = puits.server_address[1]
+        SMTP_STARTTLS = False
+        EMAIL_PASSWORD = ''
+        EMAIL_SIMULATION = False
+        COURRIELS_DEBIT_MAX = 0
+        COURRIELS_TENTATIVES_MAX = 3
+        COURRIELS_DELAI_REPRISE = 0.01
+
+    return create_app(ConfigEssai)
+
+
+@pytest.fixture(autouse=True)
+def puits_vide(puits):
+    with puits.verrou:
+        puits.messages.clear()
+        puits.echecs_temporaires = 0
+        puits.refuses.clear()
+
+
+def invitation(application, adresse):
+    with application.app_context():
+        return db.session.scalars(db.select(Invitation).where(Invitation.email == adresse)).one()
+
+
+def inviter(application, adresse):
+    reponse = application.test_client().post('/api/invitations', json={'email': adresse})
+    assert reponse.status_code == 200, reponse.get_json()
+    return invitation(application, adresse)
+
+
+def test_remise_invitation(application, puits):
+    """Message remis au serveur, en-têtes complets, statut `envoye`"""
+    inv = inviter(application, 'remise@exemple.fr')
+
+    [message] = puits.recus('remise@exemple.fr')
+    assert message['To'] == 'remise@exemple.fr'
+    assert message['Date'] and message['Message-ID']
+    assert message.get_content_type() == 'multipart/alternative'
+    assert any(inv.token in partie.get_payload(decode=True).decode('utf-8') for partie in message.get_payload())
+    assert (inv.statut_envoi, inv.tentatives_envoi, inv.erreur_envoi) == (STATUT_ENVOYE, 1, None)
+    assert inv.date_envoi is not None and inv.envoi_reserve_jusqu_a is None
+
+
+def test_nouvelle_tentative_apres_echec_temporaire(application, puits):
+    """Deux refus 451 puis remise : une seule copie reçue, trois tentatives"""
+    puits.echecs_temporaires = 2
+    inv = inviter(application, 'reprise@exemple.fr')
+
+    assert len(puits.recus('reprise@exemple.fr')) == 1
+    assert (inv.statut_envoi, inv.tentatives_envoi) == (STATUT_ENVOYE, 3)
+
+
+def test_echec_apres_tentatives_epuisees(application, puits):
+    puits.echecs_temporaires = 10
+    inv = inviter(application, 'epuise@exemple.fr')
+
+    assert puits.recus('epuise@exemple.fr') == []
+    assert (inv.statut_envoi, inv.tentatives_envoi) == (STATUT_ECHEC, 3)
+    assert '451' in inv.erreur_envoi
+
+
+def test_echec_definitif_sans_nouvelle_tentative(application, puits):
+    puits.refuses.add('inconnu@exemple.fr')
+    inv = inviter(application, 'inconnu@exemple.fr')
+
+    assert (inv.statut_envoi, inv.tentatives_envoi) == (STATUT_ECHEC, 1)
+    assert '550' in inv.erreur_envoi
+
+
+def test_tentative_suivante_enregistree_en_base(application, puits):
+    """Hors mode synchrone, l'échec temporaire est reporté en base puis repris"""
+    with application.app_context():
+        db.session.add(Invitation(
+            email='differe@exemple.fr', token='jeton-differe', statut_envoi=STATUT_EN_ATTENTE, tentatives_envoi=0
+        ))
+        db.session.commit()
+        puits.echecs_temporaires = 1
+        file_courriels._traiter(reserver_invitations(10))
+
+    inv = invitation(application, 'differe@exemple.fr')
+    assert (inv.statut_envoi, inv.tentatives_envoi) == (STATUT_EN_ATTENTE, 1)
+    assert inv.prochain_envoi is not None and inv.envoi_reserve_jusqu_a is None
+
+    time.sleep(0.05)
+    with application.app_context():
+        file_courriels.signaler()
+    inv = invitation(application, 'differe@exemple.fr')
+    assert (inv.statut_envoi, inv.tentatives_envoi) == (STATUT_ENVOYE, 2)
+    assert len(puits.recus('differe@exemple.fr')) == 1
+
+
+def test_reprise_des_reservations_expirees(application, puits):
+    """Invitation réservée par un worker arrêté : reprise ; réservation en cours : ignorée"""
+    maintenant = datetime.utcnow()
+    with application.app_context():
+        db.session.add_all([
+            Invitation(email='orpheline@exemple.fr', token='jeton-orpheline', statut_envoi=STATUT_EN_ATTENTE,
+                       tentatives_envoi=0, envoi_reserve_jusqu_a=maintenant - timedelta(seconds=1)),
+            Invitation(email='reservee@exemple.fr', token='jeton-reservee', statut_envoi=STATUT_EN_ATTENTE,
+                       tentatives_envoi=0, envoi_reserve_jusqu_a=maintenant + timedelta(minutes=10)),
+        ])
+        db.session.commit()
+        file_courriels.signaler()
+
+    assert invitation(application, 'orpheline@exemple.fr').statut_envoi == STATUT_ENVOYE
+    assert invitation(application, 'reservee@exemple.fr').statut_envoi == STATUT_EN_ATTENTE
+    assert puits.recus('reservee@exemple.fr') == []
+
+
+def test_injection_en_tete_refusee(application, puits):
+    """Une adresse contenant CR/LF n'est ni acceptée par l'API ni envoyée"""
+    reponse = application.test_client().post(
+        '/api/invitations', json={'email': 'victime@exemple.fr\r\nBcc: attaquant@exemple.fr'}
+    )
+    assert reponse.status_code == 400
+    assert puits.messages == []
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Point d'entrée WSGI : instance de l'application chargée par les serveurs
+
+    gunicorn --bind 0.0.0.0:$PORT wsgi:app     (Procfile, render.yaml)
+    python run.py
+
+app.py ne crée aucune instance à l'import : les tests et les scripts appellent
+`create_app(config)` sans migrer ni journaliser dans la base de développement.
+`flask --app app` trouve la fabrique `create_app` d'elle-même.
+"""
+
+from app import create_app
+
+app = create_app()